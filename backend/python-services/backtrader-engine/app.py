@@ -1,21 +1,72 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Dict, List, Any, Optional
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import AfterValidator, BaseModel, Field
+from typing import Annotated, Dict, List, Any, Literal, Optional, Tuple
+from contextlib import asynccontextmanager
 import backtrader as bt
 import pandas as pd
-import yfinance as yf
 import numpy as np
 from datetime import datetime, timedelta
 import asyncio
+import json
 import logging
+import os
+import time
 import traceback
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from worker_pool import DEFAULT_PRELOAD, BacktestWorkerPool, PoolSaturatedError, JobLimitExceeded
+from jobs import JobRegistry, ProgressReporter
+from data_sources import available_data_sources, get_data_source
+from optimization import ParameterSpec, aggregate_runs, expand_grid, rank_trials
+from shared_data import SharedMarketData, materialize
+from metrics import EquitySeries, calculate_series_metrics
+from event_log import BacktestEventLog, EventBuffer, configure_event_logging, event_logger
+from result_cache import ResultCache, request_fingerprint
+from result_format import compress, columns_to_records, encode_result, json_safe, negotiate, available_formats
+from strategy_registry import StrategyError, strategy_registry
+from indicator_cache import IndicatorMemo, total_stats
+from monte_carlo import MonteCarloRequest, MonteCarloResult, net_pnl, simulate, split_paths, summarize_paths, trades_per_year
+from telemetry import (CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, StageTimer, observe_data_load,
+                       observe_stages, registry as metrics_registry, results_total, server_timing)
+from low_memory import CEREBRO_OPTIONS, ChunkedPandasData, resolve_memory_mode
+from walk_forward import WalkForwardSpec, slice_frames, split_windows, summarize
+from vectorized import CHECKPOINT_VERSION, ma_cross_signals, rsi_signals, run_vectorized, share_calendar, yearly_sharpe
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Backtrader Engine", version="1.0.0")
+# Cerebro runs are CPU-bound, so they execute in worker processes instead of on the event loop
+# Workers fork from a server that already imported this module and its heavy dependencies
+worker_pool = BacktestWorkerPool(preload=[*DEFAULT_PRELOAD, 'yfinance', __name__])
+job_registry = JobRegistry()
+# Market data is loaded in the API process and mapped zero-copy by every worker
+shared_store = SharedMarketData()
+# Identical requests over identical data return the stored result instead of re-running Cerebro
+result_cache = ResultCache()
+# End-of-run engine state, so the same request with a later endDate only simulates the new bars
+checkpoint_store = ResultCache(
+    max_entries=int(os.getenv('BACKTEST_CHECKPOINT_MAX_ENTRIES', '256')),
+    ttl_seconds=int(os.getenv('BACKTEST_CHECKPOINT_TTL_SECONDS', str(7 * 24 * 3600))),
+    disk_dir=os.getenv('BACKTEST_CHECKPOINT_DIR', '')
+)
+
+# Keep references to running job tasks so they are not garbage collected mid-flight
+_job_tasks = set()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    worker_pool.start()
+    job_registry.start(worker_pool.progress_channel)
+    yield
+    job_registry.stop()
+    worker_pool.shutdown()
+    shared_store.close()
+
+app = FastAPI(title="Backtrader Engine", version="1.0.0", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -25,6 +76,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added last, so it is outermost and times whole requests
+app.add_middleware(MetricsMiddleware)
+
+def _registered_data_source(name: str) -> str:
+    get_data_source(name)
+    return name
+
+# Name of a provider registered in data_sources: yahoo, local (with LOCAL_DATA_DIR) or a plugin
+DataSourceName = Annotated[str, AfterValidator(_registered_data_source)]
 
 class BacktestRequest(BaseModel):
     strategyId: str
@@ -34,7 +94,23 @@ class BacktestRequest(BaseModel):
     endDate: str
     initialCapital: float
     symbols: List[str]
-    dataSource: str = "yahoo"
+    dataSource: DataSourceName = "yahoo"
+    # "vectorized" runs the built-in strategies with array operations instead of Cerebro's event loop
+    engine: Literal["backtrader", "vectorized"] = "backtrader"
+    # Structured order/trade event log, returned in results.events when requested
+    includeEvents: bool = False
+    logLevel: Optional[str] = None
+    eventSampleRate: float = Field(1.0, gt=0, le=1)
+    maxEvents: int = Field(1000, ge=1, le=100000)
+    useCache: bool = True
+    # Extend the checkpoint of an earlier run of this request (vectorized engine) instead of starting over
+    resume: bool = True
+    # Cerebro's low-memory mode streams bars and bounds line buffers; "auto" uses it past BACKTEST_LOW_MEMORY_BARS
+    memoryMode: Literal["auto", "standard", "low"] = "auto"
+    # Seconds between progress frames of a job, defaults to BACKTEST_PROGRESS_INTERVAL_SECONDS
+    progressInterval: Optional[float] = Field(None, ge=0.05, le=60)
+    # Per-stage wall seconds in results.timings (and a Server-Timing header on POST /backtest)
+    includeTimings: bool = False
 
 class BacktestResult(BaseModel):
     strategyId: str
@@ -48,27 +124,88 @@ class BacktestResult(BaseModel):
     sharpeRatio: float
     totalReturn: float
     results: Dict[str, Any]
+    cached: bool = False
 
 class StrategyValidation(BaseModel):
     strategyCode: str
 
+class OptimizeRequest(BaseModel):
+    strategyId: str
+    strategyCode: str
+    parameters: Dict[str, Any] = {}
+    parameterRanges: Dict[str, ParameterSpec]
+    startDate: str
+    endDate: str
+    initialCapital: float
+    symbols: List[str]
+    dataSource: DataSourceName = "yahoo"
+    engine: Literal["backtrader", "vectorized"] = "backtrader"
+    rankBy: str = "sharpeRatio"
+    ascending: Optional[bool] = None
+    maxCombinations: int = 500
+    # "walk_forward" optimizes on rolling in-sample windows and scores the winner on the period after each
+    mode: Literal["grid", "walk_forward"] = "grid"
+    walkForward: Optional[WalkForwardSpec] = None
+
+# Upper bound on the runs of one POST /backtest/batch request
+MAX_BATCH_RUNS = int(os.getenv('BACKTEST_BATCH_MAX_RUNS', '1000'))
+
+class BatchRun(BaseModel):
+    # Identifies the run in the summary; defaults to its position in the batch
+    id: Optional[str] = None
+    strategyCode: str
+    parameters: Dict[str, Any] = {}
+    symbols: List[str]
+
+class BatchBacktestRequest(BaseModel):
+    strategyId: str
+    runs: List[BatchRun] = Field(..., min_length=1, max_length=MAX_BATCH_RUNS)
+    startDate: str
+    endDate: str
+    initialCapital: float
+    dataSource: DataSourceName = "yahoo"
+    engine: Literal["backtrader", "vectorized"] = "backtrader"
+    useCache: bool = True
+    rankBy: str = "sharpeRatio"
+    ascending: Optional[bool] = None
+    # Also return each run's full result (trades, daily returns, metrics), not just its summary row
+    includeResults: bool = False
+
+class BatchBacktestResult(BaseModel):
+    strategyId: str
+    startDate: str
+    endDate: str
+    rankBy: str
+    summary: Dict[str, Any]
+    runs: List[Dict[str, Any]]
+    dataLoad: List[Dict[str, Any]]
+    seconds: float
+    results: Optional[Dict[str, Any]] = None
+
 class CustomStrategy(bt.Strategy):
-    """Base strategy class that can execute user-defined code"""
+    """Base class of the built-in strategies"""
     
     def __init__(self):
-        self.trades = []
-        self.daily_values = []
-        
-    def log(self, txt, dt=None):
-        dt = dt or self.datas[0].datetime.date(0)
-        logger.info(f'{dt.isoformat()}: {txt}')
+        self.indicator_memo = IndicatorMemo(self)
+    
+    def indicator(self, indicator, *inputs, **params):
+        """Build an indicator, reusing the series an earlier run in this worker computed"""
+        return self.indicator_memo.indicator(indicator, *inputs, **params)
+    
+    def stop(self):
+        self.indicator_memo.store()
+    
+    def log(self, txt, *args, dt=None, level=logging.INFO):
+        # Lazy %-style formatting: nothing is formatted unless the event logger is enabled for this level
+        if event_logger.isEnabledFor(level):
+            dt = dt or self.datas[0].datetime.date(0)
+            event_logger.log(level, '%s: ' + txt, dt.isoformat(), *args)
 
-    def notify_order(self, order):
-        if order.status in [order.Completed]:
-            if order.isbuy():
-                self.log(f'BUY EXECUTED: {order.executed.price:.2f}')
-            elif order.issell():
-                self.log(f'SELL EXECUTED: {order.executed.price:.2f}')
+class TradeLog(bt.Analyzer):
+    """Collects closed trades in the response shape for any strategy, built-in or user-defined"""
+
+    def start(self):
+        self.trades = []
 
     def notify_trade(self, trade):
         if trade.isclosed:
@@ -84,15 +221,116 @@ class CustomStrategy(bt.Strategy):
                 'commission': trade.commission
             }
             self.trades.append(trade_data)
-            self.log(f'TRADE CLOSED: PnL: {trade.pnl:.2f}')
+
+    def get_analysis(self):
+        return self.trades
+
+class EquityRecorder(bt.Analyzer):
+    """Records timestamp, portfolio value, cash and per-data position size on every bar
+    
+    Values go into typed ``array('d')`` columns rather than per-bar dicts; they are only
+    turned into the JSON shape at the response boundary. With ``daily`` only the last
+    bar of each day is kept.
+    """
+    params = (('daily', False),)
+
+    def start(self):
+        self.timestamps = array('d')
+        self.values = array('d')
+        self.cash = array('d')
+        self.positions = {data._name: array('d') for data in self.strategy.datas}
 
     def next(self):
-        # Record daily portfolio value
-        self.daily_values.append({
-            'date': self.datas[0].datetime.date(0).isoformat(),
-            'portfolioValue': self.broker.getvalue(),
-            'cash': self.broker.getcash()
-        })
+        broker = self.strategy.broker
+        timestamp = self.strategy.datas[0].datetime[0]
+        if self.p.daily and self.timestamps and int(self.timestamps[-1]) == int(timestamp):
+            # Same day as the previous point: it becomes this bar
+            for column in (self.timestamps, self.values, self.cash, *self.positions.values()):
+                column.pop()
+        self.timestamps.append(timestamp)
+        self.values.append(broker.getvalue())
+        self.cash.append(broker.getcash())
+        for data in self.strategy.datas:
+            self.positions[data._name].append(self.strategy.getposition(data).size)
+
+    def prenext(self):
+        # Only record once the strategy itself is past its warm-up period
+        pass
+
+    def get_analysis(self):
+        return {
+            'timestamps': np.frombuffer(self.timestamps, dtype=np.float64),
+            'values': np.frombuffer(self.values, dtype=np.float64),
+            'cash': np.frombuffer(self.cash, dtype=np.float64),
+            'positions': {name: np.frombuffer(column, dtype=np.float64) for name, column in self.positions.items()}
+        }
+
+def bt_dates_to_iso(timestamps: np.ndarray) -> List[str]:
+    """Backtrader date numbers (days since 0001-01-01, plus 1) to 'YYYY-MM-DD' strings"""
+    days = np.floor(timestamps).astype(np.int64) - datetime(1970, 1, 1).toordinal()
+    return days.astype('datetime64[D]').astype(str).tolist()
+
+class ProgressAnalyzer(bt.Analyzer):
+    """Reports progress of the run to a job's ProgressReporter
+    
+    Each update carries bars processed, the current bar date, portfolio value and open
+    positions, plus a ``partial`` block with the equity points and closed trades since
+    the previous update, so a streaming client can draw the curve as it grows. The
+    snapshot is only built when the reporter's throttle lets an update through.
+    """
+    params = (
+        ('reporter', None),
+    )
+
+    def start(self):
+        self.bars_processed = 0
+        data = self.strategy.datas[0]
+        # Feeds that stream their bars (low-memory mode) have not loaded any yet
+        self.total_bars = data.buflen() or len(data.p.dataname)
+        self.equity_sent = 0
+        self.trades_sent = 0
+        self.p.reporter.report(force=True, barsProcessed=0, totalBars=self.total_bars)
+
+    def next(self):
+        self.bars_processed += 1
+        if self.p.reporter.due():
+            self.p.reporter.report(force=True, **self.snapshot())
+
+    def stop(self):
+        self.bars_processed = self.total_bars
+        self.p.reporter.report(force=True, **self.snapshot())
+
+    def snapshot(self) -> Dict[str, Any]:
+        strategy = self.strategy
+        positions = {}
+        for data in strategy.datas:
+            position = strategy.getposition(data)
+            if position.size:
+                positions[data._name] = {'size': position.size, 'price': position.price}
+        
+        equity_points = []
+        equity = getattr(strategy.analyzers, 'equity', None)
+        if equity is not None:
+            timestamps = np.frombuffer(equity.timestamps, dtype=np.float64)[self.equity_sent:]
+            values = equity.values[self.equity_sent:].tolist()
+            equity_points = [{'date': date, 'portfolioValue': value}
+                             for date, value in zip(bt_dates_to_iso(timestamps), values)]
+            self.equity_sent += len(equity_points)
+        
+        trades = strategy.analyzers.tradelog.trades
+        new_trades = trades[self.trades_sent:]
+        self.trades_sent = len(trades)
+        
+        return {
+            'barsProcessed': self.bars_processed,
+            'totalBars': self.total_bars,
+            'date': strategy.datas[0].datetime.date(0).isoformat(),
+            'portfolioValue': strategy.broker.getvalue(),
+            'cash': strategy.broker.getcash(),
+            'positions': positions,
+            'tradesClosed': len(trades),
+            'partial': {'equity': equity_points, 'trades': new_trades}
+        }
 
 class MovingAverageCrossStrategy(CustomStrategy):
     """Example strategy: Moving Average Crossover"""
@@ -103,17 +341,15 @@ class MovingAverageCrossStrategy(CustomStrategy):
 
     def __init__(self):
         super().__init__()
-        self.fast_ma = bt.indicators.SimpleMovingAverage(
-            self.datas[0], period=self.params.fast_period
+        self.fast_ma = self.indicator(
+            bt.indicators.SimpleMovingAverage, self.datas[0], period=self.params.fast_period
         )
-        self.slow_ma = bt.indicators.SimpleMovingAverage(
-            self.datas[0], period=self.params.slow_period
+        self.slow_ma = self.indicator(
+            bt.indicators.SimpleMovingAverage, self.datas[0], period=self.params.slow_period
         )
-        self.crossover = bt.indicators.CrossOver(self.fast_ma, self.slow_ma)
+        self.crossover = self.indicator(bt.indicators.CrossOver, self.fast_ma, self.slow_ma)
 
     def next(self):
-        super().next()
-        
         if not self.position:
             if self.crossover > 0:  # Fast MA crosses above Slow MA
                 self.buy()
@@ -131,13 +367,11 @@ class RSIStrategy(CustomStrategy):
 
     def __init__(self):
         super().__init__()
-        self.rsi = bt.indicators.RelativeStrengthIndex(
-            self.datas[0], period=self.params.rsi_period
+        self.rsi = self.indicator(
+            bt.indicators.RelativeStrengthIndex, self.datas[0], period=self.params.rsi_period
         )
 
     def next(self):
-        super().next()
-        
         if not self.position:
             if self.rsi < self.params.rsi_lower:  # Oversold
                 self.buy()
@@ -145,118 +379,59 @@ class RSIStrategy(CustomStrategy):
             if self.rsi > self.params.rsi_upper:  # Overbought
                 self.sell()
 
-def get_data_yahoo(symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
-    """Fetch data from Yahoo Finance"""
-    try:
-        # Convert NSE symbols to Yahoo format
-        if '.NS' not in symbol:
-            symbol = f"{symbol}.NS"
-        
-        data = yf.download(symbol, start=start_date, end=end_date)
-        if data.empty:
-            raise ValueError(f"No data found for symbol {symbol}")
-        
-        return data
-    except Exception as e:
-        logger.error(f"Failed to fetch data for {symbol}: {e}")
-        raise
+# Downloads are I/O-bound, so symbols are fetched on threads (from load_shared_data, itself off the event loop)
+DATA_LOAD_CONCURRENCY = int(os.getenv('BACKTEST_DATA_CONCURRENCY', '8'))
 
-def calculate_performance_metrics(trades: List[Dict], daily_values: List[Dict], initial_capital: float) -> Dict[str, Any]:
-    """Calculate comprehensive performance metrics"""
-    if not trades or not daily_values:
-        return {
-            'totalReturn': 0,
-            'annualizedReturn': 0,
-            'volatility': 0,
-            'sharpeRatio': 0,
-            'sortinoRatio': 0,
-            'maxDrawdown': 0,
-            'calmarRatio': 0,
-            'winRate': 0,
-            'profitFactor': 0,
-            'avgWin': 0,
-            'avgLoss': 0,
-            'largestWin': 0,
-            'largestLoss': 0
-        }
-    
-    # Calculate returns
-    portfolio_values = [d['portfolioValue'] for d in daily_values]
-    final_value = portfolio_values[-1]
-    total_return = (final_value - initial_capital) / initial_capital
-    
-    # Calculate daily returns
-    daily_returns = []
-    for i in range(1, len(portfolio_values)):
-        daily_return = (portfolio_values[i] - portfolio_values[i-1]) / portfolio_values[i-1]
-        daily_returns.append(daily_return)
-    
-    daily_returns = np.array(daily_returns)
-    
-    # Annualized return
-    trading_days = len(daily_returns)
-    annualized_return = (1 + total_return) ** (252 / trading_days) - 1 if trading_days > 0 else 0
-    
-    # Volatility
-    volatility = np.std(daily_returns) * np.sqrt(252) if len(daily_returns) > 1 else 0
-    
-    # Sharpe ratio (assuming risk-free rate of 6%)
-    risk_free_rate = 0.06
-    sharpe_ratio = (annualized_return - risk_free_rate) / volatility if volatility > 0 else 0
+def load_symbol_data(symbols: List[str], start_date: str, end_date: str, data_source: str = "yahoo") -> tuple:
+    """Fetch all symbols concurrently from the named data source.
     
-    # Sortino ratio
-    negative_returns = daily_returns[daily_returns < 0]
-    downside_deviation = np.std(negative_returns) * np.sqrt(252) if len(negative_returns) > 1 else 0
-    sortino_ratio = (annualized_return - risk_free_rate) / downside_deviation if downside_deviation > 0 else 0
+    Returns ({symbol: DataFrame} for the symbols that loaded, in request order, and a
+    per-symbol timing list). Failed symbols are logged and skipped.
+    """
+    source = get_data_source(data_source)
     
-    # Maximum drawdown
-    peak = portfolio_values[0]
-    max_drawdown = 0
-    for value in portfolio_values:
-        if value > peak:
-            peak = value
-        drawdown = (peak - value) / peak
-        if drawdown > max_drawdown:
-            max_drawdown = drawdown
+    def load(symbol):
+        started = time.perf_counter()
+        try:
+            data = source.fetch(symbol, start_date, end_date)
+            return symbol, data, None, time.perf_counter() - started
+        except Exception as e:
+            return symbol, None, e, time.perf_counter() - started
     
-    # Calmar ratio
-    calmar_ratio = annualized_return / max_drawdown if max_drawdown > 0 else 0
+    workers = max(1, min(DATA_LOAD_CONCURRENCY, len(symbols)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='data-load') as executor:
+        outcomes = list(executor.map(load, symbols))
     
-    # Trade statistics
-    winning_trades = [t for t in trades if t['pnl'] > 0]
-    losing_trades = [t for t in trades if t['pnl'] < 0]
-    
-    win_rate = len(winning_trades) / len(trades) if trades else 0
-    
-    total_wins = sum(t['pnl'] for t in winning_trades)
-    total_losses = abs(sum(t['pnl'] for t in losing_trades))
-    profit_factor = total_wins / total_losses if total_losses > 0 else float('inf')
-    
-    avg_win = total_wins / len(winning_trades) if winning_trades else 0
-    avg_loss = total_losses / len(losing_trades) if losing_trades else 0
-    
-    largest_win = max([t['pnl'] for t in winning_trades]) if winning_trades else 0
-    largest_loss = min([t['pnl'] for t in losing_trades]) if losing_trades else 0
-    
-    return {
-        'totalReturn': total_return,
-        'annualizedReturn': annualized_return,
-        'volatility': volatility,
-        'sharpeRatio': sharpe_ratio,
-        'sortinoRatio': sortino_ratio,
-        'maxDrawdown': max_drawdown,
-        'calmarRatio': calmar_ratio,
-        'winRate': win_rate,
-        'profitFactor': profit_factor,
-        'avgWin': avg_win,
-        'avgLoss': avg_loss,
-        'largestWin': largest_win,
-        'largestLoss': largest_loss
-    }
+    frames = {}
+    timings = []
+    for symbol, data, error, elapsed in outcomes:
+        timing = {'symbol': symbol, 'seconds': round(elapsed, 4)}
+        if error is not None:
+            logger.warning(f"Failed to add data for {symbol}: {error}")
+            timing.update(status='failed', error=str(error))
+        else:
+            frames[symbol] = data
+            timing.update(status='ok', bars=len(data))
+        timings.append(timing)
+    return frames, timings
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "workerPool": worker_pool.stats(),
+        "jobs": job_registry.stats(),
+        "sharedData": shared_store.stats(),
+        "resultCache": result_cache.stats(),
+        "checkpoints": checkpoint_store.stats(),
+        "strategies": strategy_registry.stats()
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Stage latencies, data loads, cache outcomes and request durations in the Prometheus text format"""
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
 
 @app.get("/indicators")
 async def get_indicators():
@@ -269,6 +444,11 @@ async def get_indicators():
     ]
     return {"indicators": indicators}
 
+@app.get("/data-sources")
+async def get_data_sources():
+    """Names accepted as a request's dataSource"""
+    return {"dataSources": available_data_sources()}
+
 @app.get("/template/{template_type}")
 async def get_strategy_template(template_type: str):
     """Get strategy template code"""
@@ -325,137 +505,910 @@ class RSIStrategy(bt.Strategy):
     
     return {"template": templates[template_type]}
 
+# Built-in strategies requested by name instead of source code
+BUILTIN_STRATEGIES = {
+    'MovingAverageCross': MovingAverageCrossStrategy,
+    'MovingAverageCrossStrategy': MovingAverageCrossStrategy,
+    'moving_average': MovingAverageCrossStrategy,
+    'RSI': RSIStrategy,
+    'RSIStrategy': RSIStrategy,
+    'rsi': RSIStrategy,
+}
+
 @app.post("/validate")
 async def validate_strategy(validation: StrategyValidation):
-    """Validate strategy code syntax"""
+    """Validate strategy code: syntax, allowed imports/names, and a strategy class to run"""
+    builtin = BUILTIN_STRATEGIES.get(validation.strategyCode.strip())
+    if builtin is not None:
+        return {"valid": True, "strategy": builtin.__name__, "builtin": True}
     try:
-        # Basic syntax validation
-        compile(validation.strategyCode, '<string>', 'exec')
-        return {"valid": True}
-    except SyntaxError as e:
-        return {"valid": False, "errors": [f"Syntax error: {str(e)}"]}
-    except Exception as e:
-        return {"valid": False, "errors": [f"Validation error: {str(e)}"]}
+        compiled = strategy_registry.compile(validation.strategyCode)
+        return {"valid": True, "strategy": compiled.name, "builtin": False}
+    except StrategyError as e:
+        return {"valid": False, "errors": e.errors}
 
-@app.post("/backtest")
-async def run_backtest(request: BacktestRequest) -> BacktestResult:
-    """Run backtest using Backtrader"""
+def check_strategy(strategy_code: str, engine: str = "backtrader"):
+    """Reject code that cannot run before any data is loaded or a worker is taken"""
     try:
-        logger.info(f"Starting backtest for strategy {request.strategyId}")
-        
-        # Create Cerebro engine
-        cerebro = bt.Cerebro()
-        
-        # Set initial capital
-        cerebro.broker.setcash(request.initialCapital)
-        
-        # Set commission (0.1% per trade)
-        cerebro.broker.setcommission(commission=0.001)
-        
-        # Add strategy based on strategy code or use predefined ones
-        if "MovingAverageCross" in request.strategyCode:
-            cerebro.addstrategy(MovingAverageCrossStrategy, **request.parameters)
-        elif "RSI" in request.strategyCode:
-            cerebro.addstrategy(RSIStrategy, **request.parameters)
-        else:
-            # For custom strategies, we'd need to execute the user code safely
-            # This is a simplified version - in production, you'd want proper sandboxing
-            cerebro.addstrategy(MovingAverageCrossStrategy, **request.parameters)
-        
-        # Add data feeds
-        for symbol in request.symbols:
-            try:
-                data = get_data_yahoo(symbol, request.startDate, request.endDate)
-                data_feed = bt.feeds.PandasData(dataname=data, name=symbol)
-                cerebro.adddata(data_feed)
-            except Exception as e:
-                logger.warning(f"Failed to add data for {symbol}: {e}")
-                continue
-        
-        if len(cerebro.datas) == 0:
-            raise HTTPException(status_code=400, detail="No valid data feeds added")
-        
-        # Add analyzers
-        cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
-        cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
-        cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
-        cerebro.addanalyzer(bt.analyzers.Returns, _name='returns')
+        if strategy_code.strip() in BUILTIN_STRATEGIES:
+            return
+        strategy_registry.compile(strategy_code)
+        if engine == "vectorized":
+            raise StrategyError([f"The vectorized engine only runs the built-in strategies: {', '.join(BUILTIN_STRATEGIES)}"])
+    except StrategyError as e:
+        raise HTTPException(status_code=400, detail={"errors": e.errors})
+
+def resolve_strategy(strategy_code: str) -> type:
+    """Strategy class for the submitted code: a built-in by name, or the user's compiled source"""
+    builtin = BUILTIN_STRATEGIES.get(strategy_code.strip())
+    if builtin is not None:
+        return builtin
+    # Compiled once per source and loaded once per worker process
+    return strategy_registry.compile(strategy_code).load()
+
+# Commission per trade as a fraction of the traded value, shared by both engines
+COMMISSION = 0.001
+
+# Built-in strategies the vectorized engine can run, with the function computing their signals
+VECTORIZED_SIGNALS = {
+    MovingAverageCrossStrategy: ma_cross_signals,
+    RSIStrategy: rsi_signals,
+}
+
+def trading_from(strategy: type, start: pd.Timestamp) -> type:
+    """Subclass of the strategy that drops its orders on bars before ``start``
+    
+    ``close`` and the ``order_target_*`` helpers all go through ``buy``/``sell``.
+    """
+    first_bar = bt.date2num(start)
+    
+    class Gated(strategy):
+        def buy(self, *args, **kwargs):
+            if self.datas[0].datetime[0] < first_bar:
+                return None
+            return super().buy(*args, **kwargs)
         
-        # Run backtest
-        logger.info("Running backtest...")
+        def sell(self, *args, **kwargs):
+            if self.datas[0].datetime[0] < first_bar:
+                return None
+            return super().sell(*args, **kwargs)
+    
+    Gated.__name__ = Gated.__qualname__ = strategy.__name__
+    return Gated
+
+def run_cerebro(request: BacktestRequest, frames: Dict[str, pd.DataFrame],
+                progress: Optional[ProgressReporter] = None, timer: Optional[StageTimer] = None,
+                trade_from: Optional[pd.Timestamp] = None) -> Dict[str, Any]:
+    """Run Cerebro over already loaded frames and return the headline statistics
+    
+    The returned dict holds the BacktestResult top-level fields plus the strategy's
+    trades, the recorded equity series and the derived metrics. ``timer`` gets the
+    ``feeds``, ``run``, ``analyzers`` and ``metrics`` stages. Orders before
+    ``trade_from`` are dropped, so the bars before it only warm up the indicators.
+    """
+    timer = timer or StageTimer()
+    feeds_started = time.perf_counter()
+    configure_event_logging(request.logLevel)
+    memory_mode = resolve_memory_mode(request.memoryMode, frames)
+    
+    # Create Cerebro engine
+    cerebro = bt.Cerebro(**CEREBRO_OPTIONS[memory_mode])
+    
+    # Set initial capital
+    cerebro.broker.setcash(request.initialCapital)
+    
+    # Set commission (0.1% per trade)
+    cerebro.broker.setcommission(commission=COMMISSION)
+    
+    # Add strategy based on strategy code or use predefined ones
+    strategy = resolve_strategy(request.strategyCode)
+    cerebro.addstrategy(trading_from(strategy, trade_from) if trade_from is not None else strategy, **request.parameters)
+    
+    # Add data feeds
+    feed = ChunkedPandasData if memory_mode == 'low' else bt.feeds.PandasData
+    for symbol, data in frames.items():
+        cerebro.adddata(feed(dataname=data, name=symbol))
+    
+    if len(cerebro.datas) == 0:
+        raise ValueError("No valid data feeds added")
+    
+    # Add analyzers
+    cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
+    cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
+    cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
+    cerebro.addanalyzer(bt.analyzers.Returns, _name='returns')
+    cerebro.addanalyzer(EquityRecorder, _name='equity', daily=memory_mode == 'low')
+    cerebro.addanalyzer(TradeLog, _name='tradelog')
+    if progress is not None:
+        cerebro.addanalyzer(ProgressAnalyzer, _name='progress', reporter=progress)
+    # Order/trade events cost a notification per fill, so only collect them when asked for or logged
+    if request.includeEvents or event_logger.isEnabledFor(logging.INFO):
+        cerebro.addanalyzer(BacktestEventLog, _name='events',
+                            capacity=request.maxEvents, sample_rate=request.eventSampleRate)
+    
+    timer.add('feeds', time.perf_counter() - feeds_started)
+    
+    # Run backtest
+    logger.info(f"Running backtest ({memory_mode} memory)...")
+    with timer.stage('run'):
         results = cerebro.run()
-        
-        # Extract results
-        strategy = results[0]
-        
-        # Get trade data
-        trades = getattr(strategy, 'trades', [])
-        daily_values = getattr(strategy, 'daily_values', [])
-        
-        # Calculate daily returns
-        daily_returns = []
-        for i in range(1, len(daily_values)):
-            prev_value = daily_values[i-1]['portfolioValue']
-            curr_value = daily_values[i]['portfolioValue']
-            daily_return = (curr_value - prev_value) / prev_value
-            cumulative_return = (curr_value - request.initialCapital) / request.initialCapital
-            
-            # Simple drawdown calculation
-            peak_value = max([d['portfolioValue'] for d in daily_values[:i+1]])
-            drawdown = (peak_value - curr_value) / peak_value
-            
-            daily_returns.append({
-                'date': daily_values[i]['date'],
-                'portfolioValue': curr_value,
-                'dailyReturn': daily_return,
-                'cumulativeReturn': cumulative_return,
-                'drawdown': drawdown
-            })
-        
-        # Get analyzer results
-        trade_analyzer = strategy.analyzers.trades.get_analysis()
-        sharpe_analyzer = strategy.analyzers.sharpe.get_analysis()
-        drawdown_analyzer = strategy.analyzers.drawdown.get_analysis()
-        
-        final_value = cerebro.broker.getvalue()
-        total_trades = trade_analyzer.get('total', {}).get('total', 0)
-        won_trades = trade_analyzer.get('won', {}).get('total', 0)
-        win_rate = (won_trades / total_trades * 100) if total_trades > 0 else 0
-        max_drawdown = drawdown_analyzer.get('max', {}).get('drawdown', 0) or 0
-        sharpe_ratio = sharpe_analyzer.get('sharperatio', 0) or 0
-        total_return = (final_value - request.initialCapital) / request.initialCapital
-        
-        # Calculate comprehensive metrics
-        metrics = calculate_performance_metrics(trades, daily_values, request.initialCapital)
-        
-        result = BacktestResult(
-            strategyId=request.strategyId,
-            startDate=request.startDate,
-            endDate=request.endDate,
-            initialCapital=request.initialCapital,
-            finalCapital=final_value,
-            totalTrades=total_trades,
-            winRate=win_rate,
-            maxDrawdown=max_drawdown,
-            sharpeRatio=sharpe_ratio,
-            totalReturn=total_return,
-            results={
-                'trades': trades,
-                'dailyReturns': daily_returns,
-                'metrics': metrics
-            }
-        )
-        
-        logger.info(f"Backtest completed for strategy {request.strategyId}")
-        logger.info(f"Final value: {final_value:.2f}, Total return: {total_return:.2%}")
-        
-        return result
-        
+    
+    # Extract results
+    analyzers_started = time.perf_counter()
+    strategy = results[0]
+    
+    # Get trade data
+    trades = strategy.analyzers.tradelog.get_analysis()
+    equity = strategy.analyzers.equity.get_analysis()
+    
+    # Per-bar return / cumulative return / drawdown series, shared with the metrics below
+    series = EquitySeries(equity['values'], request.initialCapital)
+    
+    # Get analyzer results
+    trade_analyzer = strategy.analyzers.trades.get_analysis()
+    sharpe_analyzer = strategy.analyzers.sharpe.get_analysis()
+    drawdown_analyzer = strategy.analyzers.drawdown.get_analysis()
+    
+    final_value = cerebro.broker.getvalue()
+    total_trades = trade_analyzer.get('total', {}).get('total', 0)
+    won_trades = trade_analyzer.get('won', {}).get('total', 0)
+    timer.add('analyzers', time.perf_counter() - analyzers_started)
+    
+    # Calculate comprehensive metrics
+    with timer.stage('metrics'):
+        metrics = calculate_series_metrics(trades, series, request.initialCapital)
+    
+    return {
+        'finalCapital': final_value,
+        'totalTrades': total_trades,
+        'winRate': (won_trades / total_trades * 100) if total_trades > 0 else 0,
+        'maxDrawdown': drawdown_analyzer.get('max', {}).get('drawdown', 0) or 0,
+        'sharpeRatio': sharpe_analyzer.get('sharperatio', 0) or 0,
+        'totalReturn': (final_value - request.initialCapital) / request.initialCapital,
+        'trades': trades,
+        'equity': equity,
+        'series': series,
+        'events': strategy.analyzers.events.get_analysis() if request.includeEvents else None,
+        'indicatorCache': strategy.indicator_memo.stats() if isinstance(strategy, CustomStrategy) else None,
+        'memoryMode': memory_mode,
+        'metrics': metrics
+    }
+
+def scored_from(run: Dict[str, Any], start: pd.Timestamp, initial_capital: float) -> Dict[str, Any]:
+    """The run with its equity series, Sharpe ratio and metrics restricted to bars from ``start`` on
+    
+    Meant for runs that did not trade before ``start``: their value there is still the
+    initial capital, so the final capital, return, trades and drawdown need no change.
+    """
+    equity = run['equity']
+    keep = equity['timestamps'] >= bt.date2num(start)
+    equity = {
+        'timestamps': equity['timestamps'][keep],
+        'values': equity['values'][keep],
+        'cash': equity['cash'][keep],
+        'positions': {name: values[keep] for name, values in equity['positions'].items()}
+    }
+    series = EquitySeries(equity['values'], initial_capital)
+    dates = pd.DatetimeIndex(bt_dates_to_iso(equity['timestamps']))
+    return {
+        **run,
+        'equity': equity,
+        'series': series,
+        'sharpeRatio': yearly_sharpe(dates, equity['values'], initial_capital) or 0,
+        'metrics': calculate_series_metrics(run['trades'], series, initial_capital)
+    }
+
+def run_engine(request: BacktestRequest, frames: Dict[str, pd.DataFrame],
+               progress: Optional[ProgressReporter] = None, checkpoint: Optional[Dict[str, Any]] = None,
+               timer: Optional[StageTimer] = None, trade_from: Optional[pd.Timestamp] = None) -> Dict[str, Any]:
+    """Run the backtest on the engine the request asks for; both return the same dict
+    
+    Only the vectorized engine uses ``checkpoint`` and returns a new one; Cerebro's
+    strategy and line buffers cannot be saved and resumed. With ``trade_from`` the bars
+    before it only warm up the indicators: nothing is traded or scored there.
+    """
+    run = None
+    if request.engine == "vectorized":
+        strategy = resolve_strategy(request.strategyCode)
+        signals = VECTORIZED_SIGNALS.get(strategy)
+        if signals is None:
+            raise ValueError(f"Strategy {strategy.__name__} is not supported by the vectorized engine")
+        if share_calendar(frames):
+            configure_event_logging(request.logLevel)
+            events = None
+            if request.includeEvents or event_logger.isEnabledFor(logging.INFO):
+                events = EventBuffer(request.maxEvents, request.eventSampleRate)
+            run = run_vectorized(frames, signals, {**dict(strategy.params._getitems()), **request.parameters},
+                                 request.initialCapital, COMMISSION, progress=progress, events=events,
+                                 checkpoint=checkpoint, timer=timer, trade_from=trade_from)
+            if not request.includeEvents:
+                run['events'] = None
+        else:
+            # Feeds on different calendars change which bars the strategy sees; only Cerebro models that
+            logger.warning("Symbols do not share a trading calendar; running the backtest on Cerebro")
+    if run is None:
+        run = run_cerebro(request, frames, progress, timer, trade_from)
+    return scored_from(run, trade_from, request.initialCapital) if trade_from is not None else run
+
+def load_shared_data(symbols: List[str], start_date: str, end_date: str, data_source: str = "yahoo") -> tuple:
+    """Acquire every symbol from the shared store, fetching only those not already there
+    
+    Returns ({symbol: SharedFrame} in request order, per-symbol timings). The caller must
+    pass the handles to ``shared_store.release`` once the job is done. Ranges ending today
+    or later are still receiving bars, so they are always fetched again.
+    """
+    source = get_data_source(data_source)
+    live = pd.Timestamp(end_date).normalize() >= pd.Timestamp.today().normalize()
+    versions = {symbol: source.version(symbol) for symbol in symbols}
+    handles = {}
+    timings = {}
+    missing = []
+    for symbol in symbols:
+        key = SharedMarketData.make_key(symbol, start_date, end_date, data_source)
+        handle = None if live else shared_store.get(key, versions[symbol])
+        if handle is None:
+            missing.append(symbol)
+        else:
+            handles[symbol] = handle
+            timings[symbol] = {'symbol': symbol, 'seconds': 0.0, 'status': 'ok', 'bars': len(handle), 'source': 'shared'}
+    
+    frames, load_timings = load_symbol_data(missing, start_date, end_date, data_source) if missing else ({}, [])
+    for symbol, data in frames.items():
+        handles[symbol] = shared_store.put(SharedMarketData.make_key(symbol, start_date, end_date, data_source), symbol,
+                                           data, versions[symbol])
+    for timing in load_timings:
+        timings[timing['symbol']] = timing
+    
+    ordered = {symbol: handles[symbol] for symbol in symbols if symbol in handles}
+    timings = [timings[symbol] for symbol in dict.fromkeys(symbols)]
+    observe_data_load(timings, data_source)
+    return ordered, timings
+
+@asynccontextmanager
+async def shared_frames(symbols: List[str], start_date: str, end_date: str, data_source: str = "yahoo"):
+    """Hold shared-store references to the symbols' data for the duration of a job"""
+    frames, data_load = await asyncio.to_thread(load_shared_data, symbols, start_date, end_date, data_source)
+    try:
+        yield frames, data_load
+    finally:
+        shared_store.release(frames.values())
+
+def execute_backtest(request: BacktestRequest, frames: Dict[str, Any], data_load: List[Dict[str, Any]],
+                     progress: Optional[ProgressReporter] = None,
+                     checkpoint: Optional[Dict[str, Any]] = None
+                     ) -> Tuple[BacktestResult, Optional[Dict[str, Any]], Dict[str, float]]:
+    """Run a backtest synchronously; executed inside a worker process
+    
+    Returns the result, the engine's end-of-run checkpoint (None for Cerebro) and the
+    wall seconds of the stages that ran here.
+    """
+    logger.info(f"Starting backtest for strategy {request.strategyId}")
+    
+    timer = StageTimer()
+    with timer.stage('feeds'):
+        frames = materialize(frames)
+    run = run_engine(request, frames, progress, checkpoint, timer)
+    
+    result_started = time.perf_counter()
+    result = BacktestResult(
+        strategyId=request.strategyId,
+        startDate=request.startDate,
+        endDate=request.endDate,
+        initialCapital=request.initialCapital,
+        finalCapital=run['finalCapital'],
+        totalTrades=run['totalTrades'],
+        winRate=run['winRate'],
+        maxDrawdown=run['maxDrawdown'],
+        sharpeRatio=run['sharpeRatio'],
+        totalReturn=run['totalReturn'],
+        results={
+            'trades': run['trades'],
+            # Columnar until the response, which renders it in the format the client negotiated
+            'dailyReturns': run['series'].to_columns(bt_dates_to_iso(run['equity']['timestamps'])),
+            'metrics': run['metrics'],
+            'dataLoad': data_load
+        }
+    )
+    if run['events'] is not None:
+        result.results['events'] = run['events']
+    if run.get('resumedFrom'):
+        result.results['resumedFrom'] = run['resumedFrom']
+    if run.get('memoryMode') == 'low':
+        result.results['memoryMode'] = 'low'
+    timer.add('result', time.perf_counter() - result_started)
+    
+    logger.info(f"Backtest completed for strategy {request.strategyId}")
+    logger.info(f"Final value: {run['finalCapital']:.2f}, Total return: {run['totalReturn']:.2%}")
+    
+    return result, run.get('checkpoint'), timer.seconds
+
+def checkpoint_key(request: BacktestRequest) -> str:
+    """Checkpoint slot of a request: everything but endDate and the event log options"""
+    fields = request.model_dump(exclude={'endDate', 'includeEvents', 'logLevel', 'eventSampleRate', 'maxEvents', 'resume',
+                                         'includeTimings'})
+    return request_fingerprint({**fields, 'checkpointVersion': CHECKPOINT_VERSION}, request.symbols)
+
+async def backtest_cached(request: BacktestRequest, frames: Dict[str, Any], data_load: List[Dict[str, Any]],
+                          progress: Optional[ProgressReporter] = None, wait: bool = False,
+                          timer: Optional[StageTimer] = None) -> BacktestResult:
+    """Serve the backtest from the result cache, or run it on the worker pool and cache it
+    
+    With ``wait`` a saturated pool delays the run instead of raising PoolSaturatedError.
+    The stages of the run are recorded in the metrics and added to ``timer``, whose
+    stages go to ``results.timings`` when the request includes timings.
+    """
+    timer = timer or StageTimer()
+    stages = StageTimer()
+    key = cached = None
+    with stages.stage('cacheLookup'):
+        if request.useCache and frames:
+            data_versions = [f"{symbol}:{handle.fingerprint}" for symbol, handle in frames.items()]
+            key = request_fingerprint(request.model_dump(exclude={'includeTimings'}), data_versions)
+            cached = result_cache.get(key)
+    if cached is not None:
+        logger.info(f"Serving backtest for strategy {request.strategyId} from result cache")
+        result = BacktestResult(**cached)
+        result.strategyId = request.strategyId
+        result.results = {**result.results, 'dataLoad': data_load}
+        result.cached = True
+        return _with_timings(request, result, timer, stages)
+    
+    # A checkpoint from an earlier endDate lets the engine simulate only the bars after it
+    checkpoint_id = checkpoint = None
+    if request.engine == "vectorized" and frames:
+        checkpoint_id = checkpoint_key(request)
+        if request.resume and not request.includeEvents:
+            checkpoint = checkpoint_store.get(checkpoint_id)
+    
+    submit = _submit_when_free if wait else worker_pool.submit
+    submitted = time.perf_counter()
+    result, new_checkpoint, worker_stages = await submit(execute_backtest, request, frames, data_load, progress, checkpoint)
+    for name, seconds in worker_stages.items():
+        stages.add(name, seconds)
+    # Waiting for a free worker and passing the request and result between processes
+    stages.add('dispatch', max(time.perf_counter() - submitted - sum(worker_stages.values()), 0.0))
+    if key is not None:
+        result_cache.put(key, result.model_dump())
+    if new_checkpoint is not None:
+        checkpoint_store.put(checkpoint_id, new_checkpoint)
+    return _with_timings(request, result, timer, stages)
+
+def _with_timings(request: BacktestRequest, result: BacktestResult, timer: StageTimer, stages: StageTimer) -> BacktestResult:
+    observe_stages(stages.seconds, request.engine)
+    results_total.inc(request.engine, 'hit' if result.cached else 'miss')
+    for name, seconds in stages.seconds.items():
+        timer.add(name, seconds)
+    if request.includeTimings:
+        result.results['timings'] = timer.rounded()
+    return result
+
+def result_format(http_request: Request) -> str:
+    """Result format negotiated from the Accept header; 406 if none of the offered ones is acceptable"""
+    media_type = negotiate(http_request.headers.get("accept"))
+    if media_type is None:
+        raise HTTPException(status_code=406, detail=f"Supported result formats: {', '.join(available_formats())}")
+    return media_type
+
+async def render_result(result: BacktestResult, media_type: str, http_request: Request,
+                        headers: Optional[Dict[str, str]] = None, timer: Optional[StageTimer] = None) -> Response:
+    """Encode and compress a backtest result off the event loop; ``timer`` gets the ``serialization`` stage"""
+    def encode():
+        with (timer or StageTimer()).stage('serialization'):
+            return compress(encode_result(result, media_type), http_request.headers.get("accept-encoding"))
+    
+    body, encoding = await asyncio.to_thread(encode)
+    headers = {**(headers or {}), "Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+def no_data_message(request: BacktestRequest) -> str:
+    return (f"No data for {', '.join(request.symbols)} between {request.startDate} and {request.endDate} "
+            f"from data source '{request.dataSource}'")
+
+@app.post("/backtest", response_model=BacktestResult)
+async def run_backtest(request: BacktestRequest, http_request: Request) -> Response:
+    """Run backtest using Backtrader
+    
+    The result format follows the Accept header (row JSON by default, or columnar JSON,
+    Arrow IPC or MessagePack) and is compressed per Accept-Encoding.
+    """
+    timer = StageTimer()
+    media_type = result_format(http_request)
+    check_strategy(request.strategyCode, request.engine)
+    # From receiving the request, so reading and parsing the body count too
+    timer.add('validation', time.perf_counter() - http_request.state.received)
+    try:
+        fetch_started = time.perf_counter()
+        async with shared_frames(request.symbols, request.startDate, request.endDate, request.dataSource) as (frames, data_load):
+            timer.add('dataFetch', time.perf_counter() - fetch_started)
+            if not frames:
+                raise HTTPException(status_code=400, detail=no_data_message(request))
+            result = await backtest_cached(request, frames, data_load, timer=timer)
+        response = await render_result(result, media_type, http_request,
+                                       {"X-Backtest-Cache": "HIT" if result.cached else "MISS"}, timer)
+        observe_stages({name: timer.seconds[name] for name in ('validation', 'dataFetch', 'serialization')},
+                       request.engine)
+        if request.includeTimings:
+            response.headers["Server-Timing"] = server_timing(timer.seconds)
+        return response
+    except HTTPException:
+        raise
+    except PoolSaturatedError as e:
+        logger.warning(f"Rejecting backtest for strategy {request.strategyId}: {e}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    except JobLimitExceeded as e:
+        logger.error(f"Backtest for strategy {request.strategyId} aborted: {e}")
+        raise HTTPException(status_code=504, detail=f"Backtest aborted: {e}")
+    except StrategyError as e:
+        raise HTTPException(status_code=400, detail={"errors": e.errors})
     except Exception as e:
         logger.error(f"Backtest failed: {e}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Backtest failed: {str(e)}")
 
+def batch_row(run_id: str, run: BatchRun, result: Optional[BacktestResult] = None,
+              error: Optional[str] = None) -> Dict[str, Any]:
+    """Summary row of one batch run; failed runs carry only the error"""
+    row = {'id': run_id, 'symbols': run.symbols, 'parameters': run.parameters, 'error': error}
+    if result is not None:
+        row.update(
+            finalCapital=result.finalCapital,
+            totalReturn=result.totalReturn,
+            totalTrades=result.totalTrades,
+            winRate=result.winRate,
+            maxDrawdown=result.maxDrawdown,
+            sharpeRatio=result.sharpeRatio,
+            metrics=result.results['metrics'],
+            cached=result.cached
+        )
+    return row
+
+@app.post("/backtest/batch", response_model=BatchBacktestResult)
+async def run_backtest_batch(request: BatchBacktestRequest) -> BatchBacktestResult:
+    """Run many independent backtests (strategy, parameters, symbols) in one call
+    
+    The union of all runs' symbols is loaded once into the shared store; runs are then
+    spread over the worker pool with at most one per worker in flight, so a large
+    batch queues behind itself instead of getting 429s or starving other requests.
+    Returns rows ranked by ``rankBy``, an aggregate summary and, with
+    ``includeResults``, every run's full result.
+    """
+    for index, run in enumerate(request.runs):
+        try:
+            check_strategy(run.strategyCode, request.engine)
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail={"run": run.id or str(index), **e.detail})
+    
+    started = time.perf_counter()
+    symbols = list(dict.fromkeys(symbol for run in request.runs for symbol in run.symbols))
+    base = request.model_dump(exclude={'runs', 'rankBy', 'ascending', 'includeResults'})
+    slots = asyncio.Semaphore(worker_pool.max_workers)
+    
+    async def backtest(index: int, run: BatchRun):
+        run_id = run.id or str(index)
+        run_frames = {symbol: frames[symbol] for symbol in run.symbols if symbol in frames}
+        if not run_frames:
+            return batch_row(run_id, run, error="No valid data feeds added"), None
+        run_request = BacktestRequest(**{**base, 'strategyId': f"{request.strategyId}:{run_id}",
+                                         'strategyCode': run.strategyCode, 'parameters': run.parameters,
+                                         'symbols': list(run_frames)})
+        async with slots:
+            try:
+                result = await backtest_cached(run_request, run_frames, [timings[s] for s in run.symbols], wait=True)
+            except JobLimitExceeded as e:
+                return batch_row(run_id, run, error=f"Backtest aborted: {e}"), None
+            except StrategyError as e:
+                return batch_row(run_id, run, error='; '.join(e.errors)), None
+            except Exception as e:
+                return batch_row(run_id, run, error=str(e)), None
+        return batch_row(run_id, run, result), result
+    
+    async with shared_frames(symbols, request.startDate, request.endDate, request.dataSource) as (frames, data_load):
+        timings = {timing['symbol']: timing for timing in data_load}
+        outcomes = await asyncio.gather(*(backtest(index, run) for index, run in enumerate(request.runs)))
+    
+    rows = [row for row, _ in outcomes]
+    response = BatchBacktestResult(
+        strategyId=request.strategyId,
+        startDate=request.startDate,
+        endDate=request.endDate,
+        rankBy=request.rankBy,
+        summary=aggregate_runs(rows),
+        runs=rank_trials(rows, request.rankBy, request.ascending),
+        dataLoad=data_load,
+        seconds=round(time.perf_counter() - started, 4)
+    )
+    if request.includeResults:
+        response.results = {
+            row['id']: {**result.model_dump(), 'results': {
+                **result.results, 'dailyReturns': columns_to_records(result.results.get('dailyReturns') or {})}}
+            for row, result in outcomes if result is not None
+        }
+    logger.info(f"Batch {request.strategyId} ran {len(rows)} backtests over {len(symbols)} symbols "
+                f"in {response.seconds:.2f}s")
+    return response
+
+@app.post("/analysis/montecarlo", response_model=MonteCarloResult)
+async def run_monte_carlo(request: MonteCarloRequest) -> MonteCarloResult:
+    """Resample a backtest's trades into many equity paths and return the spread of outcomes
+    
+    ``trades`` takes a backtest result's ``results.trades`` as is. Blocks of paths run
+    in parallel on the worker pool, at most one per worker at a time.
+    """
+    started = time.perf_counter()
+    seed = request.seed if request.seed is not None else int(np.random.SeedSequence().entropy % 2**63)
+    pnl = net_pnl(request.trades)
+    periods_per_year = trades_per_year(request.trades)
+    # Keep at most one block per worker in flight so any number of paths fits the pool's queue
+    slots = asyncio.Semaphore(worker_pool.max_workers)
+    
+    async def simulate_block(block, paths):
+        async with slots:
+            return await worker_pool.submit(simulate, pnl, request.initialCapital, paths, request.method,
+                                            (seed, block), periods_per_year)
+    
+    tasks = [asyncio.create_task(simulate_block(block, paths)) for block, paths in enumerate(split_paths(request.paths))]
+    try:
+        results = await asyncio.gather(*tasks)
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    except JobLimitExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Monte Carlo analysis aborted: {e}")
+    finally:
+        # One failed block fails the analysis (as does a disconnected client): drop the blocks not yet run
+        for task in tasks:
+            task.cancel()
+    
+    response = summarize_paths(request, seed, periods_per_year, results, round(time.perf_counter() - started, 4))
+    logger.info(f"Monte Carlo ran {request.paths} {request.method} paths over {len(pnl)} trades "
+                f"in {response.seconds:.3f}s")
+    return response
+
+def execute_trial(request: BacktestRequest, frames: Dict[str, Any], window: Optional[tuple] = None,
+                  trade_from: Optional[str] = None) -> Dict[str, Any]:
+    """Run one parameter combination of an optimization; returns only the summary row
+    
+    ``window`` (start, end) restricts the run to those dates of the already loaded frames;
+    with ``trade_from`` the window's bars before it only warm up the indicators.
+    """
+    frames = materialize(frames)
+    if window is not None:
+        frames = slice_frames(frames, *window)
+    run = run_engine(request, frames, trade_from=pd.Timestamp(trade_from) if trade_from is not None else None)
+    return {
+        'parameters': request.parameters,
+        'finalCapital': run['finalCapital'],
+        'totalReturn': run['totalReturn'],
+        'totalTrades': run['totalTrades'],
+        'winRate': run['winRate'],
+        'maxDrawdown': run['maxDrawdown'],
+        'sharpeRatio': run['sharpeRatio'],
+        'metrics': run['metrics'],
+        # Indicators this run replayed from / added to the worker's indicator cache (Cerebro only)
+        'indicatorCache': run.get('indicatorCache'),
+        'error': None
+    }
+
+def _start_job(job, coro):
+    task = asyncio.create_task(coro)
+    job.task = task
+    _job_tasks.add(task)
+    task.add_done_callback(_job_tasks.discard)
+
+async def _submit_when_free(fn, *args):
+    """Submit to the worker pool, waiting for room instead of failing when it is saturated"""
+    while True:
+        try:
+            return await worker_pool.submit(fn, *args)
+        except PoolSaturatedError:
+            await asyncio.sleep(0.5)
+
+async def _run_optimization(job, request: OptimizeRequest, grid: List[Dict[str, Any]], windows=None):
+    # Data is loaded once here and mapped by every combination's worker
+    async with shared_frames(request.symbols, request.startDate, request.endDate, request.dataSource) as (frames, data_load):
+        if not frames:
+            job.fail("No valid data feeds added")
+            return
+        if windows is not None:
+            await _run_walk_forward(job, request, grid, windows, frames, data_load)
+        else:
+            await _run_trials(job, request, grid, frames, data_load)
+
+def _trial_base(request: OptimizeRequest) -> Dict[str, Any]:
+    """BacktestRequest fields shared by every trial of an optimization"""
+    return request.model_dump(exclude={'parameterRanges', 'rankBy', 'ascending', 'maxCombinations', 'mode', 'walkForward'})
+
+async def _trial(request: BacktestRequest, frames: Dict[str, Any], slots: asyncio.Semaphore,
+                 window: Optional[tuple] = None, trade_from: Optional[str] = None) -> Dict[str, Any]:
+    """Run one trial on the pool once a slot is free; a failure becomes the row's error"""
+    async with slots:
+        try:
+            return await _submit_when_free(execute_trial, request, frames, window, trade_from)
+        except JobLimitExceeded as e:
+            return {'parameters': request.parameters, 'error': f"Trial aborted: {e}"}
+        except Exception as e:
+            return {'parameters': request.parameters, 'error': str(e)}
+
+async def _gather_trials(job, tasks: List[asyncio.Task]) -> List[Any]:
+    try:
+        return await asyncio.gather(*tasks)
+    except asyncio.CancelledError:
+        # Cancelling the job drops every combination that has not reached a worker yet
+        for task in tasks:
+            task.cancel()
+        logger.info(f"{job.kind} job {job.id} cancelled after "
+                    f"{job.progress.get('combinationsCompleted', 0)}/{job.progress.get('totalCombinations', 0)} combinations")
+        raise
+
+async def _run_trials(job, request: OptimizeRequest, grid: List[Dict[str, Any]], frames: Dict[str, Any],
+                      data_load: List[Dict[str, Any]]):
+    base = _trial_base(request)
+    # Keep at most one trial per worker in flight so other requests can still use the pool
+    slots = asyncio.Semaphore(worker_pool.max_workers)
+    completed = 0
+    
+    async def trial(parameters):
+        nonlocal completed
+        row = await _trial(BacktestRequest(**{**base, 'parameters': parameters}), frames, slots)
+        completed += 1
+        job.update_progress({'combinationsCompleted': completed})
+        return row
+    
+    job.update_progress({'combinationsCompleted': 0, 'totalCombinations': len(grid)})
+    trials = await _gather_trials(job, [asyncio.create_task(trial(parameters)) for parameters in grid])
+    
+    ranked = rank_trials(list(trials), request.rankBy, request.ascending)
+    job.complete({
+        'strategyId': request.strategyId,
+        'rankBy': request.rankBy,
+        'totalCombinations': len(grid),
+        'best': ranked[0] if ranked and ranked[0]['rank'] is not None else None,
+        'trials': ranked,
+        'indicatorCache': total_stats(trial.get('indicatorCache') for trial in trials),
+        'dataLoad': data_load
+    })
+    logger.info(f"Optimization job {job.id} completed {len(grid)} combinations")
+
+async def _run_walk_forward(job, request: OptimizeRequest, grid: List[Dict[str, Any]], windows: list,
+                            frames: Dict[str, Any], data_load: List[Dict[str, Any]]):
+    """Optimize on each in-sample window and run the winner on the out-of-sample period after it
+    
+    Every window's trials go to the pool at once, sharing the slots; a window's
+    out-of-sample run starts as soon as its own grid is ranked. All runs slice the
+    same shared frames loaded for the whole date range. The out-of-sample run also
+    gets the in-sample bars before it, so its indicators are warmed up when the
+    period starts; it only trades and is scored from there.
+    """
+    base = _trial_base(request)
+    slots = asyncio.Semaphore(worker_pool.max_workers)
+    completed = 0
+    windows_completed = 0
+    
+    async def trial(parameters, start_date, end_date, warmup_from=None):
+        nonlocal completed
+        trial_request = BacktestRequest(**{**base, 'parameters': parameters, 'startDate': start_date, 'endDate': end_date})
+        if warmup_from is None:
+            row = await _trial(trial_request, frames, slots, (start_date, end_date))
+        else:
+            row = await _trial(trial_request, frames, slots, (warmup_from, end_date), start_date)
+        completed += 1
+        job.update_progress({'combinationsCompleted': completed})
+        return row
+    
+    async def walk(window):
+        nonlocal windows_completed
+        in_sample = await asyncio.gather(*(trial(p, window.inSampleStart, window.inSampleEnd) for p in grid))
+        ranked = rank_trials(list(in_sample), request.rankBy, request.ascending)
+        best = ranked[0] if ranked and ranked[0]['rank'] is not None else None
+        out_of_sample = None
+        if best is not None:
+            out_of_sample = await trial(best['parameters'], window.outOfSampleStart, window.outOfSampleEnd,
+                                        window.inSampleStart)
+        windows_completed += 1
+        job.update_progress({'windowsCompleted': windows_completed})
+        return {
+            **window.model_dump(),
+            'parameters': best['parameters'] if best is not None else None,
+            'inSample': best,
+            'outOfSample': out_of_sample,
+            'trialsFailed': sum(1 for row in ranked if row['rank'] is None)
+        }
+    
+    job.update_progress({
+        'combinationsCompleted': 0,
+        # Each window runs the grid in-sample plus the winner once out-of-sample
+        'totalCombinations': len(windows) * (len(grid) + 1),
+        'windowsCompleted': 0,
+        'totalWindows': len(windows)
+    })
+    results = await _gather_trials(job, [asyncio.create_task(walk(window)) for window in windows])
+    
+    job.complete({
+        'strategyId': request.strategyId,
+        'mode': request.mode,
+        'rankBy': request.rankBy,
+        'walkForward': request.walkForward.model_dump(),
+        'windows': results,
+        'outOfSample': summarize(results, request.initialCapital),
+        'dataLoad': data_load
+    })
+    logger.info(f"Walk-forward job {job.id} completed {len(windows)} windows of {len(grid)} combinations")
+
+async def _run_job(job_id: str, request: BacktestRequest):
+    job = job_registry.get(job_id)
+    timer = StageTimer()
+    try:
+        fetch_started = time.perf_counter()
+        async with shared_frames(request.symbols, request.startDate, request.endDate, request.dataSource) as (frames, data_load):
+            timer.add('dataFetch', time.perf_counter() - fetch_started)
+            observe_stages({'dataFetch': timer.seconds['dataFetch']}, request.engine)
+            if not frames:
+                job.fail(no_data_message(request))
+                logger.warning(f"Backtest job {job_id} has no data")
+                return
+            result = await backtest_cached(request, frames, data_load,
+                                           job_registry.reporter(job_id, request.progressInterval), timer=timer)
+        job.complete(result)
+        logger.info(f"Backtest job {job_id} completed")
+    except JobLimitExceeded as e:
+        job.fail(f"Backtest aborted: {e}")
+        logger.error(f"Backtest job {job_id} aborted: {e}")
+    except Exception as e:
+        job.fail(str(e))
+        logger.error(f"Backtest job {job_id} failed: {e}")
+        logger.error(traceback.format_exc())
+
+@app.post("/jobs", status_code=202)
+async def submit_backtest_job(request: BacktestRequest):
+    """Submit a backtest and return immediately with a job id to poll"""
+    check_strategy(request.strategyCode, request.engine)
+    if worker_pool.saturated:
+        raise HTTPException(status_code=429, detail="Backtest queue is full", headers={"Retry-After": "5"})
+    
+    job = job_registry.create(request.strategyId)
+    _start_job(job, _run_job(job.id, request))
+    
+    logger.info(f"Queued backtest job {job.id} for strategy {request.strategyId}")
+    return job.to_dict()
+
+@app.post("/optimize", status_code=202)
+async def submit_optimization(request: OptimizeRequest):
+    """Run a parameter grid search across the worker pool as a job; poll /jobs/{id} for progress
+    
+    With ``mode: "walk_forward"`` the grid is searched on each in-sample window of
+    ``walkForward`` and the best combination is evaluated on the out-of-sample period.
+    """
+    check_strategy(request.strategyCode, request.engine)
+    try:
+        grid = expand_grid(request.parameterRanges, request.parameters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not grid:
+        raise HTTPException(status_code=400, detail="parameterRanges produce no combinations")
+    if len(grid) > request.maxCombinations:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{len(grid)} combinations exceed maxCombinations ({request.maxCombinations})"
+        )
+    
+    if request.mode == "walk_forward":
+        if request.walkForward is None:
+            raise HTTPException(status_code=400, detail="walkForward is required in walk_forward mode")
+        windows = split_windows(request.startDate, request.endDate, request.walkForward)
+        if not windows:
+            raise HTTPException(status_code=400, detail="Date range is shorter than one in-sample and out-of-sample window")
+        if len(windows) > request.walkForward.maxWindows:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{len(windows)} windows exceed walkForward.maxWindows ({request.walkForward.maxWindows})"
+            )
+        job = job_registry.create(request.strategyId, kind='walk_forward')
+        _start_job(job, _run_optimization(job, request, grid, windows))
+        logger.info(f"Queued walk-forward job {job.id} with {len(windows)} windows of {len(grid)} combinations")
+        return job.to_dict()
+    
+    job = job_registry.create(request.strategyId, kind='optimize')
+    _start_job(job, _run_optimization(job, request, grid))
+    
+    logger.info(f"Queued optimization job {job.id} with {len(grid)} combinations")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}")
+async def get_backtest_job(job_id: str):
+    """Get status and progress of a backtest job"""
+    job = job_registry.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.delete("/jobs/{job_id}")
+async def cancel_backtest_job(job_id: str):
+    """Cancel a queued or running job"""
+    job = job_registry.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.cancel():
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    logger.info(f"Cancelled job {job_id}")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/result")
+async def get_backtest_job_result(job_id: str, http_request: Request):
+    """Get the result of a finished job; answers 202 while it is still running
+    
+    Backtest results are negotiated and compressed like those of POST /backtest.
+    """
+    job = job_registry.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == 'failed':
+        raise HTTPException(status_code=500, detail=f"Backtest failed: {job.error}")
+    if job.status == 'cancelled':
+        raise HTTPException(status_code=409, detail="Job was cancelled")
+    if not job.finished:
+        return JSONResponse(status_code=202, content=job.to_dict())
+    if isinstance(job.result, BacktestResult):
+        return await render_result(job.result, result_format(http_request), http_request)
+    # Optimization results are plain dicts whose metrics can be inf (profitFactor without losses)
+    return JSONResponse(content=json_safe(job.result))
+
+# Comment line sent on idle streams so proxies do not time the connection out
+STREAM_HEARTBEAT_SECONDS = 15
+
+async def job_frames(job):
+    """Yield (event, data) frames for a job: its current state, each progress update, then 'done'"""
+    frames = job.subscribe()
+    try:
+        yield 'status', job.to_dict()
+        if job.finished:
+            yield 'done', job.to_dict()
+            return
+        while True:
+            try:
+                event, data = await asyncio.wait_for(frames.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield 'heartbeat', None
+                continue
+            yield event, data
+            if event == 'done':
+                return
+    finally:
+        job.unsubscribe(frames)
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_backtest_job(job_id: str):
+    """Stream a job's progress as Server-Sent Events until it finishes"""
+    job = job_registry.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        async for event, data in job_frames(job):
+            if event == 'heartbeat':
+                yield ": heartbeat\n\n"
+            else:
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/jobs/{job_id}/ws")
+async def stream_backtest_job_ws(websocket: WebSocket, job_id: str):
+    """Stream a job's progress over a WebSocket as {"event", "data"} messages until it finishes"""
+    await websocket.accept()
+    job = job_registry.get(job_id)
+    if job is None:
+        await websocket.close(code=4404, reason="Job not found")
+        return
+    try:
+        async for event, data in job_frames(job):
+            if event != 'heartbeat':
+                await websocket.send_text(json.dumps({'event': event, 'data': data}, default=str))
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info(f"Stream client for job {job_id} disconnected")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""Scaling benchmark for the dailyReturns / drawdown series builder
+
+Run from the service directory:
+
+    python -m benchmarks.equity_series
+
+Time per bar should stay flat from 1k to 1M bars; the old builder recomputed the
+running peak from scratch on every bar and was quadratic.
+"""
+import time
+
+import numpy as np
+
+from metrics import EquitySeries, compute_metrics
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+
+def synthetic_equity_curve(bars: int, seed: int = 42) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return 100000 * np.exp(np.cumsum(rng.normal(0.0002, 0.01, bars)))
+
+
+def best_of(fn, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    print(f"{'bars':>10} {'series (s)':>12} {'records (s)':>12} {'metrics (s)':>12} {'ns/bar':>8}")
+    for bars in SIZES:
+        values = synthetic_equity_curve(bars)
+        dates = [str(i) for i in range(bars)]
+        series_time = best_of(lambda: EquitySeries(values, 100000))
+        series = EquitySeries(values, 100000)
+        records_time = best_of(lambda: series.to_records(dates))
+        metrics_time = best_of(lambda: compute_metrics(values, [], 100000, series))
+        total = series_time + records_time + metrics_time
+        print(f"{bars:>10} {series_time:>12.4f} {records_time:>12.4f} {metrics_time:>12.4f} {total / bars * 1e9:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Peak memory of Cerebro runs in standard and low-memory mode
+
+Run from the service directory:
+
+    python -m benchmarks.memory                       # 100k and 1M bars, 1 symbol
+    python -m benchmarks.memory --bars 250000 --symbols 4
+
+Each run happens in a fresh process that publishes synthetic hourly bars to a shared
+store and maps them back, as the API does for its workers, then runs the
+moving-average strategy. The table reports the process's resident memory before the
+run, its peak during the run and the difference, plus the wall time. The script
+exits non-zero if the two modes end with a different final capital.
+"""
+import argparse
+import gc
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+MODES = ('standard', 'low')
+
+
+def _status_kb(field: str) -> Optional[int]:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak() -> bool:
+    """Reset the kernel's peak-RSS mark (VmHWM) so it only covers what follows"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def measure(mode: str, bars: int, symbols: int) -> Dict[str, float]:
+    """One run in this process; meant to be called in a fresh child"""
+    import logging
+
+    from app import run_cerebro
+    from benchmarks.suite import backtest_request, synthetic_frames
+    from shared_data import SharedMarketData, materialize
+
+    logging.getLogger().setLevel(logging.WARNING)
+    root = tempfile.mkdtemp(prefix='engine-memory-')
+    try:
+        store = SharedMarketData(root=root, max_bytes=0)
+        generated = synthetic_frames(bars, symbols)
+        request = backtest_request(generated).model_copy(update={'memoryMode': mode})
+        handles = {symbol: store.put(symbol, symbol, frame) for symbol, frame in generated.items()}
+        del generated
+        gc.collect()
+
+        frames = materialize(handles)
+        exact = _reset_peak()
+        before = _status_kb('VmRSS') or 0
+        started = time.perf_counter()
+        run = run_cerebro(request, frames)
+        seconds = time.perf_counter() - started
+        # ru_maxrss covers the whole process (including data generation) when VmHWM cannot be reset
+        peak = _status_kb('VmHWM') if exact else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {'beforeMb': before / 1024, 'peakMb': peak / 1024, 'seconds': seconds,
+                'finalCapital': run['finalCapital'], 'exactPeak': exact}
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def run_child(mode: str, bars: int, symbols: int) -> Dict[str, float]:
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.memory', '--child', mode, str(bars), str(symbols)],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bars', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--symbols', type=int, default=1)
+    parser.add_argument('--child', nargs=3, metavar=('MODE', 'BARS', 'SYMBOLS'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        mode, bars, symbols = args.child
+        print(json.dumps(measure(mode, int(bars), int(symbols))))
+        return 0
+
+    failures = 0
+    print(f"{'bars':>9} {'syms':>5} {'mode':>9} {'before (MB)':>12} {'peak (MB)':>10} {'run (MB)':>9} {'seconds':>8}")
+    for bars in args.bars:
+        capitals = set()
+        for mode in MODES:
+            result = run_child(mode, bars, args.symbols)
+            capitals.add(result['finalCapital'])
+            print(f"{bars:>9} {args.symbols:>5} {mode:>9} {result['beforeMb']:>12.1f} {result['peakMb']:>10.1f} "
+                  f"{result['peakMb'] - result['beforeMb']:>9.1f} {result['seconds']:>8.2f}"
+                  + ('' if result['exactPeak'] else '  (peak includes setup)'), flush=True)
+        if len(capitals) > 1:
+            print(f"  final capital differs between modes: {sorted(capitals)}")
+            failures += 1
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,391 @@
+"""Offline benchmark suite for the backtrader engine
+
+Run from the service directory:
+
+    python -m benchmarks.suite                      # default profile, results saved for this commit
+    python -m benchmarks.suite --profile quick -k cerebro
+    python -m benchmarks.suite --compare HEAD~1     # ratios against the results saved for another commit
+
+Every case runs on synthetic hourly OHLCV bars (no network access) for each bar
+count and symbol count of the profile, from 1k up to 1M bars. The cases cover the
+stages of a backtest: normalizing and caching downloaded data, reading local data
+files, publishing it to the shared store, building the Backtrader feeds, the Cerebro and vectorized runs, the
+metrics, and serializing the result in every response format. Results go to
+``.cache/benchmarks/<commit>.json`` (or ``--results-dir``) along with the versions
+of the libraries involved, so runs on the same machine can be compared across
+commits. ``--max-regression`` makes the comparison fail the process for CI.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+import shared_data
+from app import BacktestRequest, BacktestResult, bt_dates_to_iso, run_cerebro, run_engine
+from data_cache import OHLCVCache, normalize_ohlcv
+from data_sources import LocalDataSource
+from indicator_cache import indicator_cache
+from metrics import EquitySeries, calculate_performance_metrics, calculate_series_metrics
+from monte_carlo import MonteCarloTrade, net_pnl, simulate, trades_per_year
+from result_format import ARROW, COLUMNAR, MSGPACK, ROWS, available_formats, columns_to_records, compress, encode_result
+from shared_data import SharedMarketData
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_RESULTS_DIR = os.path.join(SERVICE_DIR, '.cache', 'benchmarks')
+
+PROFILES = {
+    'quick': {'bars': (1_000, 10_000), 'symbols': (1,), 'scale': 1},
+    'default': {'bars': (1_000, 10_000, 100_000), 'symbols': (1, 10), 'scale': 1},
+    # Lifts every case's size cap tenfold, so Cerebro also runs 1M bars
+    'full': {'bars': (1_000, 10_000, 100_000, 1_000_000), 'symbols': (1, 10), 'scale': 10},
+}
+
+# Keep repeating a fast case until it has run this long, then report the best run
+MIN_CASE_SECONDS = 1.0
+MAX_REPEAT = 7
+START = '1990-01-01'
+
+
+def synthetic_ohlcv(bars: int, seed: int = 7) -> pd.DataFrame:
+    """Geometric random walk with consistent OHLC and hourly timestamps (1M bars end in 2104)"""
+    rng = np.random.default_rng(seed)
+    close = 1000 * np.exp(np.cumsum(rng.normal(0.00002, 0.004, bars)))
+    open_ = close * np.exp(rng.normal(0, 0.001, bars))
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) * 1.002,
+        'Low': np.minimum(open_, close) * 0.998,
+        'Close': close,
+        'Volume': rng.integers(1_000, 100_000, bars).astype(float)
+    }, index=pd.date_range(START, periods=bars, freq='h', name='Date'))
+
+
+def synthetic_frames(bars: int, symbols: int) -> Dict[str, pd.DataFrame]:
+    return {f"SYM{i}": synthetic_ohlcv(bars, seed=7 + i) for i in range(symbols)}
+
+
+def end_date(frames: Dict[str, pd.DataFrame]) -> str:
+    last = max(frame.index[-1] for frame in frames.values())
+    return (last + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+def backtest_request(frames: Dict[str, pd.DataFrame], engine: str = 'backtrader') -> BacktestRequest:
+    return BacktestRequest(strategyId='benchmark', strategyCode='MovingAverageCross', parameters={},
+                           startDate=START, endDate=end_date(frames), initialCapital=100000,
+                           symbols=list(frames), engine=engine)
+
+
+def backtest_result(frames: Dict[str, pd.DataFrame]) -> BacktestResult:
+    """What execute_backtest builds, from a vectorized run so large sizes stay cheap to prepare"""
+    request = backtest_request(frames, 'vectorized')
+    run = run_engine(request, frames)
+    return BacktestResult(
+        strategyId=request.strategyId, startDate=request.startDate, endDate=request.endDate,
+        initialCapital=request.initialCapital, finalCapital=run['finalCapital'], totalTrades=run['totalTrades'],
+        winRate=run['winRate'], maxDrawdown=run['maxDrawdown'], sharpeRatio=run['sharpeRatio'],
+        totalReturn=run['totalReturn'],
+        results={
+            'trades': run['trades'],
+            'dailyReturns': run['series'].to_columns(bt_dates_to_iso(run['equity']['timestamps'])),
+            'metrics': run['metrics'],
+            'dataLoad': []
+        }
+    )
+
+
+class Case:
+    def __init__(self, name: str, setup: Callable, max_size: Optional[int], cleanup: Optional[Callable]):
+        self.name = name
+        self.setup = setup
+        # Cap on bars * symbols, for the cases that would take minutes beyond it
+        self.max_size = max_size
+        self.cleanup = cleanup
+
+
+CASES: List[Case] = []
+
+
+def case(name: str, max_size: Optional[int] = None, cleanup: Optional[Callable] = None):
+    """Register ``setup(frames) -> fn``; only ``fn()`` is timed"""
+    def register(setup):
+        CASES.append(Case(name, setup, max_size, cleanup))
+        return setup
+    return register
+
+
+@case('data.normalize')
+def _normalize(frames):
+    # yfinance returns (field, ticker) columns, newest rows possibly duplicated
+    downloaded = {
+        symbol: pd.concat([frame, frame.tail(5)]).set_axis(
+            pd.MultiIndex.from_product([frame.columns, [symbol]]), axis=1)
+        for symbol, frame in frames.items()
+    }
+    return lambda: [normalize_ohlcv(frame) for frame in downloaded.values()]
+
+
+_scratch_dirs: List[str] = []
+
+
+def _scratch_dir() -> str:
+    path = tempfile.mkdtemp(prefix='engine-bench-')
+    _scratch_dirs.append(path)
+    return path
+
+
+def _remove_scratch_dirs():
+    while _scratch_dirs:
+        shutil.rmtree(_scratch_dirs.pop(), ignore_errors=True)
+
+
+@case('data.parquet_cache.cold', cleanup=_remove_scratch_dirs)
+def _parquet_cold(frames):
+    end = end_date(frames)
+
+    def load():
+        cache = OHLCVCache(_scratch_dir(), lambda symbol, start, stop: frames[symbol])
+        return [cache.get(symbol, START, end) for symbol in frames]
+    return load
+
+
+@case('data.parquet_cache.warm', cleanup=_remove_scratch_dirs)
+def _parquet_warm(frames):
+    end = end_date(frames)
+    cache = OHLCVCache(_scratch_dir(), lambda symbol, start, stop: frames[symbol])
+    for symbol in frames:
+        cache.get(symbol, START, end)
+    return lambda: [cache.get(symbol, START, end) for symbol in frames]
+
+
+@case('data.local_source', cleanup=_remove_scratch_dirs)
+def _local_source(frames):
+    root = _scratch_dir()
+    for symbol, frame in frames.items():
+        frame.to_parquet(os.path.join(root, f"{symbol}.parquet"))
+    end = end_date(frames)
+
+    def load():
+        # A fresh provider per call, so every file is read and parsed
+        source = LocalDataSource(root)
+        return [source.fetch(symbol, START, end) for symbol in frames]
+    return load
+
+
+@case('data.shared_store', cleanup=_remove_scratch_dirs)
+def _shared_store(frames):
+    store = SharedMarketData(root=_scratch_dir(), max_bytes=0)
+
+    def publish_and_map():
+        handles = [store.put(symbol, symbol, frame) for symbol, frame in frames.items()]
+        mapped = [handle.to_frame() for handle in handles]
+        store.release(handles)
+        shared_data._attached.clear()
+        return mapped
+    return publish_and_map
+
+
+@case('feed.construction', max_size=100_000)
+def _feeds(frames):
+    def build():
+        cerebro = bt.Cerebro()
+        for symbol, frame in frames.items():
+            cerebro.adddata(bt.feeds.PandasData(dataname=frame, name=symbol))
+        # What Cerebro does with each data before the first bar
+        for feed in cerebro.datas:
+            feed.reset()
+            feed._start()
+            feed.preload()
+        return cerebro
+    return build
+
+
+@case('engine.cerebro', max_size=100_000)
+def _cerebro(frames):
+    request = backtest_request(frames)
+
+    def run():
+        # A worker's first run over the data: every indicator is computed
+        indicator_cache.clear()
+        return run_cerebro(request, frames)
+    return run
+
+
+@case('engine.cerebro.memoized', max_size=100_000)
+def _cerebro_memoized(frames):
+    request = backtest_request(frames)
+    run_cerebro(request, frames)
+    return lambda: run_cerebro(request, frames)
+
+
+@case('engine.vectorized')
+def _vectorized(frames):
+    request = backtest_request(frames, 'vectorized')
+    return lambda: run_engine(request, frames)
+
+
+@case('metrics.series')
+def _series_metrics(frames):
+    run = run_engine(backtest_request(frames, 'vectorized'), frames)
+    values = run['equity']['values']
+    return lambda: calculate_series_metrics(run['trades'], EquitySeries(values, 100000), 100000)
+
+
+@case('metrics.performance')
+def _performance_metrics(frames):
+    result = backtest_result(frames)
+    daily = columns_to_records(result.results['dailyReturns'])
+    return lambda: calculate_performance_metrics(result.results['trades'], daily, 100000)
+
+
+@case('analysis.montecarlo')
+def _monte_carlo(frames):
+    trades = [MonteCarloTrade(**trade) for trade in run_engine(backtest_request(frames, 'vectorized'), frames)['trades']]
+    pnl = net_pnl(trades) if trades else np.zeros(1)
+    return lambda: simulate(pnl, 100000, 10000, 'bootstrap', (0, 0), trades_per_year(trades))
+
+
+def _serialize_case(media_type: str):
+    def setup(frames):
+        result = backtest_result(frames)
+        return lambda: encode_result(result, media_type)
+    return setup
+
+
+FORMAT_NAMES = {ROWS: 'json', COLUMNAR: 'columnar', ARROW: 'arrow', MSGPACK: 'msgpack'}
+for _media_type in available_formats():
+    case(f"serialize.{FORMAT_NAMES[_media_type]}")(_serialize_case(_media_type))
+
+
+@case('serialize.json+gzip')
+def _serialize_gzip(frames):
+    body = encode_result(backtest_result(frames), 'application/json')
+    return lambda: compress(body, 'gzip')
+
+
+def measure(fn: Callable) -> Tuple[float, float, int]:
+    """(best, median, runs) wall seconds of fn"""
+    timings = []
+    while len(timings) < MAX_REPEAT and (not timings or sum(timings) < MIN_CASE_SECONDS):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), statistics.median(timings), len(timings)
+
+
+def git_revision() -> str:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short=12', 'HEAD'], cwd=SERVICE_DIR, check=True,
+                                capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=SERVICE_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def environment() -> Dict[str, str]:
+    versions = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': str(os.cpu_count()),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'backtrader': bt.__version__,
+    }
+    for module in ('pyarrow', 'msgpack'):
+        try:
+            versions[module] = str(getattr(__import__(module), '__version__', None) or __import__(module).version)
+        except ImportError:
+            pass
+    return versions
+
+
+def load_baseline(reference: str, results_dir: str) -> Dict:
+    """Saved results for a file path, a commit-ish or a results file name"""
+    if os.path.isfile(reference):
+        path = reference
+    else:
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short=12', reference], cwd=SERVICE_DIR, check=True,
+                                    capture_output=True, text=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = reference
+        path = os.path.join(results_dir, f"{commit}.json")
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profile', choices=PROFILES, default='default')
+    parser.add_argument('-k', dest='pattern', help="only run cases whose name contains this")
+    parser.add_argument('--results-dir', default=DEFAULT_RESULTS_DIR)
+    parser.add_argument('--no-save', action='store_true', help="do not store the results")
+    parser.add_argument('--compare', metavar='REF', help="commit or results file to compare against")
+    parser.add_argument('--max-regression', type=float, metavar='FRACTION',
+                        help="exit 1 if any case is this much slower than in --compare (e.g. 0.2)")
+    args = parser.parse_args(argv)
+    # Cerebro logs every run at INFO, which would bury the table
+    logging.getLogger().setLevel(logging.WARNING)
+
+    profile = PROFILES[args.profile]
+    baseline = load_baseline(args.compare, args.results_dir)['results'] if args.compare else {}
+    results = {}
+    regressions = []
+
+    print(f"{'case':<28} {'bars':>9} {'syms':>5} {'best (s)':>10} {'median (s)':>11} {'runs':>5} {'ns/bar':>9}"
+          + (f" {'baseline':>10} {'ratio':>7}" if baseline else ''))
+    for bench in CASES:
+        if args.pattern and args.pattern not in bench.name:
+            continue
+        for symbols in profile['symbols']:
+            for bars in profile['bars']:
+                if bench.max_size is not None and bars * symbols > bench.max_size * profile['scale']:
+                    continue
+                frames = synthetic_frames(bars, symbols)
+                try:
+                    best, median, runs = measure(bench.setup(frames))
+                finally:
+                    if bench.cleanup is not None:
+                        bench.cleanup()
+                key = f"{bench.name}[bars={bars},symbols={symbols}]"
+                results[key] = {'best': best, 'median': median, 'runs': runs, 'nsPerBar': best / (bars * symbols) * 1e9}
+                line = (f"{bench.name:<28} {bars:>9} {symbols:>5} {best:>10.4f} {median:>11.4f} {runs:>5} "
+                        f"{results[key]['nsPerBar']:>9.0f}")
+                if key in baseline:
+                    ratio = best / baseline[key]['best']
+                    slower = args.max_regression is not None and ratio > 1 + args.max_regression
+                    if slower:
+                        regressions.append(key)
+                    line += f" {baseline[key]['best']:>10.4f} {ratio:>6.2f}x" + (' REGRESSION' if slower else '')
+                print(line, flush=True)
+
+    if not args.no_save:
+        os.makedirs(args.results_dir, exist_ok=True)
+        revision = git_revision()
+        path = os.path.join(args.results_dir, f"{revision}.json")
+        with open(path, 'w') as f:
+            json.dump({'revision': revision, 'profile': args.profile, 'recordedAt': pd.Timestamp.now().isoformat(),
+                       'environment': environment(), 'results': results}, f, indent=1, sort_keys=True)
+        print(f"Saved {len(results)} results to {path}")
+
+    if regressions:
+        print(f"{len(regressions)} case(s) regressed by more than {args.max_regression:.0%}:", *regressions, sep='\n  ')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
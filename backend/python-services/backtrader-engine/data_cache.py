@@ -0,0 +1,156 @@
+import fcntl
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# (symbol, start, end) -> OHLCV frame indexed by date; end is exclusive like yf.download
+Fetcher = Callable[[str, str, str], pd.DataFrame]
+
+
+def _to_date(value) -> date:
+    return pd.Timestamp(value).date()
+
+
+def normalize_ohlcv(data: pd.DataFrame) -> pd.DataFrame:
+    """Flatten yfinance's (field, ticker) column MultiIndex and sort by date"""
+    if isinstance(data.columns, pd.MultiIndex):
+        data = data.copy()
+        data.columns = data.columns.get_level_values(0)
+    data = data[~data.index.duplicated(keep='last')]
+    return data.sort_index()
+
+
+class OHLCVCache:
+    """Per-symbol Parquet cache of OHLCV bars with incremental range fill
+
+    Each symbol is stored as ``<symbol>.parquet`` plus a ``<symbol>.json`` sidecar that
+    records the date range already fetched. Requests inside that range are served from
+    disk; only the missing head and tail segments are fetched and merged in. Coverage
+    never extends past today, so the still-forming current bar is always refetched.
+    A symbol is updated under a lock file, so workers in other processes sharing the
+    directory never interleave their data and sidecar writes.
+    """
+
+    def __init__(self, cache_dir: str, fetcher: Fetcher):
+        self.cache_dir = cache_dir
+        self.fetcher = fetcher
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _lock_for(self, symbol: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    @contextmanager
+    def _locked(self, symbol: str):
+        """Hold the symbol's lock against other threads and, through its lock file, other processes"""
+        with self._lock_for(symbol):
+            base = os.path.join(self.cache_dir, re.sub(r'[^A-Za-z0-9._-]', '_', symbol))
+            with open(f"{base}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _paths(self, symbol: str):
+        safe = re.sub(r'[^A-Za-z0-9._-]', '_', symbol)
+        base = os.path.join(self.cache_dir, safe)
+        return f"{base}.parquet", f"{base}.json"
+
+    def _load(self, symbol: str):
+        data_path, meta_path = self._paths(symbol)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None, None
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            data = pd.read_parquet(data_path)
+            return data, (_to_date(meta['start']), _to_date(meta['end']))
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache entry for {symbol}: {e}")
+            return None, None
+
+    def _replace(self, path: str, write: Callable[[str], None]):
+        """Write through a temp file of this writer's own and rename it over path"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _store(self, symbol: str, data: pd.DataFrame, start: date, end: date):
+        data_path, meta_path = self._paths(symbol)
+
+        def write_meta(path):
+            with open(path, 'w') as f:
+                json.dump({'start': start.isoformat(), 'end': end.isoformat()}, f)
+
+        # Renamed temp files, so readers in other workers never see partial files. Coverage only
+        # grows, so writing the data before the sidecar never leaves a range without its rows
+        self._replace(data_path, data.to_parquet)
+        self._replace(meta_path, write_meta)
+
+    def _fetch(self, symbol: str, start: date, end: date) -> pd.DataFrame:
+        logger.info(f"Fetching {symbol} {start} -> {end}")
+        data = self.fetcher(symbol, start.isoformat(), end.isoformat())
+        return normalize_ohlcv(data) if data is not None and not data.empty else None
+
+    def get(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """Return bars for [start_date, end_date), fetching only what is not cached yet"""
+        start, end = _to_date(start_date), _to_date(end_date)
+        covered_limit = min(end, date.today())
+
+        with self._locked(symbol):
+            cached, covered = self._load(symbol)
+
+            if cached is None:
+                data = self._fetch(symbol, start, end)
+                if data is None:
+                    return pd.DataFrame()
+                if start < covered_limit:
+                    self._store(symbol, data, start, covered_limit)
+            else:
+                covered_start, covered_end = covered
+                segments = [cached]
+                if start < covered_start:
+                    segments.append(self._fetch(symbol, start, covered_start))
+                if end > covered_end:
+                    segments.append(self._fetch(symbol, covered_end, end))
+                fetched = [s for s in segments[1:] if s is not None]
+                data = normalize_ohlcv(pd.concat([cached] + fetched)) if fetched else cached
+
+                new_start, new_end = min(start, covered_start), max(covered_limit, covered_end)
+                if (new_start, new_end) != (covered_start, covered_end):
+                    self._store(symbol, data, new_start, new_end)
+
+        index = data.index
+        return data[(index >= pd.Timestamp(start)) & (index < pd.Timestamp(end))]
+
+
+_default_cache: Optional[OHLCVCache] = None
+
+
+def get_default_cache(fetcher: Fetcher) -> Optional[OHLCVCache]:
+    """Process-wide cache configured by OHLCV_CACHE_DIR; an empty value disables caching"""
+    global _default_cache
+    cache_dir = os.getenv('OHLCV_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'ohlcv'))
+    if not cache_dir:
+        return None
+    if _default_cache is None or _default_cache.cache_dir != cache_dir:
+        _default_cache = OHLCVCache(cache_dir, fetcher)
+    return _default_cache
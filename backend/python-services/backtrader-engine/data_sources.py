@@ -0,0 +1,207 @@
+"""Market-data providers selected by a request's ``dataSource``
+
+A provider turns (symbol, start, end) into a normalized OHLCV frame indexed by date,
+covering [start, end) like ``yf.download``. Built in:
+
+- ``yahoo``: Yahoo Finance through the local Parquet cache (``OHLCV_CACHE_DIR``)
+- ``local``: a directory of pre-ingested ``<SYMBOL>.parquet`` / ``<SYMBOL>.csv`` files
+  (``LOCAL_DATA_DIR``), so backtests never touch the network
+
+Other providers register themselves with ``register_data_source`` from a module listed
+in ``DATA_SOURCE_PLUGINS``.
+"""
+import importlib
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+import pandas as pd
+import yfinance as yf
+
+from data_cache import get_default_cache, normalize_ohlcv
+
+logger = logging.getLogger(__name__)
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+# Column names accepted for the bar timestamp when a file does not store it as the index
+DATE_COLUMNS = ('date', 'datetime', 'timestamp', 'time')
+
+
+class DataSource:
+    """Provider interface; subclasses implement ``fetch``"""
+    name = ''
+
+    def fetch(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """Bars of the symbol in [start_date, end_date); raises ValueError when there are none"""
+        raise NotImplementedError
+
+    def version(self, symbol: str) -> Optional[tuple]:
+        """Cheap token that changes whenever the symbol's data does, or None when unknown
+
+        Lets callers holding on to fetched bars tell whether they are still current
+        without fetching them again.
+        """
+        return None
+
+
+class YahooDataSource(DataSource):
+    """Yahoo Finance, served from the local OHLCV cache where possible
+
+    Symbols without an exchange suffix get ``symbol_suffix`` (``YAHOO_SYMBOL_SUFFIX``,
+    NSE's ``.NS`` by default); an empty suffix passes them through unchanged.
+    """
+    name = 'yahoo'
+
+    def __init__(self, symbol_suffix: Optional[str] = None):
+        self.symbol_suffix = symbol_suffix if symbol_suffix is not None else os.getenv('YAHOO_SYMBOL_SUFFIX', '.NS')
+
+    def ticker(self, symbol: str) -> str:
+        if not self.symbol_suffix or '.' in symbol:
+            return symbol
+        return f"{symbol}{self.symbol_suffix}"
+
+    @staticmethod
+    def _download(symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+        return yf.download(symbol, start=start_date, end=end_date)
+
+    def fetch(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+        ticker = self.ticker(symbol)
+        cache = get_default_cache(self._download)
+        if cache is not None:
+            data = cache.get(ticker, start_date, end_date)
+        else:
+            data = normalize_ohlcv(self._download(ticker, start_date, end_date))
+        if data.empty:
+            raise ValueError(f"No data found for symbol {ticker}")
+        return data
+
+
+class LocalDataSource(DataSource):
+    """Pre-ingested OHLCV files, one per symbol: ``<root>/<SYMBOL>.parquet`` or ``.csv``
+
+    Files hold the bar timestamp as the index or in a ``Date``/``Datetime``/``timestamp``
+    column plus Open, High, Low, Close and (optionally) Volume columns in any case.
+    Parsed files are kept in memory until they change on disk.
+    """
+    name = 'local'
+    EXTENSIONS = ('.parquet', '.csv')
+
+    def __init__(self, root: str, max_files: int = 64):
+        self.root = root
+        self.max_files = max_files
+        self._frames: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def path(self, symbol: str) -> Optional[str]:
+        safe = re.sub(r'[^A-Za-z0-9._-]', '_', symbol)
+        for extension in self.EXTENSIONS:
+            path = os.path.join(self.root, f"{safe}{extension}")
+            if os.path.exists(path):
+                return path
+        return None
+
+    @staticmethod
+    def _read(path: str) -> pd.DataFrame:
+        if path.endswith('.parquet'):
+            data = pd.read_parquet(path)
+        else:
+            # round_trip parses prices to exactly the floats that were written
+            data = pd.read_csv(path, float_precision='round_trip')
+        if not isinstance(data.index, pd.DatetimeIndex):
+            date_column = next((c for c in data.columns if str(c).lower() in DATE_COLUMNS), None)
+            if date_column is None:
+                raise ValueError(f"{path} has no date index or column")
+            data = data.set_index(pd.DatetimeIndex(pd.to_datetime(data.pop(date_column))))
+        if data.index.tz is not None:
+            data.index = data.index.tz_convert(None)
+        data.index.name = 'Date'
+
+        # Accept any capitalization of the OHLCV names, e.g. lower-case exports
+        data = data.rename(columns={c: str(c).title() for c in data.columns
+                                    if str(c).title() in (*PRICE_COLUMNS, 'Volume')})
+        missing = [c for c in PRICE_COLUMNS if c not in data.columns]
+        if missing:
+            raise ValueError(f"{path} is missing columns {', '.join(missing)}")
+        return normalize_ohlcv(data)
+
+    @staticmethod
+    def _version(path: str) -> tuple:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def version(self, symbol: str) -> Optional[tuple]:
+        path = self.path(symbol)
+        try:
+            return self._version(path) if path is not None else None
+        except FileNotFoundError:
+            return None
+
+    def _load(self, path: str) -> pd.DataFrame:
+        version = self._version(path)
+        with self._lock:
+            entry = self._frames.get(path)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+        data = self._read(path)
+        with self._lock:
+            self._frames.pop(path, None)
+            self._frames[path] = (version, data)
+            while len(self._frames) > self.max_files:
+                self._frames.pop(next(iter(self._frames)))
+        return data
+
+    def fetch(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+        path = self.path(symbol)
+        if path is None:
+            raise ValueError(f"No local data file for symbol {symbol} in {self.root}")
+        data = self._load(path)
+        index = data.index
+        data = data[(index >= pd.Timestamp(start_date)) & (index < pd.Timestamp(end_date))]
+        if data.empty:
+            raise ValueError(f"No data found for symbol {symbol} between {start_date} and {end_date}")
+        return data
+
+
+_sources: Dict[str, DataSource] = {}
+_plugins_loaded = False
+
+
+def register_data_source(source: DataSource, name: Optional[str] = None):
+    """Make a provider selectable as ``dataSource=<name>`` (defaults to ``source.name``)"""
+    name = name or source.name
+    if not name:
+        raise ValueError("Data source needs a name")
+    _sources[name] = source
+
+
+def _load_plugins():
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
+    # Built-ins do not replace a provider registered under the same name before this ran
+    _sources.setdefault(YahooDataSource.name, YahooDataSource())
+    local_dir = os.getenv('LOCAL_DATA_DIR', '')
+    if local_dir:
+        _sources.setdefault(LocalDataSource.name, LocalDataSource(local_dir))
+    for module in filter(None, (m.strip() for m in os.getenv('DATA_SOURCE_PLUGINS', '').split(','))):
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            logger.error(f"Failed to load data source plugin {module}: {e}")
+
+
+def available_data_sources() -> List[str]:
+    _load_plugins()
+    return sorted(_sources)
+
+
+def get_data_source(name: str) -> DataSource:
+    """Registered provider by name; raises ValueError for unknown names"""
+    _load_plugins()
+    source = _sources.get(name)
+    if source is None:
+        raise ValueError(f"Unknown data source '{name}'; available: {', '.join(sorted(_sources))}")
+    return source
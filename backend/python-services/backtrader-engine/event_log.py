@@ -0,0 +1,88 @@
+import logging
+import os
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+import backtrader as bt
+
+# Order/trade events of a backtest go to their own logger so their level can be set per job
+event_logger = logging.getLogger('backtest.events')
+
+DEFAULT_EVENT_LOG_LEVEL = os.getenv('BACKTEST_EVENT_LOG_LEVEL', 'WARNING').upper()
+
+
+def configure_event_logging(level: Optional[str]):
+    """Set the event logger level for the job about to run; a worker runs one job at a time"""
+    event_logger.setLevel((level or DEFAULT_EVENT_LOG_LEVEL).upper())
+
+
+class EventBuffer:
+    """Sampled ring buffer of structured events
+
+    Events are sampled (``sample_rate`` of 0.25 keeps every fourth event) before the
+    event dict is even built, and at most ``capacity`` of the most recent ones are kept.
+    Kept events are also logged to ``backtest.events`` at INFO when that level is enabled.
+    """
+
+    def __init__(self, capacity: int = 1000, sample_rate: float = 1.0):
+        self.sample_rate = sample_rate
+        self.events = deque(maxlen=capacity)
+        self.seen = 0
+        self._credit = 0.0
+        self._log_enabled = event_logger.isEnabledFor(logging.INFO)
+
+    def record(self, kind: str, build: Callable[[], Dict[str, Any]]):
+        self.seen += 1
+        # Deterministic sampling: accumulate the rate and keep an event each time it reaches 1
+        self._credit += self.sample_rate
+        if self._credit < 1.0:
+            return
+        self._credit -= 1.0
+
+        event = build()
+        event['type'] = kind
+        self.events.append(event)
+        if self._log_enabled:
+            event_logger.info('%s %s', kind, event)
+
+    def get_analysis(self):
+        return {
+            'events': list(self.events),
+            'seen': self.seen,
+            'kept': len(self.events),
+            'sampleRate': self.sample_rate
+        }
+
+
+class BacktestEventLog(bt.Analyzer):
+    """Feeds order and trade notifications into an ``EventBuffer``"""
+    params = (
+        ('capacity', 1000),
+        ('sample_rate', 1.0),
+    )
+
+    def start(self):
+        self.buffer = EventBuffer(self.p.capacity, self.p.sample_rate)
+
+    def notify_order(self, order):
+        if order.status == order.Completed:
+            self.buffer.record('order', lambda: {
+                'date': bt.num2date(order.executed.dt).strftime('%Y-%m-%d'),
+                'symbol': order.data._name,
+                'side': 'BUY' if order.isbuy() else 'SELL',
+                'size': order.executed.size,
+                'price': order.executed.price,
+                'commission': order.executed.comm
+            })
+
+    def notify_trade(self, trade):
+        if trade.isclosed:
+            self.buffer.record('trade', lambda: {
+                'date': bt.num2date(trade.dtclose).strftime('%Y-%m-%d'),
+                'symbol': trade.data._name,
+                'pnl': trade.pnl,
+                'pnlcomm': trade.pnlcomm
+            })
+
+    def get_analysis(self):
+        return self.buffer.get_analysis()
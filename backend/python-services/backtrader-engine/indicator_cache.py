@@ -0,0 +1,196 @@
+"""Per-worker memo of indicator series computed by Cerebro runs
+
+A parameter sweep rebuilds the same ``SimpleMovingAverage(period=20)`` over the same
+bars in every trial. Strategies that create their indicators through
+``IndicatorMemo.indicator`` compute each one once per worker: after the run its lines are
+kept as NumPy arrays, keyed by (data fingerprint, indicator, params), and later runs get
+a precomputed indicator that only copies those values into its lines.
+
+The stored values are the ones backtrader itself produced, so a cached run is
+bit-for-bit the same as an uncached one.
+"""
+import hashlib
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+
+class IndicatorCache:
+    """LRU of indicator lines bounded by their total size in bytes"""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else \
+            int(os.getenv('INDICATOR_CACHE_MAX_MB', '256')) * 1024 * 1024
+        self._entries: 'OrderedDict[Hashable, Tuple[Tuple[np.ndarray, ...], int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Tuple[Tuple[np.ndarray, ...], int]]:
+        """(line arrays, minperiod) for the key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, lines: List[np.ndarray], minperiod: int):
+        lines = tuple(lines)
+        for values in lines:
+            values.flags.writeable = False
+        nbytes = sum(values.nbytes for values in lines)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= sum(values.nbytes for values in previous[0])
+            self._entries[key] = (lines, minperiod)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)[1]
+                self.nbytes -= sum(values.nbytes for values in evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.nbytes, 'maxBytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+# One per process: each worker keeps the indicators of the runs it executed
+indicator_cache = IndicatorCache()
+
+
+def frame_fingerprint(frame: pd.DataFrame) -> str:
+    """Hash of a frame's dates, column names and values"""
+    digest = hashlib.sha1(pd.util.hash_pandas_object(frame.index).to_numpy().tobytes())
+    digest.update(repr(list(frame.columns)).encode())
+    digest.update(np.ascontiguousarray(frame.to_numpy(dtype='float64')).tobytes())
+    return digest.hexdigest()
+
+
+class _Precomputed(bt.Indicator):
+    """Replays stored line values; subclassed per indicator so the line names match"""
+    params = (('values', ()), ('minperiod', 1))
+
+    def __init__(self):
+        # The stored minperiod is absolute and already includes the inputs' own periods
+        self.addminperiod(self.p.minperiod - self._minperiod + 1)
+
+    def _copy(self, start, end):
+        for line, values in zip(self.lines, self.p.values):
+            line.array[start:end] = array('d', values[start:end].tobytes())
+
+    def preonce(self, start, end):
+        self._copy(start, end)
+
+    def oncestart(self, start, end):
+        self._copy(start, end)
+
+    def once(self, start, end):
+        self._copy(start, end)
+
+    def prenext(self):
+        self.next()
+
+    def next(self):
+        bar = len(self) - 1
+        for line, values in zip(self.lines, self.p.values):
+            line[0] = values[bar]
+
+
+_precomputed_classes: Dict[type, type] = {}
+
+
+def _precomputed_class(indicator: type) -> type:
+    cls = _precomputed_classes.get(indicator)
+    if cls is None:
+        # Leading underscore keeps backtrader from registering it as a public indicator
+        cls = type(f"_Cached{indicator.__name__}", (_Precomputed,), {'lines': indicator.lines._getlines()})
+        _precomputed_classes[indicator] = cls
+    return cls
+
+
+class IndicatorMemo:
+    """Memoized indicator construction for one strategy instance (i.e. one run)"""
+
+    def __init__(self, strategy: bt.Strategy, cache: IndicatorCache = indicator_cache):
+        self.strategy = strategy
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        # id() of each feed/indicator this memo handed out or fingerprinted -> its key
+        self._keys: Dict[int, Hashable] = {}
+        self._computed: List[Tuple[Hashable, bt.Indicator]] = []
+
+    def _input_key(self, line) -> Optional[Hashable]:
+        key = self._keys.get(id(line))
+        if key is None and isinstance(line, bt.feeds.PandasData) and isinstance(line.p.dataname, pd.DataFrame):
+            options = tuple(sorted((name, repr(value)) for name, value in line.p._getkwargs().items()
+                                   if name != 'dataname'))
+            key = ('data', frame_fingerprint(line.p.dataname), options)
+            self._keys[id(line)] = key
+        return key
+
+    def indicator(self, indicator: type, *inputs, **params):
+        """``indicator(*inputs, **params)``, replayed from the cache when already computed
+
+        Inputs default to the strategy's first data feed and must be PandasData feeds or
+        indicators created through this memo; anything else is built uncached.
+        """
+        inputs = inputs or (self.strategy.datas[0],)
+        input_keys = tuple(self._input_key(line) for line in inputs)
+        if None in input_keys:
+            return indicator(*inputs, **params)
+
+        resolved = {**dict(indicator.params._getitems()), **params}
+        key = (f"{indicator.__module__}.{indicator.__qualname__}", input_keys,
+               tuple(sorted((name, repr(value)) for name, value in resolved.items())))
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.hits += 1
+            lines, minperiod = entry
+            built = _precomputed_class(indicator)(*inputs, values=lines, minperiod=minperiod)
+        else:
+            self.misses += 1
+            built = indicator(*inputs, **params)
+            self._computed.append((key, built))
+        self._keys[id(built)] = key
+        return built
+
+    def store(self):
+        """Keep the lines of the indicators computed in this run; call once the run finished
+
+        Only fully preloaded runs are stored: with ``exactbars`` the line buffers hold
+        just the last bars.
+        """
+        for key, built in self._computed:
+            if built.lines[0].mode != bt.LineBuffer.UnBounded or len(built.lines[0].array) != len(built):
+                continue
+            lines = [np.array(line.array, dtype='float64') for line in built.lines]
+            self.cache.put(key, lines, built._minperiod)
+        self._computed.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+def total_stats(runs: Iterable[Optional[Dict[str, Any]]]) -> Dict[str, int]:
+    """Hits and misses summed over the ``stats()`` of several runs"""
+    runs = [run for run in runs if run]
+    return {'hits': sum(run['hits'] for run in runs), 'misses': sum(run['misses'] for run in runs)}
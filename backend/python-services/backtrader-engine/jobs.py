@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+# Minimum seconds between two progress updates from a running backtest
+DEFAULT_PROGRESS_INTERVAL = float(os.getenv('BACKTEST_PROGRESS_INTERVAL_SECONDS', '0.5'))
+
+
+class ProgressReporter:
+    """Picklable handle a worker uses to push progress for one job back to the API process
+
+    Updates are throttled to one every ``interval`` seconds; ``force=True`` bypasses the throttle.
+    Callers with an expensive payload check ``due()`` before building it.
+    """
+
+    def __init__(self, channel, job_id: str, interval: float = DEFAULT_PROGRESS_INTERVAL):
+        self.channel = channel
+        self.job_id = job_id
+        self.interval = interval
+        self._last_sent = 0.0
+
+    def due(self) -> bool:
+        return time.monotonic() - self._last_sent >= self.interval
+
+    def report(self, force: bool = False, **progress):
+        if not force and not self.due():
+            return
+        self._last_sent = time.monotonic()
+        try:
+            self.channel.put_nowait((self.job_id, progress))
+        except Exception as e:
+            # Progress is best effort and must never fail the backtest itself
+            logger.debug("Dropping progress update for job %s: %s", self.job_id, e)
+
+
+class BacktestJob:
+    """State of one asynchronously submitted backtest, optimization or walk-forward run
+
+    Streaming clients ``subscribe()`` to receive every progress update and a final
+    ``done`` frame as ``(event, data)`` tuples on an asyncio queue.
+    """
+
+    def __init__(self, job_id: str, strategy_id: str, kind: str = 'backtest'):
+        self.id = job_id
+        self.strategyId = strategy_id
+        self.kind = kind
+        self.status = QUEUED
+        self.createdAt = datetime.now()
+        self.startedAt: Optional[datetime] = None
+        self.finishedAt: Optional[datetime] = None
+        if kind in ('optimize', 'walk_forward'):
+            self.progress: Dict[str, Any] = {'combinationsCompleted': 0, 'totalCombinations': 0}
+        else:
+            self.progress = {'barsProcessed': 0, 'totalBars': 0}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.task = None
+        self._finished_monotonic: Optional[float] = None
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self._subscribers_lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (COMPLETED, FAILED, CANCELLED)
+
+    def update_progress(self, progress: Dict[str, Any]):
+        # Data since the previous update (new equity points, closed trades) is streamed, not kept
+        partial = progress.pop('partial', None)
+        if self.status == QUEUED:
+            self.status = RUNNING
+            self.startedAt = datetime.now()
+        self.progress.update(progress)
+        if self._subscribers:
+            self._publish('progress', {**self.to_dict(), 'partial': partial or {}})
+
+    def subscribe(self) -> asyncio.Queue:
+        """Queue of (event, data) frames for this job; call from the event loop that will read it"""
+        frames: asyncio.Queue = asyncio.Queue()
+        with self._subscribers_lock:
+            self._subscribers.append((asyncio.get_running_loop(), frames))
+        return frames
+
+    def unsubscribe(self, frames: asyncio.Queue):
+        with self._subscribers_lock:
+            self._subscribers = [(loop, q) for loop, q in self._subscribers if q is not frames]
+
+    def _publish(self, event: str, data: Dict[str, Any]):
+        # Progress arrives on the registry's drain thread, so hand frames over to each subscriber's loop
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for loop, frames in subscribers:
+            try:
+                loop.call_soon_threadsafe(frames.put_nowait, (event, data))
+            except RuntimeError:
+                # The subscriber's loop is already closed
+                pass
+
+    def complete(self, result: Any):
+        self.status = COMPLETED
+        self.result = result
+        self._mark_finished()
+
+    def fail(self, error: str):
+        self.status = FAILED
+        self.error = error
+        self._mark_finished()
+
+    def cancel(self) -> bool:
+        """Cancel the job's task; work already running inside a worker process runs to completion"""
+        if self.finished:
+            return False
+        if self.task is not None:
+            self.task.cancel()
+        self.status = CANCELLED
+        self._mark_finished()
+        return True
+
+    def _mark_finished(self):
+        self.finishedAt = datetime.now()
+        self._finished_monotonic = time.monotonic()
+        self._publish('done', self.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        # Backtests report bars, optimizations report completed combinations
+        total = self.progress.get('totalBars') or self.progress.get('totalCombinations') or 0
+        done = self.progress.get('barsProcessed') or self.progress.get('combinationsCompleted') or 0
+        return {
+            'jobId': self.id,
+            'strategyId': self.strategyId,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': {
+                **self.progress,
+                'percent': round(100.0 * done / total, 2) if total else (100.0 if self.status == COMPLETED else 0.0),
+            },
+            'createdAt': self.createdAt.isoformat(),
+            'startedAt': self.startedAt.isoformat() if self.startedAt else None,
+            'finishedAt': self.finishedAt.isoformat() if self.finishedAt else None,
+            'error': self.error,
+        }
+
+
+class JobRegistry:
+    """In-memory registry of backtest jobs with TTL eviction of finished jobs
+
+    Workers report progress through ``channel`` (a multiprocessing queue); a daemon
+    thread drains it into the matching job.
+    """
+
+    def __init__(self, channel=None, ttl_seconds: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv('BACKTEST_JOB_TTL_SECONDS', '3600'))
+        self.channel = channel
+        self._jobs: Dict[str, BacktestJob] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._drain_thread: Optional[threading.Thread] = None
+
+    def start(self, channel=None):
+        if channel is not None:
+            self.channel = channel
+        if self.channel is not None and self._drain_thread is None:
+            self._stop.clear()
+            self._drain_thread = threading.Thread(target=self._drain_progress, name='job-progress', daemon=True)
+            self._drain_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._drain_thread = None
+
+    def create(self, strategy_id: str, kind: str = 'backtest') -> BacktestJob:
+        self.evict_expired()
+        job = BacktestJob(uuid.uuid4().hex, strategy_id, kind)
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[BacktestJob]:
+        self.evict_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def reporter(self, job_id: str, interval: Optional[float] = None) -> Optional[ProgressReporter]:
+        if self.channel is None:
+            return None
+        return ProgressReporter(self.channel, job_id, interval if interval is not None else DEFAULT_PROGRESS_INTERVAL)
+
+    def evict_expired(self) -> int:
+        """Drop finished jobs older than the TTL; returns how many were evicted"""
+        cutoff = time.monotonic() - self.ttl_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job._finished_monotonic < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if expired:
+            logger.info("Evicted %d expired backtest jobs", len(expired))
+        return len(expired)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts: Dict[str, int] = {QUEUED: 0, RUNNING: 0, COMPLETED: 0, FAILED: 0, CANCELLED: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return counts
+
+    def _drain_progress(self):
+        while not self._stop.is_set():
+            try:
+                job_id, progress = self.channel.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                # Manager process went away during shutdown
+                return
+            with self._lock:
+                job = self._jobs.get(job_id)
+            if job is not None and not job.finished:
+                job.update_progress(progress)
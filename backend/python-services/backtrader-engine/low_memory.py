@@ -0,0 +1,83 @@
+"""Low-memory execution of long-history Cerebro runs
+
+By default Cerebro preloads every feed and keeps every line of every data feed,
+indicator and observer for the whole run, and the equity recorder keeps one point per
+bar. In low-memory mode:
+
+- bars are streamed into the feeds a chunk at a time from the (memory-mapped) frames,
+  instead of being preloaded
+- line buffers are bounded to what the indicators look back (``exactbars=1``), so
+  strategies cannot index further back than their indicators' periods
+- the equity curve keeps one point per day, the last bar's
+
+Daily bars give the same result in both modes. Intraday runs report a daily equity
+curve, and the metrics derived from it, instead of one point per bar.
+"""
+import os
+from typing import Dict, List
+
+import backtrader as bt
+import pandas as pd
+
+# Above this many bars (summed over the symbols) "auto" runs Cerebro in low-memory mode
+LOW_MEMORY_BARS = int(os.getenv('BACKTEST_LOW_MEMORY_BARS', '2000000'))
+
+# Cerebro options of each mode
+CEREBRO_OPTIONS = {
+    'standard': {},
+    'low': {'preload': False, 'runonce': False, 'exactbars': 1},
+}
+
+
+def resolve_memory_mode(mode: str, frames: Dict[str, pd.DataFrame]) -> str:
+    """'standard' or 'low' for the requested mode; 'auto' picks by the number of bars"""
+    if mode != 'auto':
+        return mode
+    return 'low' if sum(len(frame) for frame in frames.values()) > LOW_MEMORY_BARS else 'standard'
+
+
+class ChunkedPandasData(bt.feeds.PandasData):
+    """PandasData that converts ``chunk_bars`` bars at a time as the run reaches them
+
+    Produces exactly the values PandasData does, without preloading: only the current
+    chunk is held as Python objects, and only its part of a memory-mapped frame is read.
+    """
+    params = (('chunk_bars', 4096),)
+
+    def start(self):
+        super().start()
+        frame = self.p.dataname
+        self._fields = []
+        for name in self.getlinealiases():
+            column = self._colmapping.get(name)
+            if name != 'datetime' and column is not None:
+                self._fields.append((getattr(self.lines, name), frame.iloc[:, column].to_numpy()))
+        column = self._colmapping['datetime']
+        self._timestamps = frame.index if column is None else pd.DatetimeIndex(frame.iloc[:, column])
+        self._chunk: List[tuple] = []
+        self._chunk_start = 0
+
+    def _fill(self, start: int):
+        stop = min(start + self.p.chunk_bars, len(self._timestamps))
+        dates = [bt.date2num(timestamp) for timestamp in self._timestamps[start:stop].to_pydatetime()]
+        columns = [values[start:stop].tolist() for _, values in self._fields]
+        self._chunk = list(zip(dates, *columns))
+        self._chunk_start = start
+
+    def _load(self):
+        self._idx += 1
+        if self._idx >= len(self._timestamps):
+            return False
+        offset = self._idx - self._chunk_start
+        if offset >= len(self._chunk):
+            self._fill(self._idx)
+            offset = 0
+        row = self._chunk[offset]
+        self.lines.datetime[0] = row[0]
+        for (line, _), value in zip(self._fields, row[1:]):
+            line[0] = value
+        return True
+
+    def stop(self):
+        self._chunk = []
+        super().stop()
@@ -0,0 +1,158 @@
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+
+TRADING_DAYS_PER_YEAR = 252
+RISK_FREE_RATE = 0.06
+
+EMPTY_METRICS = {
+    'totalReturn': 0,
+    'annualizedReturn': 0,
+    'volatility': 0,
+    'sharpeRatio': 0,
+    'sortinoRatio': 0,
+    'maxDrawdown': 0,
+    'calmarRatio': 0,
+    'winRate': 0,
+    'profitFactor': 0,
+    'avgWin': 0,
+    'avgLoss': 0,
+    'largestWin': 0,
+    'largestLoss': 0
+}
+
+
+def _trade_statistics(pnls: Iterable[float]) -> Dict[str, Any]:
+    """Win/loss aggregates in a single pass over the trade P&Ls"""
+    count = 0
+    wins = losses = 0
+    total_wins = total_losses = 0.0
+    largest_win = largest_loss = 0
+    for pnl in pnls:
+        count += 1
+        if pnl > 0:
+            if wins == 0 or pnl > largest_win:
+                largest_win = pnl
+            wins += 1
+            total_wins += pnl
+        elif pnl < 0:
+            if losses == 0 or pnl < largest_loss:
+                largest_loss = pnl
+            losses += 1
+            total_losses += pnl
+    total_losses = abs(total_losses)
+
+    return {
+        'winRate': wins / count if count else 0,
+        'profitFactor': total_wins / total_losses if total_losses > 0 else float('inf'),
+        'avgWin': total_wins / wins if wins else 0,
+        'avgLoss': total_losses / losses if losses else 0,
+        'largestWin': largest_win,
+        'largestLoss': largest_loss
+    }
+
+
+class EquitySeries:
+    """Per-bar return, cumulative return and drawdown arrays for an equity curve
+
+    Built in linear time; every array is aligned with ``values[1:]``, so element i
+    describes bar i + 1 relative to bar i.
+    """
+
+    def __init__(self, portfolio_values: np.ndarray, initial_capital: float):
+        values = np.asarray(portfolio_values, dtype=np.float64)
+        peaks = np.maximum.accumulate(values)
+
+        self.values = values
+        self.daily_returns = np.diff(values) / values[:-1]
+        self.cumulative_returns = (values[1:] - initial_capital) / initial_capital
+        self.drawdowns = (peaks[1:] - values[1:]) / peaks[1:]
+
+    @property
+    def max_drawdown(self):
+        # The first bar is its own peak, so its drawdown is 0
+        return max(self.drawdowns.max(), 0) if len(self.drawdowns) else 0
+
+    def to_columns(self, dates: List[str]) -> Dict[str, List[Any]]:
+        """Columnar ``dailyReturns`` payload, one list per field; ``dates`` covers every bar including the first"""
+        return {
+            'date': dates[1:],
+            'portfolioValue': self.values[1:].tolist(),
+            'dailyReturn': self.daily_returns.tolist(),
+            'cumulativeReturn': self.cumulative_returns.tolist(),
+            'drawdown': self.drawdowns.tolist()
+        }
+
+    def to_records(self, dates: List[str]) -> List[Dict[str, Any]]:
+        """Row-oriented ``dailyReturns`` payload; ``dates`` covers every bar including the first"""
+        return [
+            {
+                'date': date,
+                'portfolioValue': value,
+                'dailyReturn': daily_return,
+                'cumulativeReturn': cumulative_return,
+                'drawdown': drawdown
+            }
+            for date, value, daily_return, cumulative_return, drawdown in zip(
+                dates[1:],
+                self.values[1:].tolist(),
+                self.daily_returns.tolist(),
+                self.cumulative_returns.tolist(),
+                self.drawdowns.tolist()
+            )
+        ]
+
+
+def compute_metrics(portfolio_values: np.ndarray, trade_pnls: Iterable[float], initial_capital: float,
+                    series: EquitySeries = None) -> Dict[str, Any]:
+    """Performance metrics from an equity curve array and the closed-trade P&Ls
+
+    Pass the ``series`` already built for the response so both use the same arrays.
+    """
+    series = series if series is not None else EquitySeries(portfolio_values, initial_capital)
+    values = series.values
+    total_return = (float(values[-1]) - initial_capital) / initial_capital
+
+    daily_returns = series.daily_returns
+
+    trading_days = len(daily_returns)
+    annualized_return = (1 + total_return) ** (TRADING_DAYS_PER_YEAR / trading_days) - 1 if trading_days > 0 else 0
+
+    volatility = np.std(daily_returns) * np.sqrt(TRADING_DAYS_PER_YEAR) if len(daily_returns) > 1 else 0
+    sharpe_ratio = (annualized_return - RISK_FREE_RATE) / volatility if volatility > 0 else 0
+
+    negative_returns = daily_returns[daily_returns < 0]
+    downside_deviation = np.std(negative_returns) * np.sqrt(TRADING_DAYS_PER_YEAR) if len(negative_returns) > 1 else 0
+    sortino_ratio = (annualized_return - RISK_FREE_RATE) / downside_deviation if downside_deviation > 0 else 0
+
+    max_drawdown = series.max_drawdown
+
+    calmar_ratio = annualized_return / max_drawdown if max_drawdown > 0 else 0
+
+    return {
+        'totalReturn': total_return,
+        'annualizedReturn': annualized_return,
+        'volatility': volatility,
+        'sharpeRatio': sharpe_ratio,
+        'sortinoRatio': sortino_ratio,
+        'maxDrawdown': max_drawdown,
+        'calmarRatio': calmar_ratio,
+        **_trade_statistics(trade_pnls)
+    }
+
+
+def calculate_series_metrics(trades: List[Dict], series: EquitySeries, initial_capital: float) -> Dict[str, Any]:
+    """Performance metrics for a recorded equity series and its closed trades"""
+    if not trades or not len(series.values):
+        return dict(EMPTY_METRICS)
+
+    return compute_metrics(series.values, (t['pnl'] for t in trades), initial_capital, series)
+
+
+def calculate_performance_metrics(trades: List[Dict], daily_values: List[Dict], initial_capital: float) -> Dict[str, Any]:
+    """Calculate comprehensive performance metrics"""
+    if not trades or not daily_values:
+        return dict(EMPTY_METRICS)
+
+    portfolio_values = np.fromiter((d['portfolioValue'] for d in daily_values), dtype=np.float64, count=len(daily_values))
+    return calculate_series_metrics(trades, EquitySeries(portfolio_values, initial_capital), initial_capital)
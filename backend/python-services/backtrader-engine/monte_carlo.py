@@ -0,0 +1,188 @@
+"""Monte Carlo robustness analysis of a backtest's closed trades
+
+Each path replays the trades' net P&L (``pnl - commission``) in a resampled order:
+
+- ``bootstrap``: trades drawn with replacement, so a path can repeat some and skip others
+- ``permutation``: the same trades shuffled; the final equity is unchanged, only
+  path-dependent statistics (drawdown, Sharpe) vary
+
+Equity is marked at each trade's exit, so drawdowns are trade-to-trade rather than
+bar-level like a backtest's ``maxDrawdown``. The Sharpe ratio is that of the per-trade
+returns, annualized by the trades' frequency when they carry dates.
+
+Paths are simulated as 2-D arrays (paths x trades), a chunk of paths at a time so the
+working set stays under ``MONTE_CARLO_CHUNK_MB``. Blocks of ``PATHS_PER_TASK`` paths
+run in the worker pool, each with its own child of the request's seed, so a seed gives
+the same result whatever the number of workers.
+"""
+import math
+import os
+import warnings
+from typing import Dict, List, Literal, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, Field, field_validator
+
+MAX_PATHS = int(os.getenv('MONTE_CARLO_MAX_PATHS', '1000000'))
+CHUNK_BYTES = int(os.getenv('MONTE_CARLO_CHUNK_MB', '64')) * 1024 * 1024
+PATHS_PER_TASK = 2500
+# float64 arrays of paths x trades alive at once while simulating a chunk
+_ARRAYS_PER_CHUNK = 5
+
+
+class MonteCarloTrade(BaseModel):
+    # The fields of a backtest result's trades; others (symbol, prices, ...) are ignored
+    pnl: float
+    commission: float = 0.0
+    entryDate: Optional[str] = None
+    exitDate: Optional[str] = None
+
+
+class MonteCarloRequest(BaseModel):
+    trades: List[MonteCarloTrade] = Field(..., min_length=1)
+    initialCapital: float = Field(..., gt=0)
+    paths: int = Field(10000, ge=1, le=MAX_PATHS)
+    method: Literal["bootstrap", "permutation"] = "bootstrap"
+    # Same seed, same result; a random one is drawn (and returned) when omitted
+    seed: Optional[int] = Field(None, ge=0)
+    percentiles: List[float] = [5, 25, 50, 75, 95]
+
+    @field_validator('percentiles')
+    @classmethod
+    def _check_percentiles(cls, percentiles):
+        if any(not 0 <= p <= 100 for p in percentiles):
+            raise ValueError("percentiles must be between 0 and 100")
+        return percentiles
+
+
+class MonteCarloResult(BaseModel):
+    method: str
+    paths: int
+    trades: int
+    seed: int
+    initialCapital: float
+    # Used to annualize the per-trade Sharpe ratio; None when the trades carry no dates
+    tradesPerYear: Optional[float]
+    # Statistics of the trades in their original order
+    observed: Dict[str, Optional[float]]
+    # Per statistic: mean, std, min, max and the requested percentiles over all paths
+    distributions: Dict[str, Dict[str, Optional[float]]]
+    probabilityOfLoss: float
+    # Share of paths whose equity reached zero
+    probabilityOfRuin: float
+    seconds: float
+
+
+def net_pnl(trades: List[MonteCarloTrade]) -> np.ndarray:
+    return np.array([trade.pnl - trade.commission for trade in trades], dtype=np.float64)
+
+
+def trades_per_year(trades: List[MonteCarloTrade]) -> Optional[float]:
+    """Trade frequency over the span from the first entry to the last exit"""
+    entries = [trade.entryDate for trade in trades if trade.entryDate]
+    exits = [trade.exitDate for trade in trades if trade.exitDate]
+    if not entries or not exits:
+        return None
+    years = (pd.Timestamp(max(exits)) - pd.Timestamp(min(entries))).days / 365.25
+    return len(trades) / years if years > 0 else None
+
+
+def path_statistics(pnl: np.ndarray, initial_capital: float,
+                    periods_per_year: Optional[float]) -> Dict[str, np.ndarray]:
+    """Final equity, max drawdown (%), Sharpe ratio and ruin flag of each row of a paths x trades P&L matrix"""
+    equity = np.cumsum(pnl, axis=1)
+    equity += initial_capital
+    ruined = (equity <= 0).any(axis=1)
+    # Each trade's return on the equity it started from
+    before = np.empty_like(equity)
+    before[:, 0] = initial_capital
+    before[:, 1:] = equity[:, :-1]
+    # Rows with fewer than two usable returns get a NaN Sharpe ratio, which is fine
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        returns = np.divide(pnl, before, out=before)
+        if ruined.any():
+            # Nothing is left to return on once the equity is gone
+            returns[np.concatenate([np.zeros((len(pnl), 1), bool), equity[:, :-1] <= 0], axis=1)] = np.nan
+            mean, std = np.nanmean(returns, axis=1), np.nanstd(returns, axis=1, ddof=1)
+        else:
+            mean, std = returns.mean(axis=1), returns.std(axis=1, ddof=1)
+        sharpe = mean / std * math.sqrt(periods_per_year or 1)
+    sharpe[~np.isfinite(sharpe)] = np.nan
+
+    peak = np.maximum.accumulate(equity, axis=1)
+    np.maximum(peak, initial_capital, out=peak)
+    max_drawdown = (1 - np.divide(equity, peak, out=peak).min(axis=1)) * 100
+    return {
+        'finalEquity': equity[:, -1],
+        'maxDrawdown': max_drawdown,
+        'sharpeRatio': sharpe,
+        'ruined': ruined,
+    }
+
+
+def simulate(pnl: np.ndarray, initial_capital: float, paths: int, method: str, seed: Tuple[int, int],
+             periods_per_year: Optional[float]) -> Dict[str, np.ndarray]:
+    """Statistics of ``paths`` resampled paths; ``seed`` is (entropy, block index)
+
+    Runs inside a worker process; each chunk draws a paths x trades index matrix and
+    evaluates it with ``path_statistics``.
+    """
+    entropy, block = seed
+    rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=(block,)))
+    trades = len(pnl)
+    chunk = max(1, CHUNK_BYTES // (trades * 8 * _ARRAYS_PER_CHUNK))
+    parts = []
+    for start in range(0, paths, chunk):
+        size = min(chunk, paths - start)
+        if method == 'permutation':
+            order = rng.permuted(np.broadcast_to(np.arange(trades), (size, trades)), axis=1)
+        else:
+            order = rng.integers(0, trades, size=(size, trades))
+        parts.append(path_statistics(pnl[order], initial_capital, periods_per_year))
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def split_paths(paths: int) -> List[int]:
+    """Path counts of the pool tasks"""
+    return [min(PATHS_PER_TASK, paths - start) for start in range(0, paths, PATHS_PER_TASK)]
+
+
+def _finite(value: float) -> Optional[float]:
+    return float(value) if np.isfinite(value) else None
+
+
+def distribution(values: np.ndarray, percentiles: List[float]) -> Dict[str, Optional[float]]:
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return {'mean': None, 'std': None, 'min': None, 'max': None, **{f"p{p:g}": None for p in percentiles}}
+    quantiles = np.percentile(values, percentiles) if percentiles else []
+    return {
+        'mean': _finite(values.mean()),
+        'std': _finite(values.std()),
+        'min': _finite(values.min()),
+        'max': _finite(values.max()),
+        **{f"p{p:g}": _finite(q) for p, q in zip(percentiles, quantiles)},
+    }
+
+
+def summarize_paths(request: MonteCarloRequest, seed: int, periods_per_year: Optional[float],
+                    results: List[Dict[str, np.ndarray]], seconds: float) -> MonteCarloResult:
+    combined = {name: np.concatenate([result[name] for result in results]) for name in results[0]}
+    pnl = net_pnl(request.trades)
+    observed = path_statistics(pnl[np.newaxis, :], request.initialCapital, periods_per_year)
+    return MonteCarloResult(
+        method=request.method,
+        paths=request.paths,
+        trades=len(pnl),
+        seed=seed,
+        initialCapital=request.initialCapital,
+        tradesPerYear=periods_per_year,
+        observed={name: _finite(observed[name][0]) for name in ('finalEquity', 'maxDrawdown', 'sharpeRatio')},
+        distributions={name: distribution(combined[name], request.percentiles)
+                       for name in ('finalEquity', 'maxDrawdown', 'sharpeRatio')},
+        probabilityOfLoss=float((combined['finalEquity'] < request.initialCapital).mean()),
+        probabilityOfRuin=float(combined['ruined'].mean()),
+        seconds=seconds,
+    )
@@ -0,0 +1,80 @@
+import itertools
+import math
+import statistics
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel
+
+
+class ParameterRange(BaseModel):
+    """Inclusive numeric range, e.g. {"start": 5, "stop": 20, "step": 5} -> 5, 10, 15, 20"""
+    start: float
+    stop: float
+    step: float = 1
+
+    def values(self) -> List[Union[int, float]]:
+        if self.step <= 0:
+            raise ValueError("step must be positive")
+        count = int(math.floor((self.stop - self.start) / self.step + 1e-9)) + 1
+        values = [self.start + i * self.step for i in range(max(count, 0))]
+        if all(float(v).is_integer() for v in (self.start, self.step)):
+            return [int(v) for v in values]
+        return [round(v, 10) for v in values]
+
+
+ParameterSpec = Union[List[Any], ParameterRange]
+
+# Metrics where a smaller value ranks higher
+ASCENDING_METRICS = {'maxDrawdown', 'volatility', 'avgLoss'}
+
+
+def expand_grid(parameter_ranges: Dict[str, ParameterSpec], fixed: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Cartesian product of the parameter ranges, each merged over the fixed parameters"""
+    names = list(parameter_ranges)
+    axes = [spec.values() if isinstance(spec, ParameterRange) else list(spec) for spec in parameter_ranges.values()]
+    return [{**(fixed or {}), **dict(zip(names, combo))} for combo in itertools.product(*axes)]
+
+
+def trial_score(trial: Dict[str, Any], rank_by: str):
+    """Value of the ranking metric, looked up on the trial or inside its metrics"""
+    value = trial.get(rank_by, trial.get('metrics', {}).get(rank_by))
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+def rank_trials(trials: List[Dict[str, Any]], rank_by: str, ascending: Optional[bool] = None) -> List[Dict[str, Any]]:
+    """Sort successful trials by rank_by (best first) and number them; failed trials go last unranked"""
+    if ascending is None:
+        ascending = rank_by in ASCENDING_METRICS
+
+    scored = [t for t in trials if t.get('error') is None and trial_score(t, rank_by) is not None]
+    unscored = [t for t in trials if t not in scored]
+    scored.sort(key=lambda t: trial_score(t, rank_by), reverse=not ascending)
+
+    for rank, trial in enumerate(scored, start=1):
+        trial['rank'] = rank
+    for trial in unscored:
+        trial['rank'] = None
+    return scored + unscored
+
+
+def aggregate_runs(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Cross-run summary of a batch: counts, return/Sharpe distribution and best/worst run ids"""
+    succeeded = [row for row in rows if row.get('error') is None]
+    returns = sorted(row['totalReturn'] for row in succeeded)
+    sharpes = [row['sharpeRatio'] for row in succeeded]
+    by_return = sorted(succeeded, key=lambda row: row['totalReturn'])
+    return {
+        'runs': len(rows),
+        'succeeded': len(succeeded),
+        'failed': len(rows) - len(succeeded),
+        'profitable': sum(1 for value in returns if value > 0),
+        'meanReturn': sum(returns) / len(returns) if returns else None,
+        'medianReturn': statistics.median(returns) if returns else None,
+        'meanSharpeRatio': sum(sharpes) / len(sharpes) if sharpes else None,
+        'worstMaxDrawdown': max((row['maxDrawdown'] for row in succeeded), default=None),
+        'totalTrades': sum(row['totalTrades'] for row in succeeded),
+        'best': by_return[-1]['id'] if by_return else None,
+        'worst': by_return[0]['id'] if by_return else None,
+    }
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Request fields that do not change the computed result
+NON_SEMANTIC_FIELDS = {'strategyId', 'logLevel', 'useCache', 'progressInterval', 'resume'}
+
+
+def request_fingerprint(request: Dict[str, Any], data_versions: List[str]) -> str:
+    """Content hash of a backtest request plus the versions of the data it runs on"""
+    semantic = {k: v for k, v in request.items() if k not in NON_SEMANTIC_FIELDS}
+    canonical = json.dumps({'request': semantic, 'data': data_versions}, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResultCache:
+    """LRU + TTL cache of backtest results keyed by request fingerprint
+
+    With ``disk_dir`` set, results are also written as JSON files so they survive a
+    restart and are shared by every API process pointing at the same directory.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[int] = None, disk_dir: Optional[str] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '256'))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv('RESULT_CACHE_TTL_SECONDS', '3600'))
+        self.disk_dir = disk_dir if disk_dir is not None else os.getenv('RESULT_CACHE_DIR') or None
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        value = self._read_disk(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._insert(key, value, now)
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._insert(key, value, now)
+        if self.disk_dir:
+            try:
+                self._write_disk(key, value)
+            except Exception as e:
+                logger.warning(f"Failed to persist cached result {key}: {e}")
+
+    def _write_disk(self, key: str, value: Dict[str, Any]):
+        # A temp file of this writer's own, so concurrent writers of one key never share a partial file
+        path = self._disk_path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(value, f, default=str)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _insert(self, key: str, value: Dict[str, Any], stored_at: float):
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            if now - os.path.getmtime(path) > self.ttl_seconds:
+                os.remove(path)
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cached result {key}: {e}")
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'maxEntries': self.max_entries,
+                'ttlSeconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'persistent': bool(self.disk_dir)
+            }
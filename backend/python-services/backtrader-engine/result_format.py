@@ -0,0 +1,172 @@
+"""Content negotiation and encoding of backtest results
+
+Results keep ``dailyReturns`` as columns (one list per field) from the worker onwards;
+they are only rendered in the format the client asked for at the response:
+
+- ``application/json`` (default): ``dailyReturns`` as one object per bar
+- ``application/vnd.quantrade.columnar+json``: ``dailyReturns`` and ``trades`` as columns
+- ``application/vnd.apache.arrow.stream``: Arrow IPC stream of the ``dailyReturns``
+  table; the rest of the (columnar) result is JSON in the schema metadata under ``result``
+- ``application/msgpack``: the columnar result as MessagePack
+
+Bodies are compressed with br (when brotli is installed) or gzip per Accept-Encoding.
+"""
+import gzip
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROWS = 'application/json'
+COLUMNAR = 'application/vnd.quantrade.columnar+json'
+ARROW = 'application/vnd.apache.arrow.stream'
+MSGPACK = 'application/msgpack'
+
+# Media types a client may ask for, mapped to the format they select
+MEDIA_TYPES = {
+    ROWS: ROWS,
+    COLUMNAR: COLUMNAR,
+    ARROW: ARROW,
+    MSGPACK: MSGPACK,
+    'application/x-msgpack': MSGPACK,
+    '*/*': ROWS,
+    'application/*': ROWS,
+}
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+
+def available_formats() -> List[str]:
+    formats = [ROWS, COLUMNAR]
+    if pa is not None:
+        formats.append(ARROW)
+    if msgpack is not None:
+        formats.append(MSGPACK)
+    return formats
+
+
+def _accepted(header: str) -> List[Tuple[float, int, str]]:
+    """(quality, position, value) of each entry of an Accept-style header, leaving out those with q=0"""
+    entries = []
+    for position, part in enumerate(header.split(',')):
+        value, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, q = param.strip().partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(q)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            entries.append((quality, position, value.strip().lower()))
+    return entries
+
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """Pick the result format for an Accept header, or None if nothing acceptable is available"""
+    if not accept:
+        return ROWS
+    supported = available_formats()
+    for _, _, media_type in sorted(_accepted(accept), key=lambda entry: (-entry[0], entry[1])):
+        selected = MEDIA_TYPES.get(media_type)
+        if selected in supported:
+            return selected
+    return None
+
+
+def json_safe(value: Any) -> Any:
+    """Copy of a plain result (dicts, lists, floats) with non-finite floats as None
+
+    Pydantic models already serialize inf and NaN as null; plain dicts such as
+    optimization results would otherwise fail JSON encoding (e.g. a ``profitFactor``
+    of inf for a run without losing trades).
+    """
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    if isinstance(value, (float, np.floating)):
+        return float(value) if math.isfinite(value) else None
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def columns_to_records(columns: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+
+def records_to_columns(records: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    if not records:
+        return {}
+    return {name: [record.get(name) for record in records] for name in records[0]}
+
+
+def _with_results(result: BaseModel, **changes) -> BaseModel:
+    return result.model_copy(update={'results': {**result.results, **changes}})
+
+
+def _msgpack_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _arrow_stream(result: BaseModel) -> bytes:
+    columns = result.results.get('dailyReturns') or {}
+    arrays = {name: pa.array(values) for name, values in columns.items()}
+    if 'date' in columns:
+        arrays['date'] = pa.array(np.array(columns['date'], dtype='datetime64[D]'))
+    table = pa.table(arrays)
+    rest = _with_results(result, dailyReturns=None, trades=records_to_columns(result.results.get('trades', [])))
+    table = table.replace_schema_metadata({'result': rest.model_dump_json()})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_result(result: BaseModel, media_type: str) -> bytes:
+    """Serialize a result whose ``results.dailyReturns`` is columnar"""
+    if media_type == ROWS:
+        return _with_results(result, dailyReturns=columns_to_records(result.results.get('dailyReturns') or {})
+                             ).model_dump_json().encode()
+    if media_type == ARROW:
+        return _arrow_stream(result)
+
+    columnar = _with_results(result, trades=records_to_columns(result.results.get('trades', [])))
+    if media_type == MSGPACK:
+        return msgpack.packb(columnar.model_dump(), default=_msgpack_default, use_bin_type=True)
+    return columnar.model_dump_json().encode()
+
+
+def compress(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """Compress the body with the best encoding the client accepts; returns (body, Content-Encoding)"""
+    if len(body) < MIN_COMPRESS_BYTES or not accept_encoding:
+        return body, None
+    encodings = {encoding for _, _, encoding in _accepted(accept_encoding)}
+    if brotli is not None and 'br' in encodings:
+        return brotli.compress(body, quality=5), 'br'
+    if 'gzip' in encodings:
+        return gzip.compress(body, compresslevel=5), 'gzip'
+    return body, None
@@ -0,0 +1,231 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def _default_root() -> str:
+    # /dev/shm is RAM-backed on Linux, so every worker mapping the same file shares one copy of the pages
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, f"backtrader-engine-{os.getpid()}")
+
+
+class SharedFrame:
+    """Picklable handle to an OHLCV frame published in the shared store
+
+    Workers call ``to_frame()`` to get a read-only DataFrame backed directly by the
+    memory-mapped files, without copying the columns into the worker.
+    """
+
+    def __init__(self, key: str, symbol: str, index_path: str, values_path: str, columns: List[str], nbytes: int,
+                 fingerprint: str):
+        self.key = key
+        self.symbol = symbol
+        self.index_path = index_path
+        self.values_path = values_path
+        self.columns = columns
+        self.nbytes = nbytes
+        # Content hash of the bars, used to tell data versions apart
+        self.fingerprint = fingerprint
+
+    def __len__(self):
+        return int(np.load(self.index_path, mmap_mode='r').shape[0])
+
+    def to_frame(self) -> pd.DataFrame:
+        frame = _attached.get(self.values_path)
+        if frame is None:
+            index = np.load(self.index_path, mmap_mode='r')
+            # Stored column-major, so the transposed view pandas keeps internally needs no copy
+            values = np.load(self.values_path, mmap_mode='r')
+            frame = pd.DataFrame(values, index=pd.DatetimeIndex(index.view('datetime64[ns]'), name='Date'),
+                                 columns=self.columns, copy=False)
+            _attached[self.values_path] = frame
+            while len(_attached) > MAX_ATTACHED_PER_PROCESS:
+                _attached.popitem(last=False)
+        else:
+            _attached.move_to_end(self.values_path)
+        return frame
+
+
+# Per-process memo of attached frames, so repeated trials in one worker reuse the mapping
+MAX_ATTACHED_PER_PROCESS = 64
+_attached: 'OrderedDict[str, pd.DataFrame]' = OrderedDict()
+
+
+def materialize(frames: Dict[str, object]) -> Dict[str, pd.DataFrame]:
+    """Resolve SharedFrame handles to DataFrames; plain DataFrames pass through"""
+    return {symbol: frame.to_frame() if isinstance(frame, SharedFrame) else frame for symbol, frame in frames.items()}
+
+
+class _Entry:
+    def __init__(self, handle: SharedFrame, version=None):
+        self.handle = handle
+        # Data-source version token the bars were fetched at (None when the source has none)
+        self.version = version
+        self.created = time.monotonic()
+        self.refs = 0
+
+
+class SharedMarketData:
+    """Reference-counted store of OHLCV frames in memory-mapped files shared by all workers
+
+    A symbol/date-range is written once; every job touching it holds a reference until
+    it finishes. Unreferenced entries are evicted least recently used first once the
+    store exceeds ``max_bytes``.
+
+    An entry is stale once it is older than ``ttl_seconds`` or its data source reports
+    a different version than the one it was fetched at. Stale entries are never handed
+    out again; jobs still holding one keep it until they release it.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None):
+        self.root = root or _default_root()
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv('SHARED_DATA_MAX_MB', '1024')) * 1024 * 1024
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('SHARED_DATA_TTL_SECONDS', '3600'))
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        # Stale entries still referenced by running jobs, by handle identity
+        self._retired: Dict[int, _Entry] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+    @staticmethod
+    def make_key(symbol: str, start_date: str, end_date: str, data_source: str = 'yahoo') -> str:
+        return f"{data_source}|{symbol}|{start_date}|{end_date}"
+
+    def _publish(self, key: str, symbol: str, data: pd.DataFrame) -> SharedFrame:
+        numeric = data.select_dtypes(include='number')
+        os.makedirs(self.root, exist_ok=True)
+        file_id = uuid.uuid4().hex
+        index_path = os.path.join(self.root, f"{file_id}.index.npy")
+        values_path = os.path.join(self.root, f"{file_id}.values.npy")
+
+        index = pd.DatetimeIndex(data.index).as_unit('ns').asi8
+        values = np.asfortranarray(numeric.to_numpy(dtype=np.float64))
+        np.save(index_path, index)
+        np.save(values_path, values)
+
+        columns = [str(c) for c in numeric.columns]
+        digest = hashlib.sha1(index.tobytes())
+        digest.update(','.join(columns).encode())
+        digest.update(values.tobytes(order='F'))
+        return SharedFrame(key, symbol, index_path, values_path, columns, index.nbytes + values.nbytes, digest.hexdigest())
+
+    def _stale(self, entry: _Entry, version) -> bool:
+        if version is not None and entry.version != version:
+            return True
+        return self.ttl_seconds > 0 and time.monotonic() - entry.created > self.ttl_seconds
+
+    def _retire(self, key: str):
+        # Called with the lock held
+        entry = self._entries.pop(key)
+        if entry.refs > 0:
+            self._retired[id(entry.handle)] = entry
+        else:
+            self._bytes -= entry.handle.nbytes
+            self._remove_files(entry.handle)
+
+    def get(self, key: str, version=None) -> Optional[SharedFrame]:
+        """Acquire an existing entry, or None if it is not in the store or is stale
+
+        ``version`` is the data source's current version token for the symbol, if it has one.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._stale(entry, version):
+                self._retire(key)
+                return None
+            entry.refs += 1
+            self._entries.move_to_end(key)
+            return entry.handle
+
+    def put(self, key: str, symbol: str, data: pd.DataFrame, version=None) -> SharedFrame:
+        """Publish a frame and acquire it
+
+        Reuses the entry another thread published meanwhile when it holds the same bars;
+        an entry with different bars is replaced.
+        """
+        handle = self._publish(key, symbol, data)
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                if existing.handle.fingerprint == handle.fingerprint and not self._stale(existing, version):
+                    self._remove_files(handle)
+                    existing.refs += 1
+                    self._entries.move_to_end(key)
+                    return existing.handle
+                self._retire(key)
+            entry = _Entry(handle, version)
+            entry.refs = 1
+            self._entries[key] = entry
+            self._bytes += handle.nbytes
+            self._evict()
+        return handle
+
+    def acquire(self, key: str, symbol: str, loader: Callable[[], pd.DataFrame], version=None) -> SharedFrame:
+        handle = self.get(key, version)
+        return handle if handle is not None else self.put(key, symbol, loader(), version)
+
+    def release(self, handles) -> None:
+        with self._lock:
+            for handle in handles:
+                entry = self._entries.get(handle.key)
+                if entry is None or entry.handle is not handle:
+                    entry = self._retired.get(id(handle))
+                if entry is None or entry.refs == 0:
+                    continue
+                entry.refs -= 1
+                if entry.refs == 0 and self._retired.get(id(handle)) is entry:
+                    del self._retired[id(handle)]
+                    self._bytes -= handle.nbytes
+                    self._remove_files(handle)
+            self._evict()
+
+    def _evict(self):
+        # Called with the lock held; workers that already mapped an evicted file keep their pages until they drop it
+        for key in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry.refs == 0:
+                del self._entries[key]
+                self._bytes -= entry.handle.nbytes
+                self._remove_files(entry.handle)
+
+    @staticmethod
+    def _remove_files(handle: SharedFrame):
+        for path in (handle.index_path, handle.values_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'referenced': sum(1 for e in self._entries.values() if e.refs > 0),
+                'retired': len(self._retired),
+                'bytes': self._bytes,
+                'maxBytes': self.max_bytes
+            }
+
+    def close(self):
+        with self._lock:
+            self._entries.clear()
+            self._retired.clear()
+            self._bytes = 0
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -0,0 +1,254 @@
+import ast
+import builtins
+import hashlib
+import logging
+import math
+import os
+import sys
+import threading
+import types
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import backtrader as bt
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAX_SOURCE_BYTES = 100_000
+
+# Modules strategy code may import; everything else fails at validation
+ALLOWED_MODULES = {'backtrader', 'math', 'numpy', 'statistics', 'datetime', 'collections', 'itertools', 'functools'}
+
+# Builtins that cannot reach the file system, the interpreter or other modules
+SAFE_BUILTINS = {
+    name: getattr(builtins, name) for name in (
+        'abs', 'all', 'any', 'bool', 'dict', 'divmod', 'enumerate', 'filter', 'float', 'int', 'isinstance',
+        'issubclass', 'len', 'list', 'map', 'max', 'min', 'object', 'pow', 'print', 'range', 'reversed', 'round',
+        'set', 'slice', 'sorted', 'str', 'sum', 'tuple', 'zip', 'super', 'property', 'staticmethod', 'classmethod',
+        'Exception', 'ValueError', 'TypeError', 'KeyError', 'IndexError', 'ZeroDivisionError', 'ArithmeticError',
+        '__build_class__',
+    )
+}
+
+FORBIDDEN_NAMES = {
+    'eval', 'exec', 'compile', 'open', 'input', 'globals', 'locals', 'vars', 'getattr', 'setattr', 'delattr',
+    'breakpoint', 'memoryview', 'help', 'exit', 'quit', '__import__', '__builtins__',
+}
+
+# Attributes that lead out of the sandbox through the allowed modules (e.g. ``bt.utils.py3.sys``), read or
+# write files (numpy's I/O, ``ndarray.tofile``, backtrader's data feeds and writers) or reach native code
+FORBIDDEN_ATTRIBUTES = {
+    'os', 'sys', 'subprocess', 'builtins', 'importlib', 'socket', 'shutil', 'pickle', 'io', 'multiprocessing',
+    'threading', 'inspect', 'queue', 'ctypes', 'ctypeslib', 'load', 'loadtxt', 'genfromtxt', 'fromregex', 'save',
+    'savez', 'savez_compressed', 'savetxt', 'fromfile', 'tofile', 'dump', 'memmap', 'lib', 'DataSource', 'f2py',
+    'feeds', 'stores', 'brokers', 'WriterFile',
+}
+
+# The numpy strategy code gets: numeric functions only, no file I/O, ctypes or submodules beyond linalg
+SAFE_NUMPY_NAMES = (
+    'nan', 'inf', 'pi', 'e', 'newaxis', 'ndarray', 'float32', 'float64', 'int32', 'int64', 'bool_',
+    'array', 'asarray', 'zeros', 'ones', 'full', 'empty', 'zeros_like', 'ones_like', 'full_like', 'empty_like',
+    'arange', 'linspace', 'concatenate', 'stack', 'vstack', 'hstack', 'append', 'roll', 'where', 'sort', 'argsort',
+    'unique', 'abs', 'absolute', 'sign', 'sqrt', 'square', 'exp', 'expm1', 'log', 'log1p', 'log2', 'log10', 'power',
+    'floor', 'ceil', 'round', 'clip', 'maximum', 'minimum', 'sin', 'cos', 'tan', 'arctan', 'tanh',
+    'sum', 'prod', 'mean', 'average', 'median', 'std', 'var', 'min', 'max', 'amin', 'amax', 'argmin', 'argmax',
+    'cumsum', 'cumprod', 'diff', 'percentile', 'quantile', 'nansum', 'nanmean', 'nanmedian', 'nanstd', 'nanvar',
+    'nanmin', 'nanmax', 'isnan', 'isinf', 'isfinite', 'nan_to_num', 'any', 'all', 'count_nonzero', 'dot',
+    'convolve', 'corrcoef', 'cov', 'polyfit', 'polyval',
+)
+SAFE_LINALG_NAMES = ('norm', 'inv', 'pinv', 'solve', 'lstsq', 'det')
+
+
+class StrategyError(ValueError):
+    """Strategy source that cannot be compiled or does not define a usable strategy"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+    def __reduce__(self):
+        # Raised inside workers and pickled back to the API process
+        return StrategyError, (self.errors,)
+
+
+def _module_view(name: str, module: types.ModuleType, names, **submodules) -> types.ModuleType:
+    view = types.ModuleType(name)
+    view.__dict__.update({attr: getattr(module, attr) for attr in names}, **submodules)
+    return view
+
+
+SAFE_NUMPY = _module_view('numpy', np, SAFE_NUMPY_NAMES,
+                          linalg=_module_view('numpy.linalg', np.linalg, SAFE_LINALG_NAMES))
+
+# Imports of these modules resolve to the vetted views instead of the real modules
+VETTED_MODULES = {'numpy': SAFE_NUMPY, 'numpy.linalg': SAFE_NUMPY.linalg}
+
+
+def _forbidden_attribute(name: str, on_self: bool = False) -> bool:
+    # Dunders reach frames, globals and subclasses; private names reach imported modules (``collections._sys``)
+    if name.startswith('__'):
+        return name != '__init__'
+    return name in FORBIDDEN_ATTRIBUTES or (name.startswith('_') and not on_self)
+
+
+def _check_tree(tree: ast.AST) -> List[str]:
+    """Problems with the parsed source; an empty list means it passed"""
+    errors = []
+    for node in ast.walk(tree):
+        line = getattr(node, 'lineno', '?')
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            modules = [alias.name for alias in node.names] if isinstance(node, ast.Import) else [node.module or '']
+            for module in modules:
+                if module.split('.')[0] not in ALLOWED_MODULES:
+                    errors.append(f"Line {line}: import of '{module}' is not allowed")
+            names = [part for module in modules for part in module.split('.')[1:]]
+            if isinstance(node, ast.ImportFrom):
+                names += [alias.name for alias in node.names]
+            for name in names:
+                if _forbidden_attribute(name):
+                    errors.append(f"Line {line}: import of '{name}' is not allowed")
+        elif isinstance(node, ast.Name) and (node.id in FORBIDDEN_NAMES or node.id.startswith('__')):
+            errors.append(f"Line {line}: use of '{node.id}' is not allowed")
+        elif isinstance(node, ast.Attribute):
+            on_self = isinstance(node.value, ast.Name) and node.value.id == 'self'
+            if _forbidden_attribute(node.attr, on_self):
+                errors.append(f"Line {line}: access to '{node.attr}' is not allowed")
+        elif isinstance(node, ast.MatchClass):
+            # Class patterns read attributes too: ``case object(__class__=c)``
+            for attr in node.kwd_attrs:
+                if _forbidden_attribute(attr):
+                    errors.append(f"Line {line}: access to '{attr}' is not allowed")
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            errors.append(f"Line {line}: '{type(node).__name__.lower()}' statements are not allowed")
+    return errors
+
+
+def _restricted_import(name, globals=None, locals=None, fromlist=(), level=0):
+    root = name.split('.')[0]
+    if level != 0 or root not in ALLOWED_MODULES:
+        raise ImportError(f"import of '{name}' is not allowed")
+    if root in VETTED_MODULES:
+        if name not in VETTED_MODULES:
+            raise ImportError(f"import of '{name}' is not allowed")
+        return VETTED_MODULES[name] if fromlist else VETTED_MODULES[root]
+    return __import__(name, globals, locals, fromlist, level)
+
+
+class CompiledStrategy:
+    """Validated, compiled strategy source; ``load()`` executes it once per process"""
+
+    def __init__(self, key: str, code, class_names: List[str]):
+        self.key = key
+        self.code = code
+        self.class_names = class_names
+        self._strategy_class: Optional[type] = None
+
+    @property
+    def name(self) -> str:
+        return self.class_names[-1]
+
+    @property
+    def module_name(self) -> str:
+        return f"user_strategy_{self.key[:16]}"
+
+    def load(self) -> type:
+        """Execute the module in a restricted namespace and return its strategy class
+
+        When the source defines several ``bt.Strategy`` subclasses (e.g. a base and a
+        concrete strategy) the last one defined is used. Run this only inside a worker:
+        the class body is user code, and the worker's CPU/wall limits bound it.
+        """
+        if self._strategy_class is None:
+            # Backtrader looks classes up through sys.modules, so the code runs as a registered module
+            module = types.ModuleType(self.module_name)
+            namespace: Dict[str, Any] = module.__dict__
+            namespace.update({
+                '__builtins__': {**SAFE_BUILTINS, '__import__': _restricted_import},
+                'bt': bt,
+                'math': math,
+                'np': SAFE_NUMPY,
+            })
+            sys.modules[self.module_name] = module
+            try:
+                exec(self.code, namespace)
+            except Exception as e:
+                self.unload()
+                raise StrategyError([f"{type(e).__name__} while loading strategy: {e}"])
+
+            strategies = [namespace.get(name) for name in self.class_names]
+            strategies = [cls for cls in strategies if isinstance(cls, type) and issubclass(cls, bt.Strategy)]
+            if not strategies:
+                self.unload()
+                raise StrategyError(["No class deriving from bt.Strategy found"])
+            self._strategy_class = strategies[-1]
+        return self._strategy_class
+
+    def unload(self):
+        self._strategy_class = None
+        sys.modules.pop(self.module_name, None)
+
+
+class StrategyRegistry:
+    """LRU cache of compiled strategy sources keyed by their sha256
+
+    Submitting the same source again skips parsing, validation and compilation, and a
+    worker that already loaded it reuses the class. Restricting builtins, imports and
+    attribute access keeps casual mistakes and obvious escapes out; the real boundary
+    is the worker process the code runs in.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('STRATEGY_CACHE_SIZE', '128'))
+        self._entries: 'OrderedDict[str, CompiledStrategy]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(source: str) -> str:
+        return hashlib.sha256(source.encode()).hexdigest()
+
+    def compile(self, source: str) -> CompiledStrategy:
+        """Validated, compiled strategy for the source; raises StrategyError"""
+        key = self.make_key(source)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+
+        compiled = self._compile(key, source)
+        with self._lock:
+            compiled = self._entries.setdefault(key, compiled)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)[1].unload()
+        return compiled
+
+    @staticmethod
+    def _compile(key: str, source: str) -> CompiledStrategy:
+        if len(source.encode()) > MAX_SOURCE_BYTES:
+            raise StrategyError([f"Strategy code exceeds {MAX_SOURCE_BYTES} bytes"])
+        try:
+            tree = ast.parse(source, filename=f"<strategy {key[:12]}>")
+        except SyntaxError as e:
+            raise StrategyError([f"Syntax error: {e}"])
+
+        errors = _check_tree(tree)
+        class_names = [node.name for node in tree.body if isinstance(node, ast.ClassDef)]
+        if not class_names:
+            errors.append("No strategy class defined")
+        if errors:
+            raise StrategyError(errors)
+
+        logger.info(f"Compiled strategy {class_names[-1]} ({key[:12]})")
+        return CompiledStrategy(key, compile(tree, f"<strategy {key[:12]}>", 'exec'), class_names)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._entries), 'maxEntries': self.max_entries, 'hits': self.hits, 'misses': self.misses}
+
+
+strategy_registry = StrategyRegistry()
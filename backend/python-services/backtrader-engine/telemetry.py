@@ -0,0 +1,199 @@
+"""Stage timing and Prometheus metrics of the engine
+
+``StageTimer`` collects the wall seconds of the stages of one request. Stages that run
+in a worker process (building the feeds, ``cerebro.run``, reading the analyzers, the
+metrics) travel back with the result, and the API process records every stage in
+the metrics below, so ``GET /metrics`` covers all workers:
+
+- ``backtest_stage_seconds{stage, engine}``: histogram per backtest stage
+- ``backtest_data_fetch_seconds{data_source, origin}``: histogram per symbol loaded;
+  ``origin`` is ``shared`` when the shared store already held it
+- ``backtest_data_fetch_failures_total{data_source}``
+- ``backtest_results_total{engine, cache}``: backtests served, by result-cache outcome
+- ``http_request_duration_seconds{method, route, status}``: histogram per endpoint,
+  from receiving the request until the response body is sent
+
+Metrics are rendered in the Prometheus text exposition format without depending on
+``prometheus_client``.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Prometheus' default buckets plus the minutes a long Cerebro run can take
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class StageTimer:
+    """Wall seconds of the named stages of one request, in the order they first ran"""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def rounded(self) -> Dict[str, float]:
+        return {name: round(seconds, 4) for name, seconds in self.seconds.items()}
+
+
+def server_timing(seconds: Dict[str, float]) -> str:
+    """``Server-Timing`` header value of stage timings, in milliseconds"""
+    return ', '.join(f"{name};dur={value * 1000:.1f}" for name, value in seconds.items())
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        key = tuple(str(value) for value in labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in values)
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: (count per bucket, not cumulative; sum; count)
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        key = tuple(str(label) for label in labelvalues)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float('inf')), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, ('le', _number(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(line for metric in self._metrics for line in metric.collect()) + '\n'
+
+
+registry = Registry()
+
+stage_seconds = registry.register(Histogram(
+    'backtest_stage_seconds', 'Wall seconds of each stage of a backtest', ('stage', 'engine')))
+data_fetch_seconds = registry.register(Histogram(
+    'backtest_data_fetch_seconds', 'Wall seconds to load one symbol', ('data_source', 'origin')))
+data_fetch_failures = registry.register(Counter(
+    'backtest_data_fetch_failures_total', 'Symbols that failed to load', ('data_source',)))
+results_total = registry.register(Counter(
+    'backtest_results_total', 'Backtest results served', ('engine', 'cache')))
+request_seconds = registry.register(Histogram(
+    'http_request_duration_seconds', 'Wall seconds from receiving a request to sending its response',
+    ('method', 'route', 'status')))
+
+
+def observe_stages(seconds: Dict[str, float], engine: str):
+    for name, value in seconds.items():
+        stage_seconds.observe(value, name, engine)
+
+
+def observe_data_load(timings: List[Dict], data_source: str):
+    for timing in timings:
+        if timing.get('status') == 'failed':
+            data_fetch_failures.inc(data_source)
+        else:
+            data_fetch_seconds.observe(timing['seconds'], data_source, timing.get('source', 'fetched'))
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route template
+
+    Stores the arrival time in ``request.state.received`` so handlers can tell how long
+    reading and validating the body took. Requests matching no route share the
+    ``unmatched`` label, keeping the number of series bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        received = time.perf_counter()
+        scope.setdefault('state', {})['received'] = received
+        status = [500]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get('route')
+            request_seconds.observe(time.perf_counter() - received, scope['method'],
+                                    getattr(route, 'path', 'unmatched'), status[0])
@@ -0,0 +1,121 @@
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The service is a flat directory of modules, not a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_sources import DataSource, register_data_source  # noqa: E402
+
+
+def make_ohlcv(bars: int = 500, seed: int = 1, start: str = '2018-01-01', freq: str = 'B') -> pd.DataFrame:
+    """Random-walk daily bars shaped like normalized Yahoo data"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, bars)))
+    opens = close * np.exp(rng.normal(0, 0.004, bars))
+    index = pd.date_range(start, periods=bars, freq=freq, name='Date')
+    return pd.DataFrame({
+        'Open': opens,
+        'High': np.maximum(opens, close) * 1.005,
+        'Low': np.minimum(opens, close) * 0.995,
+        'Close': close,
+        'Volume': rng.integers(1_000, 100_000, bars).astype(np.float64),
+    }, index=index)
+
+
+@pytest.fixture
+def ohlcv():
+    return make_ohlcv()
+
+
+def trending_ohlcv(bars: int = 400) -> pd.DataFrame:
+    """Uptrend with a regular swing: moving-average crossovers on it only ever close winning trades"""
+    t = np.arange(bars)
+    close = 100 + 0.3 * t + 3 * np.sin(2 * np.pi * t / 40)
+    index = pd.date_range('2018-01-01', periods=bars, freq='B', name='Date')
+    return pd.DataFrame({'Open': close, 'High': close + 0.5, 'Low': close - 0.5, 'Close': close, 'Volume': 1000.0},
+                        index=index)
+
+
+RELATIVE_TOLERANCE = 1e-7
+
+
+def differences(expected, actual, path='') -> list:
+    """Paths where two result trees differ beyond RELATIVE_TOLERANCE"""
+    if isinstance(expected, dict):
+        keys = set(expected) | set(actual)
+        return [d for k in sorted(keys) for d in differences(expected.get(k), actual.get(k), f"{path}.{k}")]
+    if isinstance(expected, (list, tuple)):
+        if len(expected) != len(actual):
+            return [f"{path}: length {len(expected)} != {len(actual)}"]
+        return [d for i, (e, a) in enumerate(zip(expected, actual)) for d in differences(e, a, f"{path}[{i}]")]
+    if isinstance(expected, (float, int, np.floating)) and isinstance(actual, (float, int, np.floating)):
+        if math.isclose(expected, actual, rel_tol=RELATIVE_TOLERANCE, abs_tol=1e-9) or expected == actual:
+            return []
+    elif expected == actual:
+        return []
+    return [f"{path}: {expected!r} != {actual!r}"]
+
+
+def comparable(run: dict) -> dict:
+    """The parts of an engine run that both engines must agree on"""
+    return {
+        **{k: run[k] for k in ('finalCapital', 'totalTrades', 'winRate', 'maxDrawdown', 'sharpeRatio', 'totalReturn',
+                               'trades', 'metrics', 'events')},
+        'equity': run['series'].values.tolist(),
+        'cash': np.asarray(run['equity']['cash']).tolist(),
+        'dates': np.asarray(run['equity']['timestamps']).tolist()
+    }
+
+
+class FrameSource(DataSource):
+    """Serves fixed frames by symbol, so API tests run offline"""
+
+    def __init__(self, name: str, frames):
+        self.name = name
+        self.frames = frames
+
+    def fetch(self, symbol, start_date, end_date):
+        data = self.frames.get(symbol)
+        if data is None:
+            raise ValueError(f"No data found for symbol {symbol}")
+        index = data.index
+        data = data[(index >= pd.Timestamp(start_date)) & (index < pd.Timestamp(end_date))]
+        if data.empty:
+            raise ValueError(f"No data found for symbol {symbol} between {start_date} and {end_date}")
+        return data
+
+
+@pytest.fixture(scope='session')
+def client():
+    """API client with the worker pool running for the whole session"""
+    from fastapi.testclient import TestClient
+
+    import app
+
+    register_data_source(FrameSource('test', {'UP': trending_ohlcv(), 'RW': make_ohlcv(), 'RW2': make_ohlcv(seed=2)}))
+    with TestClient(app.app) as client:
+        yield client
+
+
+def strict_json(text: str):
+    """Parse a response body, failing on NaN/Infinity, which are not valid JSON"""
+    def reject(constant):
+        raise ValueError(f"{constant} is not valid JSON")
+    return json.loads(text, parse_constant=reject)
+
+
+def wait_for_job(client, job_id: str, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f"/jobs/{job_id}").json()
+        if status['status'] not in ('queued', 'running'):
+            return status
+        time.sleep(0.1)
+    raise TimeoutError(f"Job {job_id} did not finish")
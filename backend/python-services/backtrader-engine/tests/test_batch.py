@@ -0,0 +1,101 @@
+import pytest
+
+from conftest import FrameSource, make_ohlcv, strict_json, trending_ohlcv
+from data_sources import register_data_source
+
+REQUEST = {
+    'strategyId': 'batch',
+    'startDate': '2018-01-01',
+    'endDate': '2019-07-01',
+    'initialCapital': 100000,
+    'useCache': False,
+    'rankBy': 'totalReturn',
+}
+
+RUNS = [
+    {'id': 'up', 'strategyCode': 'MovingAverageCross', 'parameters': {'fast_period': 5, 'slow_period': 15},
+     'symbols': ['UP']},
+    {'id': 'rw', 'strategyCode': 'MovingAverageCross', 'parameters': {'fast_period': 5, 'slow_period': 20},
+     'symbols': ['RW']},
+    {'id': 'rsi', 'strategyCode': 'RSI', 'parameters': {'rsi_period': 7, 'rsi_upper': 65, 'rsi_lower': 35},
+     'symbols': ['RW', 'UP']},
+    {'id': 'missing', 'strategyCode': 'MovingAverageCross', 'symbols': ['NOPE']},
+]
+
+
+class CountingSource(FrameSource):
+    def __init__(self, name, frames):
+        super().__init__(name, frames)
+        self.fetches = []
+
+    def fetch(self, symbol, start_date, end_date):
+        self.fetches.append(symbol)
+        return super().fetch(symbol, start_date, end_date)
+
+
+@pytest.fixture
+def source(request):
+    # A name of its own, so no other test has put these symbols in the shared store
+    source = CountingSource(f"test-batch-{request.node.name}", {'UP': trending_ohlcv(), 'RW': make_ohlcv()})
+    register_data_source(source)
+    return source
+
+
+def _batch(client, source, **changes):
+    response = client.post('/backtest/batch', json={**REQUEST, 'dataSource': source.name, 'runs': RUNS, **changes})
+    assert response.status_code == 200
+    return strict_json(response.text)
+
+
+def test_runs_are_ranked_and_failures_go_last_without_failing_the_batch(client, source):
+    result = _batch(client, source)
+    runs = result['runs']
+
+    assert [row['rank'] for row in runs] == [1, 2, 3, None]
+    returns = [row['totalReturn'] for row in runs[:3]]
+    assert returns == sorted(returns, reverse=True)
+    failed = runs[-1]
+    assert failed['id'] == 'missing' and failed['error'] == "No valid data feeds added"
+    assert 'totalReturn' not in failed
+    assert all(row['error'] is None for row in runs[:3])
+
+
+def test_summary_aggregates_the_successful_runs(client, source):
+    result = _batch(client, source)
+    succeeded = {row['id']: row for row in result['runs'] if row['error'] is None}
+    summary = result['summary']
+
+    assert (summary['runs'], summary['succeeded'], summary['failed']) == (4, 3, 1)
+    assert summary['best'] == max(succeeded, key=lambda k: succeeded[k]['totalReturn'])
+    assert summary['worst'] == min(succeeded, key=lambda k: succeeded[k]['totalReturn'])
+    assert summary['totalTrades'] == sum(row['totalTrades'] for row in succeeded.values())
+    assert summary['meanReturn'] == pytest.approx(sum(r['totalReturn'] for r in succeeded.values()) / 3)
+    assert summary['profitable'] == sum(1 for row in succeeded.values() if row['totalReturn'] > 0)
+
+
+def test_each_symbol_is_loaded_once(client, source):
+    result = _batch(client, source)
+
+    assert sorted(source.fetches) == ['NOPE', 'RW', 'UP']
+    assert [timing['symbol'] for timing in result['dataLoad']] == ['UP', 'RW', 'NOPE']
+    assert result['dataLoad'][-1]['status'] != 'ok'
+
+
+def test_full_results_only_when_asked_for(client, source):
+    assert _batch(client, source)['results'] is None
+
+    results = _batch(client, source, includeResults=True)['results']
+    assert sorted(results) == ['rsi', 'rw', 'up']
+    for run in results.values():
+        assert run['results']['trades'] and isinstance(run['results']['dailyReturns'], list)
+        assert set(run['results']['dailyReturns'][0]) >= {'date', 'portfolioValue'}
+
+
+def test_all_winning_run_serializes_as_valid_json(client, source):
+    # trending_ohlcv only gives moving-average crossovers winning trades: an infinite profit factor
+    result = _batch(client, source, runs=RUNS[:1], includeResults=True)
+    row = result['runs'][0]
+
+    assert row['error'] is None and row['totalTrades'] > 0
+    assert row['metrics']['profitFactor'] is None
+    assert result['results']['up']['results']['metrics']['profitFactor'] is None
@@ -0,0 +1,68 @@
+import pytest
+
+from app import BacktestRequest, run_engine
+from conftest import comparable, differences, make_ohlcv
+
+REQUEST = {
+    'strategyId': 'resume',
+    'strategyCode': 'MovingAverageCross',
+    'parameters': {'fast_period': 5, 'slow_period': 20},
+    'startDate': '2018-01-01',
+    'endDate': '2019-07-01',
+    'initialCapital': 100000,
+    'symbols': ['RW'],
+    'engine': 'vectorized',
+}
+
+
+def _run(frame, checkpoint=None, **changes):
+    request = BacktestRequest(**{**REQUEST, **changes})
+    return run_engine(request, {'RW': frame}, checkpoint=checkpoint)
+
+
+@pytest.mark.parametrize('capital', [100000, 100], ids=['unlimited', 'cash-limited'])
+def test_resumed_run_matches_a_full_run(capital):
+    frame = make_ohlcv(bars=1200, seed=5)
+    full = _run(frame, initialCapital=capital)
+    assert full['totalTrades'] > 5
+
+    # Cut points land both while flat and while holding a position
+    holding = []
+    for bars in range(300, 1200, 37):
+        partial = _run(frame.iloc[:bars], initialCapital=capital)
+        holding.append(bool(partial['checkpoint']['trips']) and partial['checkpoint']['trips'][-1][1] is None)
+        resumed = _run(frame, partial['checkpoint'], initialCapital=capital)
+
+        assert resumed['resumedFrom']['bars'] == bars
+        assert differences(comparable(full), comparable(resumed)) == []
+        assert resumed['checkpoint'] == full['checkpoint']
+    assert any(holding) and not all(holding)
+
+
+def test_checkpoint_over_different_data_is_ignored():
+    frame = make_ohlcv(bars=800, seed=5)
+    checkpoint = _run(make_ohlcv(bars=500, seed=6))['checkpoint']
+    resumed = _run(frame, checkpoint)
+
+    assert resumed['resumedFrom'] is None
+    assert differences(comparable(_run(frame)), comparable(resumed)) == []
+
+
+def test_checkpoint_of_another_version_is_ignored():
+    frame = make_ohlcv(bars=800, seed=5)
+    checkpoint = {**_run(frame.iloc[:500])['checkpoint'], 'version': 0}
+    assert _run(frame, checkpoint)['resumedFrom'] is None
+
+
+def test_later_end_date_resumes_through_the_api(client):
+    request = {**REQUEST, 'dataSource': 'test', 'useCache': False}
+    first = client.post('/backtest', json={**request, 'endDate': '2019-01-01'}).json()
+    resumed = client.post('/backtest', json=request).json()
+    fresh = client.post('/backtest', json={**request, 'resume': False}).json()
+
+    assert 'resumedFrom' not in first['results']
+    assert resumed['results']['resumedFrom']['date'] == first['results']['dailyReturns'][-1]['date']
+    assert 'resumedFrom' not in fresh['results']
+    assert resumed['results']['trades'] == fresh['results']['trades']
+    assert resumed['results']['dailyReturns'] == fresh['results']['dailyReturns']
+    assert resumed['finalCapital'] == fresh['finalCapital']
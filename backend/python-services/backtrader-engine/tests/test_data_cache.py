@@ -0,0 +1,46 @@
+import os
+import threading
+
+import pandas as pd
+
+from conftest import make_ohlcv
+from data_cache import OHLCVCache
+
+HISTORY = make_ohlcv(bars=1000, start='2015-01-01')
+
+
+def _fetcher(calls):
+    def fetch(symbol, start, end):
+        calls.append((start, end))
+        index = HISTORY.index
+        return HISTORY[(index >= pd.Timestamp(start)) & (index < pd.Timestamp(end))]
+    return fetch
+
+
+def test_fills_only_missing_segments(tmp_path):
+    calls = []
+    cache = OHLCVCache(str(tmp_path), _fetcher(calls))
+    first = cache.get('AAA', '2016-01-01', '2017-01-01')
+    both = cache.get('AAA', '2015-06-01', '2017-06-01')
+
+    assert calls == [('2016-01-01', '2017-01-01'), ('2015-06-01', '2016-01-01'), ('2017-01-01', '2017-06-01')]
+    assert both.loc[first.index[0]:first.index[-1]].equals(first)
+    assert both.equals(HISTORY.loc['2015-06-01':'2017-05-31'])
+
+
+def test_concurrent_writers_leave_a_consistent_pair(tmp_path):
+    # Separate instances do not share locks, like workers in separate processes
+    caches = [OHLCVCache(str(tmp_path), _fetcher([])) for _ in range(8)]
+    ranges = [('2015-01-01', '2016-01-01'), ('2015-01-01', '2018-01-01')] * 4
+    threads = [threading.Thread(target=cache.get, args=('AAA', *dates)) for cache, dates in zip(caches, ranges)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(os.listdir(tmp_path)) == ['AAA.json', 'AAA.lock', 'AAA.parquet']
+    data, (start, end) = OHLCVCache(str(tmp_path), _fetcher([]))._load('AAA')
+    # The sidecar never claims rows the data file does not hold
+    assert data.index[0] >= pd.Timestamp(start)
+    assert data.index[-1] < pd.Timestamp(end)
+    assert data.equals(HISTORY[(HISTORY.index >= pd.Timestamp(start)) & (HISTORY.index < pd.Timestamp(end))])
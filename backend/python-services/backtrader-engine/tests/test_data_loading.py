@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from app import load_symbol_data
+from conftest import make_ohlcv
+from data_sources import DataSource, LocalDataSource, register_data_source
+
+
+class SlowSource(DataSource):
+    """Answers after a delay and records how many fetches overlapped"""
+    name = 'test-slow'
+
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, symbol, start_date, end_date):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            if symbol.startswith('BAD'):
+                raise ValueError(f"No data found for symbol {symbol}")
+            return make_ohlcv(bars=50, seed=len(symbol))
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def source():
+    source = SlowSource()
+    register_data_source(source)
+    return source
+
+
+def test_symbols_load_concurrently_in_request_order(source):
+    symbols = ['CCC', 'AAA', 'BBBB', 'DD']
+    started = time.perf_counter()
+    frames, timings = load_symbol_data(symbols, '2018-01-01', '2019-01-01', 'test-slow')
+    elapsed = time.perf_counter() - started
+
+    assert list(frames) == symbols
+    assert [timing['symbol'] for timing in timings] == symbols
+    assert all(timing['status'] == 'ok' and timing['bars'] == 50 for timing in timings)
+    assert source.peak == len(symbols)
+    assert elapsed < source.delay * len(symbols)
+
+
+def test_failed_symbols_are_reported_and_skipped(source):
+    frames, timings = load_symbol_data(['AAA', 'BAD1', 'BBB'], '2018-01-01', '2019-01-01', 'test-slow')
+
+    assert list(frames) == ['AAA', 'BBB']
+    failed = timings[1]
+    assert failed['symbol'] == 'BAD1' and failed['status'] == 'failed'
+    assert 'BAD1' in failed['error'] and 'bars' not in failed
+
+
+def test_local_files_with_any_column_case_and_date_layout(tmp_path):
+    bars = make_ohlcv(bars=30)
+    # A lower-case CSV export with the timestamp in a column, and a Parquet file indexed by date
+    bars.rename(columns=str.lower).rename_axis('datetime').reset_index().to_csv(tmp_path / 'AAA.csv', index=False)
+    bars.rename(columns=str.upper).to_parquet(tmp_path / 'BBB.parquet')
+    source = LocalDataSource(str(tmp_path))
+
+    for symbol in ('AAA', 'BBB'):
+        data = source.fetch(symbol, '2000-01-01', '2100-01-01')
+        assert list(data.columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+        assert data.index.name == 'Date'
+        pd.testing.assert_frame_equal(data, bars, check_freq=False)
+
+
+def test_local_fetch_covers_start_up_to_end(tmp_path):
+    bars = make_ohlcv(bars=30)
+    bars.to_csv(tmp_path / 'AAA.csv')
+    source = LocalDataSource(str(tmp_path))
+    start, end = bars.index[5], bars.index[10]
+
+    data = source.fetch('AAA', str(start.date()), str(end.date()))
+    assert list(data.index) == list(bars.index[5:10])
+    with pytest.raises(ValueError, match='between'):
+        source.fetch('AAA', '2030-01-01', '2031-01-01')
+    with pytest.raises(ValueError, match='No local data file for symbol ZZZ'):
+        source.fetch('ZZZ', '2018-01-01', '2019-01-01')
+
+
+def test_local_files_are_parsed_again_only_when_they_change(tmp_path, monkeypatch):
+    path = tmp_path / 'AAA.csv'
+    make_ohlcv(bars=30).to_csv(path)
+    source = LocalDataSource(str(tmp_path))
+    reads = []
+    read = LocalDataSource._read
+    monkeypatch.setattr(LocalDataSource, '_read', staticmethod(lambda p: reads.append(p) or read(p)))
+
+    first = source.fetch('AAA', '2000-01-01', '2100-01-01')
+    assert source.fetch('AAA', '2000-01-01', '2100-01-01').equals(first) and len(reads) == 1
+    version = source.version('AAA')
+
+    make_ohlcv(bars=40, seed=2).to_csv(path)
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000))
+    assert source.version('AAA') != version
+    assert len(source.fetch('AAA', '2000-01-01', '2100-01-01')) == 40 and len(reads) == 2
+    assert source.version('ZZZ') is None
+
+
+def test_unknown_data_source_is_rejected(client):
+    response = client.post('/backtest', json={
+        'strategyId': 'src', 'strategyCode': 'MovingAverageCross', 'parameters': {}, 'startDate': '2018-01-01',
+        'endDate': '2019-01-01', 'initialCapital': 100000, 'symbols': ['RW'], 'dataSource': 'nowhere'})
+
+    assert response.status_code == 422
+    assert "Unknown data source 'nowhere'" in response.text
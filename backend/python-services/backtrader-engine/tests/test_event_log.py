@@ -0,0 +1,65 @@
+import logging
+
+from app import BacktestRequest, run_engine
+from conftest import make_ohlcv
+from event_log import EventBuffer, configure_event_logging, event_logger
+
+
+def _record(buffer, count):
+    built = []
+
+    def build(i):
+        built.append(i)
+        return {'i': i}
+
+    for i in range(count):
+        buffer.record('order', lambda i=i: build(i))
+    return built
+
+
+def test_sampling_keeps_every_nth_event_and_skips_building_the_rest():
+    buffer = EventBuffer(capacity=100, sample_rate=0.25)
+    built = _record(buffer, 20)
+
+    assert built == [3, 7, 11, 15, 19]
+    analysis = buffer.get_analysis()
+    assert [event['i'] for event in analysis['events']] == built
+    assert all(event['type'] == 'order' for event in analysis['events'])
+    assert (analysis['seen'], analysis['kept'], analysis['sampleRate']) == (20, 5, 0.25)
+
+
+def test_buffer_keeps_the_most_recent_events():
+    buffer = EventBuffer(capacity=3)
+    _record(buffer, 10)
+    assert [event['i'] for event in buffer.events] == [7, 8, 9]
+    assert buffer.get_analysis()['seen'] == 10
+
+
+def test_events_are_logged_only_when_enabled(caplog):
+    configure_event_logging('WARNING')
+    with caplog.at_level(logging.WARNING, logger=event_logger.name):
+        _record(EventBuffer(), 3)
+    assert not caplog.records
+
+    configure_event_logging('INFO')
+    try:
+        with caplog.at_level(logging.INFO, logger=event_logger.name):
+            _record(EventBuffer(), 3)
+        assert len(caplog.records) == 3
+    finally:
+        configure_event_logging(None)
+
+
+def test_both_engines_sample_the_same_events():
+    frames = {'RW': make_ohlcv(bars=600)}
+    runs = {}
+    for engine in ('backtrader', 'vectorized'):
+        request = BacktestRequest(strategyId='events', strategyCode='MovingAverageCross',
+                                  parameters={'fast_period': 5, 'slow_period': 20}, startDate='2018-01-01',
+                                  endDate='2021-01-01', initialCapital=100000, symbols=['RW'], engine=engine,
+                                  includeEvents=True, eventSampleRate=0.5, maxEvents=1000)
+        runs[engine] = run_engine(request, frames)['events']
+
+    cerebro, vectorized = runs['backtrader'], runs['vectorized']
+    assert cerebro['seen'] > 0 and cerebro['kept'] == cerebro['seen'] // 2
+    assert [(e['type'], e['date']) for e in cerebro['events']] == [(e['type'], e['date']) for e in vectorized['events']]
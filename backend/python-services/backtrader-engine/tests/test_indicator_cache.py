@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from app import BacktestRequest, run_cerebro
+from conftest import make_ohlcv
+from indicator_cache import IndicatorCache, indicator_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    indicator_cache.clear()
+    yield
+    indicator_cache.clear()
+
+
+def _run(frame, code='MovingAverageCross', memory_mode='standard', **parameters):
+    request = BacktestRequest(strategyId='memo', strategyCode=code, parameters=parameters, startDate='2018-01-01',
+                              endDate='2100-01-01', initialCapital=100000, symbols=['RW'], memoryMode=memory_mode)
+    return run_cerebro(request, {'RW': frame})
+
+
+def _outcome(run):
+    return run['finalCapital'], run['trades'], list(run['equity']['values']), run['metrics']
+
+
+@pytest.mark.parametrize('code, parameters', [
+    ('MovingAverageCross', {'fast_period': 5, 'slow_period': 20}),
+    ('RSI', {'rsi_period': 7, 'rsi_upper': 65, 'rsi_lower': 35}),
+])
+def test_replayed_indicators_give_identical_results(code, parameters):
+    frame = make_ohlcv(bars=800, seed=3)
+    computed = _run(frame, code, **parameters)
+    replayed = _run(frame, code, **parameters)
+
+    assert computed['indicatorCache']['hits'] == 0 and computed['indicatorCache']['misses'] > 0
+    assert replayed['indicatorCache'] == {'hits': computed['indicatorCache']['misses'], 'misses': 0}
+    # Not approximately: the replayed values are the ones backtrader computed
+    assert computed['totalTrades'] > 0
+    assert _outcome(replayed) == _outcome(computed)
+
+
+def test_only_matching_indicators_are_replayed():
+    frame = make_ohlcv(bars=800, seed=3)
+    _run(frame, fast_period=5, slow_period=20)
+
+    # SMA(5) is shared; SMA(30) and the crossover of the pair are new
+    assert _run(frame, fast_period=5, slow_period=30)['indicatorCache'] == {'hits': 1, 'misses': 2}
+    # Same parameters over different bars share nothing
+    assert _run(make_ohlcv(bars=800, seed=4), fast_period=5, slow_period=20)['indicatorCache']['hits'] == 0
+    assert _outcome(_run(frame, fast_period=5, slow_period=30)) == \
+        _outcome(_run(frame.copy(), fast_period=5, slow_period=30))
+
+
+def test_low_memory_runs_are_not_stored():
+    frame = make_ohlcv(bars=800, seed=3)
+    _run(frame, memory_mode='low', fast_period=5, slow_period=20)
+    assert indicator_cache.stats()['entries'] == 0
+
+
+def test_cache_is_bounded_by_bytes():
+    cache = IndicatorCache(max_bytes=2 * 800)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, [np.zeros(100)], minperiod=1)
+    assert cache.get('a') is None
+    lines, minperiod = cache.get('c')
+    assert not lines[0].flags.writeable and minperiod == 1
+    assert cache.stats()['bytes'] == 2 * 800
+    # Larger than the whole cache: not stored at all
+    cache.put('d', [np.zeros(1000)], minperiod=1)
+    assert cache.get('d') is None and cache.get('b') is not None
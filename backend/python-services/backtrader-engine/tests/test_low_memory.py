@@ -0,0 +1,76 @@
+import backtrader as bt
+import numpy as np
+import pytest
+
+import low_memory
+from app import BacktestRequest, run_cerebro
+from conftest import comparable, differences, make_ohlcv
+from low_memory import CEREBRO_OPTIONS, ChunkedPandasData, resolve_memory_mode
+
+
+def _run(frames, memory_mode, code='MovingAverageCross', **parameters):
+    request = BacktestRequest(strategyId='memory', strategyCode=code, parameters=parameters, startDate='2000-01-01',
+                              endDate='2100-01-01', initialCapital=100000, symbols=list(frames),
+                              memoryMode=memory_mode, includeEvents=True, maxEvents=100000)
+    return run_cerebro(request, frames)
+
+
+@pytest.mark.parametrize('code, parameters', [
+    ('MovingAverageCross', {'fast_period': 5, 'slow_period': 20}),
+    ('RSI', {'rsi_period': 7, 'rsi_upper': 65, 'rsi_lower': 35}),
+])
+@pytest.mark.parametrize('symbols', [1, 3])
+def test_daily_bars_give_the_same_result_in_both_modes(code, parameters, symbols):
+    frames = {f"S{i}": make_ohlcv(bars=1000, seed=10 + i) for i in range(symbols)}
+    standard = _run(frames, 'standard', code, **parameters)
+    low = _run(frames, 'low', code, **parameters)
+
+    assert (standard['memoryMode'], low['memoryMode']) == ('standard', 'low')
+    assert standard['totalTrades'] > 0
+    assert differences(comparable(standard), comparable(low)) == []
+    for symbol in frames:
+        assert np.array_equal(standard['equity']['positions'][symbol], low['equity']['positions'][symbol])
+
+
+def test_intraday_runs_keep_one_equity_point_per_day():
+    frame = make_ohlcv(bars=24 * 60, freq='h')
+    standard = _run({'RW': frame}, 'standard', fast_period=5, slow_period=20)
+    low = _run({'RW': frame}, 'low', fast_period=5, slow_period=20)
+
+    days = np.floor(standard['equity']['timestamps'])
+    last_of_day = np.append(days[1:] != days[:-1], True)
+    assert np.array_equal(low['equity']['timestamps'], standard['equity']['timestamps'][last_of_day])
+    assert np.array_equal(low['equity']['values'], standard['equity']['values'][last_of_day])
+    assert low['trades'] == standard['trades']
+    assert low['finalCapital'] == standard['finalCapital']
+
+
+class _Recorder(bt.Strategy):
+    def __init__(self):
+        self.bars = []
+
+    def next(self):
+        data = self.datas[0]
+        self.bars.append((data.datetime[0], data.open[0], data.high[0], data.low[0], data.close[0], data.volume[0]))
+
+
+def _bars(feed, frame, **options):
+    cerebro = bt.Cerebro(stdstats=False, **options)
+    cerebro.adddata(feed(dataname=frame, **({'chunk_bars': 7} if feed is ChunkedPandasData else {})))
+    cerebro.addstrategy(_Recorder)
+    return cerebro.run()[0].bars
+
+
+def test_chunked_feed_streams_the_same_bars_across_chunk_boundaries():
+    frame = make_ohlcv(bars=100)
+    assert _bars(ChunkedPandasData, frame, **CEREBRO_OPTIONS['low']) == _bars(bt.feeds.PandasData, frame)
+
+
+def test_auto_mode_switches_on_total_bars(monkeypatch):
+    monkeypatch.setattr(low_memory, 'LOW_MEMORY_BARS', 1500)
+    frames = {'A': make_ohlcv(bars=1000), 'B': make_ohlcv(bars=1000)}
+
+    assert resolve_memory_mode('auto', {'A': frames['A']}) == 'standard'
+    assert resolve_memory_mode('auto', frames) == 'low'
+    assert resolve_memory_mode('standard', frames) == 'standard'
+    assert resolve_memory_mode('low', {'A': frames['A']}) == 'low'
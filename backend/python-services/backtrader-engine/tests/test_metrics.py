@@ -0,0 +1,121 @@
+import math
+
+import numpy as np
+import pytest
+
+from metrics import EMPTY_METRICS, EquitySeries, calculate_performance_metrics, compute_metrics
+
+
+def reference_metrics(trades, daily_values, initial_capital):
+    """The per-element loop implementation the vectorized metrics replaced"""
+    if not trades or not daily_values:
+        return dict(EMPTY_METRICS)
+
+    portfolio_values = [d['portfolioValue'] for d in daily_values]
+    final_value = portfolio_values[-1]
+    total_return = (final_value - initial_capital) / initial_capital
+
+    daily_returns = []
+    for i in range(1, len(portfolio_values)):
+        daily_returns.append((portfolio_values[i] - portfolio_values[i - 1]) / portfolio_values[i - 1])
+    daily_returns = np.array(daily_returns)
+
+    trading_days = len(daily_returns)
+    annualized_return = (1 + total_return) ** (252 / trading_days) - 1 if trading_days > 0 else 0
+    volatility = np.std(daily_returns) * np.sqrt(252) if len(daily_returns) > 1 else 0
+    sharpe_ratio = (annualized_return - 0.06) / volatility if volatility > 0 else 0
+
+    negative_returns = daily_returns[daily_returns < 0]
+    downside_deviation = np.std(negative_returns) * np.sqrt(252) if len(negative_returns) > 1 else 0
+    sortino_ratio = (annualized_return - 0.06) / downside_deviation if downside_deviation > 0 else 0
+
+    peak = portfolio_values[0]
+    max_drawdown = 0
+    for value in portfolio_values:
+        if value > peak:
+            peak = value
+        drawdown = (peak - value) / peak
+        if drawdown > max_drawdown:
+            max_drawdown = drawdown
+    calmar_ratio = annualized_return / max_drawdown if max_drawdown > 0 else 0
+
+    winning_trades = [t for t in trades if t['pnl'] > 0]
+    losing_trades = [t for t in trades if t['pnl'] < 0]
+    total_wins = sum(t['pnl'] for t in winning_trades)
+    total_losses = abs(sum(t['pnl'] for t in losing_trades))
+
+    return {
+        'totalReturn': total_return,
+        'annualizedReturn': annualized_return,
+        'volatility': volatility,
+        'sharpeRatio': sharpe_ratio,
+        'sortinoRatio': sortino_ratio,
+        'maxDrawdown': max_drawdown,
+        'calmarRatio': calmar_ratio,
+        'winRate': len(winning_trades) / len(trades) if trades else 0,
+        'profitFactor': total_wins / total_losses if total_losses > 0 else float('inf'),
+        'avgWin': total_wins / len(winning_trades) if winning_trades else 0,
+        'avgLoss': total_losses / len(losing_trades) if losing_trades else 0,
+        'largestWin': max([t['pnl'] for t in winning_trades]) if winning_trades else 0,
+        'largestLoss': min([t['pnl'] for t in losing_trades]) if losing_trades else 0
+    }
+
+
+def _inputs(values, pnls):
+    daily = [{'date': str(i), 'portfolioValue': float(v)} for i, v in enumerate(values)]
+    trades = [{'symbol': 'TEST', 'pnl': float(p)} for p in pnls]
+    return trades, daily
+
+
+def _assert_same(actual, expected):
+    assert actual.keys() == expected.keys()
+    for name, value in expected.items():
+        assert float(actual[name]) == float(value) or (math.isnan(actual[name]) and math.isnan(value)), name
+
+
+@pytest.mark.parametrize('seed', range(25))
+def test_matches_reference_on_random_curves(seed):
+    rng = np.random.default_rng(seed)
+    bars = int(rng.integers(2, 2000))
+    values = 100000 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    # Zero-P&L trades count as neither wins nor losses
+    pnls = np.round(rng.normal(0, 500, int(rng.integers(1, 60))), int(rng.integers(-3, 2)))
+    trades, daily = _inputs(values, pnls)
+    _assert_same(calculate_performance_metrics(trades, daily, 100000), reference_metrics(trades, daily, 100000))
+
+
+@pytest.mark.parametrize('values, pnls', [
+    pytest.param([100000.0] * 50, [0.0, 0.0], id='flat'),
+    pytest.param([100500.0], [500.0], id='single point'),
+    pytest.param(np.linspace(100000, 60000, 200), [-100.0, -2500.5, -7.25], id='all losses'),
+    pytest.param(np.linspace(100000, 150000, 200), [10.0, 2500.0, 7.5], id='zero drawdown'),
+])
+def test_matches_reference_on_edge_curves(values, pnls):
+    trades, daily = _inputs(values, pnls)
+    _assert_same(calculate_performance_metrics(trades, daily, 100000), reference_metrics(trades, daily, 100000))
+
+
+def test_edge_curve_values():
+    trades, daily = _inputs(np.linspace(100000, 150000, 200), [10.0, 5.0])
+    metrics = calculate_performance_metrics(trades, daily, 100000)
+    assert metrics['maxDrawdown'] == 0 and metrics['calmarRatio'] == 0
+    assert metrics['profitFactor'] == float('inf')
+
+    trades, daily = _inputs([100000.0], [-5.0])
+    metrics = calculate_performance_metrics(trades, daily, 100000)
+    assert metrics['volatility'] == 0 and metrics['annualizedReturn'] == 0
+
+    assert calculate_performance_metrics([], daily, 100000) == EMPTY_METRICS
+
+
+def test_series_drawdowns_match_running_peak():
+    rng = np.random.default_rng(3)
+    values = 100000 * np.exp(np.cumsum(rng.normal(0, 0.02, 500)))
+    series = EquitySeries(values, 100000)
+
+    peak = values[0]
+    for i, value in enumerate(values[1:]):
+        peak = max(peak, value)
+        assert series.drawdowns[i] == (peak - value) / peak
+        assert series.daily_returns[i] == (value - values[i]) / values[i]
+    assert compute_metrics(values, [1.0], 100000, series)['maxDrawdown'] == series.drawdowns.max()
@@ -0,0 +1,94 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import app
+import monte_carlo
+from monte_carlo import PATHS_PER_TASK, MonteCarloTrade, net_pnl, simulate
+from worker_pool import JobLimitExceeded
+
+TRADES = [{'pnl': pnl, 'commission': 1.0, 'exitDate': f"2020-{month:02d}-15"}
+          for month, pnl in enumerate([120.0, -80.0, 45.0, -20.0, 300.0, -150.0, 60.0, 10.0, -5.0, 90.0], 1)]
+
+
+def test_more_paths_than_the_pool_can_queue_succeed(client):
+    capacity = (app.worker_pool.max_workers + app.worker_pool.max_queue) * PATHS_PER_TASK
+    request = {'trades': TRADES, 'initialCapital': 10000, 'paths': capacity + 3 * PATHS_PER_TASK, 'seed': 7}
+    response = client.post('/analysis/montecarlo', json=request)
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result['paths'] == request['paths'] and result['trades'] == len(TRADES)
+    assert 0 <= result['probabilityOfLoss'] <= 1
+    assert app.worker_pool.pending == 0
+    # A seed gives the same result, whatever the order the blocks finished in
+    again = client.post('/analysis/montecarlo', json=request).json()
+    assert again['distributions'] == result['distributions']
+
+
+def test_failed_block_cancels_the_rest(client, monkeypatch):
+    submitted, finished = [], []
+
+    async def submit(fn, *args):
+        block = args[4][1]
+        submitted.append(block)
+        await asyncio.sleep(0.01)
+        if block == 1:
+            raise JobLimitExceeded("Wall-time limit exceeded")
+        finished.append(block)
+        return fn(*args)
+
+    monkeypatch.setattr(app.worker_pool, 'submit', submit)
+    blocks = 4 * app.worker_pool.max_workers + 2
+    response = client.post('/analysis/montecarlo',
+                           json={'trades': TRADES, 'initialCapital': 10000, 'paths': blocks * PATHS_PER_TASK})
+
+    assert response.status_code == 504
+    # Blocks that took a slot as block 1 failed are cancelled in the worker queue; none after them ever ran
+    workers = app.worker_pool.max_workers
+    assert len(submitted) <= 2 * workers + 1 < blocks
+    assert all(block <= workers for block in finished)
+
+
+def _pnl():
+    return net_pnl([MonteCarloTrade(**trade) for trade in TRADES])
+
+
+def test_permutation_keeps_the_observed_final_equity(client):
+    response = client.post('/analysis/montecarlo',
+                           json={'trades': TRADES, 'initialCapital': 10000, 'paths': 500, 'method': 'permutation', 'seed': 3})
+    result = response.json()
+
+    final = result['observed']['finalEquity']
+    assert final == 10000 + sum(trade['pnl'] - trade['commission'] for trade in TRADES)
+    assert result['distributions']['finalEquity']['min'] == result['distributions']['finalEquity']['max'] == final
+    assert result['distributions']['finalEquity']['std'] == 0
+    # Only the order changes, so the path-dependent statistics do vary
+    assert result['distributions']['maxDrawdown']['std'] > 0
+    assert result['probabilityOfLoss'] == 0
+
+
+@pytest.mark.parametrize('method', ['bootstrap', 'permutation'])
+def test_a_seed_gives_identical_paths(method):
+    first = simulate(_pnl(), 10000, 1000, method, (42, 0), None)
+    again = simulate(_pnl(), 10000, 1000, method, (42, 0), None)
+    other = simulate(_pnl(), 10000, 1000, method, (43, 0), None)
+    next_block = simulate(_pnl(), 10000, 1000, method, (42, 1), None)
+
+    for name in first:
+        assert np.array_equal(first[name], again[name], equal_nan=True)
+    assert not np.array_equal(first['maxDrawdown'], other['maxDrawdown'])
+    assert not np.array_equal(first['maxDrawdown'], next_block['maxDrawdown'])
+
+
+@pytest.mark.parametrize('method', ['bootstrap', 'permutation'])
+def test_chunk_size_does_not_change_the_paths(method, monkeypatch):
+    pnl = _pnl()
+    whole = simulate(pnl, 10000, 1000, method, (42, 0), None)
+    bytes_per_path = len(pnl) * 8 * monte_carlo._ARRAYS_PER_CHUNK
+    for paths_per_chunk in (7, 64, 999):
+        monkeypatch.setattr(monte_carlo, 'CHUNK_BYTES', paths_per_chunk * bytes_per_path)
+        chunked = simulate(pnl, 10000, 1000, method, (42, 0), None)
+        for name in whole:
+            assert np.array_equal(chunked[name], whole[name], equal_nan=True), (paths_per_chunk, name)
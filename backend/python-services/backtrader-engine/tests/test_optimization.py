@@ -0,0 +1,91 @@
+import json
+
+import backtrader as bt
+import pandas as pd
+
+from app import BacktestRequest, run_engine
+from conftest import comparable, differences, make_ohlcv, strict_json, wait_for_job
+from result_format import json_safe
+from walk_forward import slice_frames, summarize
+
+REQUEST = {
+    'strategyId': 'opt',
+    'strategyCode': 'MovingAverageCross',
+    'parameterRanges': {'fast_period': [5], 'slow_period': [15, 18]},
+    'startDate': '2018-01-01',
+    'endDate': '2019-07-01',
+    'initialCapital': 100000,
+    'symbols': ['UP'],
+    'dataSource': 'test',
+}
+
+
+def test_grid_result_with_an_all_winning_trial_is_valid_json(client):
+    job = client.post('/optimize', json=REQUEST).json()
+    assert wait_for_job(client, job['jobId'])['status'] == 'completed'
+
+    response = client.get(f"/jobs/{job['jobId']}/result")
+    assert response.status_code == 200
+    result = strict_json(response.text)
+    assert len(result['trials']) == 2
+    for trial in result['trials']:
+        assert trial['error'] is None and trial['totalTrades'] > 0
+        # No losing trade makes the profit factor infinite, which JSON renders as null
+        assert trial['metrics']['profitFactor'] is None
+        assert trial['metrics']['avgLoss'] == 0
+
+
+def test_walk_forward_result_with_all_winning_windows_is_valid_json(client):
+    request = {**REQUEST, 'mode': 'walk_forward', 'walkForward': {'inSampleDays': 180, 'outOfSampleDays': 120}}
+    job = client.post('/optimize', json=request).json()
+    assert wait_for_job(client, job['jobId'])['status'] == 'completed'
+
+    response = client.get(f"/jobs/{job['jobId']}/result")
+    assert response.status_code == 200
+    result = strict_json(response.text)
+    assert len(result['windows']) == 3
+    for window in result['windows']:
+        assert window['inSample']['metrics']['profitFactor'] is None
+        assert window['outOfSample']['error'] is None
+    summary = result['outOfSample']
+    assert summary['windowsEvaluated'] == 3
+    assert summary['totalReturn'] > 0 and summary['totalTrades'] > 0
+
+
+def test_walk_forward_summary_with_non_finite_metrics_is_json_safe():
+    windows = [{'outOfSample': {'error': None, 'totalReturn': 0.01, 'totalTrades': 1, 'winRate': 100.0,
+                                'maxDrawdown': 0.0, 'sharpeRatio': float('nan'),
+                                'metrics': {'profitFactor': float('inf')}}},
+               {'outOfSample': None}]
+    summary = json_safe(summarize(windows, 100000))
+
+    assert summary['windowsEvaluated'] == 1
+    assert summary['averageSharpeRatio'] is None
+    strict_json(json.dumps({'windows': json_safe(windows), 'outOfSample': summary}))
+
+
+def test_out_of_sample_runs_warm_up_on_earlier_bars_and_trade_only_inside_the_period():
+    frames = slice_frames({'RW': make_ohlcv(bars=600, seed=7)}, '2018-07-01', '2019-06-30')
+    start = pd.Timestamp('2019-01-01')
+    runs = {}
+    for engine in ('backtrader', 'vectorized'):
+        request = BacktestRequest(strategyId='oos', strategyCode='MovingAverageCross', startDate='2019-01-01',
+                                  endDate='2019-06-30', parameters={'fast_period': 5, 'slow_period': 20},
+                                  initialCapital=100000, symbols=['RW'], engine=engine)
+        runs[engine] = run_engine(request, frames, trade_from=start)
+
+    run = runs['backtrader']
+    period = frames['RW'].loc[start:]
+    # Indicators are ready on the first bar of the period, which is also where scoring starts
+    assert run['equity']['timestamps'][0] == bt.date2num(period.index[0])
+    assert len(run['series'].values) == len(period) and run['equity']['values'][0] == 100000
+    assert run['totalTrades'] > 0 and all(trade['entryDate'] >= '2019-01-01' for trade in run['trades'])
+    assert differences(comparable(run), comparable(runs['vectorized'])) == []
+
+
+def test_overlapping_out_of_sample_periods_are_rejected(client):
+    request = {**REQUEST, 'mode': 'walk_forward', 'walkForward': {'inSampleDays': 180, 'outOfSampleDays': 120,
+                                                                   'stepDays': 60}}
+    response = client.post('/optimize', json=request)
+    assert response.status_code == 422
+    assert 'stepDays' in response.text
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import queue
+import threading
+
+import numpy as np
+
+from app import BacktestRequest, run_cerebro
+from conftest import make_ohlcv
+from jobs import JobRegistry, ProgressReporter
+
+REQUEST = {
+    'strategyId': 'stream',
+    'strategyCode': 'MovingAverageCross',
+    'parameters': {'fast_period': 5, 'slow_period': 20},
+    'startDate': '2018-01-01',
+    'endDate': '2019-07-01',
+    'initialCapital': 100000,
+    'symbols': ['RW'],
+}
+
+
+class ListChannel(list):
+    def put_nowait(self, item):
+        self.append(item)
+
+
+def test_partial_frames_rebuild_the_run():
+    channel = ListChannel()
+    request = BacktestRequest(**REQUEST)
+    run = run_cerebro(request, {'RW': make_ohlcv(bars=300)}, ProgressReporter(channel, 'job', interval=0))
+
+    updates = [progress for _, progress in channel]
+    bars = [progress['barsProcessed'] for progress in updates]
+    assert bars[0] == 0 and bars[-1] == updates[0]['totalBars']
+    assert bars == sorted(bars)
+    # Concatenating the partial blocks gives the whole equity curve and trade list
+    partials = [progress['partial'] for progress in updates if 'partial' in progress]
+    values = [point['portfolioValue'] for partial in partials for point in partial['equity']]
+    assert np.array_equal(values, run['equity']['values'])
+    assert [trade for partial in partials for trade in partial['trades']] == run['trades']
+    assert updates[-1]['portfolioValue'] == run['finalCapital']
+
+
+def test_subscribers_receive_progress_then_done():
+    registry = JobRegistry(channel=queue.Queue())
+    registry.start()
+    job = registry.create('s')
+
+    async def frames():
+        received = job.subscribe()
+        reporter = registry.reporter(job.id, interval=0)
+        for bar in range(3):
+            reporter.report(barsProcessed=bar + 1, totalBars=3, partial={'equity': [bar]})
+        while job.progress['barsProcessed'] < 3:
+            await asyncio.sleep(0.01)
+        # Jobs finish on the event loop while progress arrives on the drain thread
+        threading.Thread(target=job.complete, args=({'ok': True},)).start()
+        collected = []
+        while not collected or collected[-1][0] != 'done':
+            collected.append(await asyncio.wait_for(received.get(), timeout=5))
+        job.unsubscribe(received)
+        return collected
+
+    try:
+        collected = asyncio.run(frames())
+    finally:
+        registry.stop()
+
+    assert [event for event, _ in collected] == ['progress'] * 3 + ['done']
+    assert [data['partial'] for _, data in collected[:3]] == [{'equity': [0]}, {'equity': [1]}, {'equity': [2]}]
+    assert collected[2][1]['progress']['percent'] == 100.0
+    assert collected[-1][1]['status'] == 'completed'
+    # Partial data is only streamed, never kept on the job
+    assert 'partial' not in job.progress
+
+
+def test_sse_stream_ends_with_done(client):
+    job = client.post('/jobs', json={**REQUEST, 'dataSource': 'test', 'progressInterval': 0.05, 'useCache': False}).json()
+    events = []
+    with client.stream('GET', f"/jobs/{job['jobId']}/stream") as response:
+        assert response.headers['content-type'].startswith('text/event-stream')
+        event = None
+        for line in response.iter_lines():
+            if line.startswith('event: '):
+                event = line[len('event: '):]
+            elif line.startswith('data: '):
+                events.append((event, json.loads(line[len('data: '):])))
+
+    assert events[0][0] == 'status'
+    assert events[-1][0] == 'done' and events[-1][1]['status'] == 'completed'
+    progress = [data['progress']['barsProcessed'] for event, data in events if event == 'progress']
+    assert progress == sorted(progress)
+    assert client.get(f"/jobs/{job['jobId']}/result").status_code == 200
@@ -0,0 +1,93 @@
+import json
+import threading
+import time
+
+from result_cache import ResultCache, request_fingerprint
+
+REQUEST = {
+    'strategyId': 'a',
+    'strategyCode': 'MovingAverageCross',
+    'parameters': {'fast_period': 5, 'slow_period': 20},
+    'startDate': '2018-01-01',
+    'endDate': '2019-07-01',
+    'initialCapital': 100000,
+    'symbols': ['RW'],
+    'dataSource': 'test',
+}
+
+
+def test_fingerprint_is_stable():
+    reordered = dict(reversed(list(REQUEST.items())), parameters={'slow_period': 20, 'fast_period': 5})
+    key = request_fingerprint(REQUEST, ['RW:abc'])
+
+    assert request_fingerprint(reordered, ['RW:abc']) == key
+    # Keys persist in RESULT_CACHE_DIR, so the hash must not change between releases
+    assert key == 'c0b954e0613fa1ebd4e6c1e29a6cbdedc1834d23cc7bd4f7be11c923a393499b'
+
+
+def test_fingerprint_ignores_only_non_semantic_fields():
+    key = request_fingerprint(REQUEST, ['RW:abc'])
+    for field, value in [('strategyId', 'b'), ('useCache', False), ('logLevel', 'DEBUG'), ('progressInterval', 1.0),
+                         ('resume', False)]:
+        assert request_fingerprint({**REQUEST, field: value}, ['RW:abc']) == key
+    for field, value in [('parameters', {'fast_period': 6, 'slow_period': 20}), ('endDate', '2019-07-02'),
+                         ('initialCapital', 100001), ('dataSource', 'local')]:
+        assert request_fingerprint({**REQUEST, field: value}, ['RW:abc']) != key
+    assert request_fingerprint(REQUEST, ['RW:abd']) != key
+
+
+def test_lru_ttl_and_disk_persistence(tmp_path, monkeypatch):
+    cache = ResultCache(max_entries=2, ttl_seconds=60, disk_dir=str(tmp_path))
+    for key in ('a', 'b', 'c'):
+        cache.put(key, {'key': key})
+    assert list(cache._entries) == ['b', 'c']
+    # Evicted from memory, served from disk by this or another process
+    assert cache.get('a') == {'key': 'a'}
+    assert ResultCache(disk_dir=str(tmp_path)).get('b') == {'key': 'b'}
+    assert json.loads((tmp_path / 'c.json').read_text()) == {'key': 'c'}
+
+    now = time.time()
+    monkeypatch.setattr('result_cache.time.time', lambda: now + 61)
+    assert cache.get('c') is None
+    assert not (tmp_path / 'c.json').exists()
+
+
+def test_concurrent_writers_of_one_key_never_leave_a_partial_file(tmp_path, caplog):
+    # Separate instances, like the API processes sharing RESULT_CACHE_DIR
+    values = [{'writer': i, 'rows': [i] * 20000} for i in range(8)]
+    threads = [threading.Thread(target=lambda v=v: [ResultCache(disk_dir=str(tmp_path)).put('k', v) for _ in range(5)])
+               for v in values]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not caplog.records
+    assert json.loads((tmp_path / 'k.json').read_text()) in values
+    assert [p.name for p in tmp_path.iterdir()] == ['k.json']
+
+
+def test_failed_write_removes_its_temp_file(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path))
+    circular = {}
+    circular['self'] = circular
+    cache.put('k', circular)
+
+    assert list(tmp_path.iterdir()) == []
+    assert cache.get('k') is circular
+
+
+def test_identical_requests_hit_the_cache(client):
+    request = {**REQUEST, 'strategyId': 'cache-1', 'parameters': {'fast_period': 7, 'slow_period': 21}}
+    first = client.post('/backtest', json=request)
+    second = client.post('/backtest', json={**request, 'strategyId': 'cache-2', 'includeTimings': True})
+    changed = client.post('/backtest', json={**request, 'parameters': {'fast_period': 8, 'slow_period': 21}})
+
+    assert first.headers['X-Backtest-Cache'] == 'MISS'
+    assert second.headers['X-Backtest-Cache'] == 'HIT'
+    assert changed.headers['X-Backtest-Cache'] == 'MISS'
+    body, cached = first.json(), second.json()
+    assert cached['cached'] and cached['strategyId'] == 'cache-2'
+    assert cached['results']['trades'] == body['results']['trades']
+    assert cached['results']['dailyReturns'] == body['results']['dailyReturns']
+    assert cached['finalCapital'] == body['finalCapital']
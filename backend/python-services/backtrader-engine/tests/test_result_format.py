@@ -0,0 +1,100 @@
+import gzip
+import json
+
+import pytest
+
+import result_format
+from result_format import ARROW, COLUMNAR, MSGPACK, ROWS, columns_to_records, compress, negotiate
+
+REQUEST = {
+    'strategyId': 'formats',
+    'strategyCode': 'MovingAverageCross',
+    'parameters': {'fast_period': 5, 'slow_period': 20},
+    'startDate': '2018-01-01',
+    'endDate': '2019-07-01',
+    'initialCapital': 100000,
+    'symbols': ['RW'],
+    'dataSource': 'test',
+}
+
+
+def test_negotiate_honours_quality():
+    assert negotiate(None) == ROWS
+    assert negotiate('*/*') == ROWS
+    assert negotiate(f"{ROWS};q=0.5, {COLUMNAR}") == COLUMNAR
+    assert negotiate(f"{COLUMNAR};q=0.2, {ROWS} ; q=0.9") == ROWS
+    assert negotiate('text/html') is None
+    for refused in ('0', '0.0', '0.00', ' 0.000'):
+        assert negotiate(f"{COLUMNAR};q={refused}, text/html") is None
+
+
+def test_compress_skips_refused_encodings():
+    body = b'x' * 4096
+    assert compress(body, 'gzip')[1] == 'gzip'
+    assert gzip.decompress(compress(body, 'deflate, gzip;q=0.5')[0]) == body
+    for refused in ('0', '0.0', '0.00', ' 0.000'):
+        assert compress(body, f"gzip;q={refused}") == (body, None)
+    assert compress(b'x' * 10, 'gzip') == (b'x' * 10, None)
+
+
+def test_compress_prefers_brotli_when_installed(monkeypatch):
+    brotli = pytest.importorskip('brotli')
+    body = b'x' * 4096
+    compressed, encoding = compress(body, 'gzip, br')
+    assert encoding == 'br' and brotli.decompress(compressed) == body
+    assert compress(body, 'gzip, br;q=0.0')[1] == 'gzip'
+    monkeypatch.setattr(result_format, 'brotli', None)
+    assert compress(body, 'br') == (body, None)
+
+
+@pytest.fixture(scope='module')
+def rows(client):
+    response = client.post('/backtest', json=REQUEST, headers={'Accept': ROWS})
+    assert response.headers['content-type'].startswith(ROWS)
+    return response.json()
+
+
+def test_columnar_matches_rows(client, rows):
+    response = client.post('/backtest', json=REQUEST, headers={'Accept': COLUMNAR})
+    assert response.headers['content-type'].startswith(COLUMNAR)
+    columnar = response.json()['results']
+
+    assert columns_to_records(columnar['dailyReturns']) == rows['results']['dailyReturns']
+    assert columns_to_records(columnar['trades']) == rows['results']['trades']
+
+
+def test_msgpack_matches_columnar(client, rows):
+    msgpack = pytest.importorskip('msgpack')
+    response = client.post('/backtest', json=REQUEST, headers={'Accept': MSGPACK})
+    assert response.headers['content-type'].startswith(MSGPACK)
+    results = msgpack.unpackb(response.content)['results']
+
+    assert columns_to_records(results['dailyReturns']) == rows['results']['dailyReturns']
+    assert columns_to_records(results['trades']) == rows['results']['trades']
+
+
+def test_arrow_matches_rows(client, rows):
+    pa = pytest.importorskip('pyarrow')
+    response = client.post('/backtest', json=REQUEST, headers={'Accept': ARROW})
+    assert response.headers['content-type'].startswith(ARROW)
+    table = pa.ipc.open_stream(response.content).read_all()
+    rest = json.loads(table.schema.metadata[b'result'])
+
+    daily = rows['results']['dailyReturns']
+    assert [str(date) for date in table.column('date').to_pylist()] == [row['date'] for row in daily]
+    assert table.column('portfolioValue').to_pylist() == [row['portfolioValue'] for row in daily]
+    assert columns_to_records(rest['results']['trades']) == rows['results']['trades']
+    assert rest['finalCapital'] == rows['finalCapital']
+
+
+def test_unacceptable_format_is_refused(client):
+    assert client.post('/backtest', json=REQUEST, headers={'Accept': f"{ROWS};q=0.0"}).status_code == 406
+
+
+def test_responses_are_gzipped_on_request(client, rows):
+    response = client.post('/backtest', json=REQUEST, headers={'Accept-Encoding': 'gzip'})
+    # httpx decodes the body transparently
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.json()['results']['dailyReturns'] == rows['results']['dailyReturns']
+    refused = client.post('/backtest', json=REQUEST, headers={'Accept-Encoding': 'gzip;q=0.0'})
+    assert 'content-encoding' not in refused.headers
@@ -0,0 +1,133 @@
+import multiprocessing
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+from conftest import FrameSource, make_ohlcv
+from data_sources import LocalDataSource, register_data_source
+from shared_data import SharedMarketData, materialize
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SharedMarketData(root=str(tmp_path / 'shared'), max_bytes=10 * 1024 * 1024)
+    yield store
+    store.close()
+
+
+def _close_sum(handle):
+    return float(materialize({'X': handle})['X']['Close'].sum())
+
+
+def test_frame_round_trips_without_copying(store, ohlcv):
+    handle = store.put('k', 'AAA', ohlcv)
+    frame = handle.to_frame()
+
+    assert frame.equals(ohlcv)
+    assert len(handle) == len(ohlcv)
+    # Backed by the read-only mapping, not a private copy
+    assert not frame['Close'].to_numpy().flags.writeable
+    assert materialize({'AAA': handle})['AAA'] is frame
+
+
+def test_workers_map_the_published_frame(store, ohlcv):
+    handle = pickle.loads(pickle.dumps(store.put('k', 'AAA', ohlcv)))
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        assert pool.apply(_close_sum, (handle,)) == float(ohlcv['Close'].sum())
+
+
+def test_key_and_fingerprint_identify_the_data(store, ohlcv):
+    assert SharedMarketData.make_key('AAA', '2018-01-01', '2019-01-01') == \
+        SharedMarketData.make_key('AAA', '2018-01-01', '2019-01-01', 'yahoo')
+    assert SharedMarketData.make_key('AAA', '2018-01-01', '2019-01-01', 'local') != \
+        SharedMarketData.make_key('AAA', '2018-01-01', '2019-01-01')
+
+    first = store.put('a', 'AAA', ohlcv)
+    same = store.put('b', 'AAA', ohlcv.copy())
+    changed = ohlcv.copy()
+    changed.iloc[-1, changed.columns.get_loc('Close')] += 0.01
+    assert first.fingerprint == same.fingerprint
+    assert store.put('c', 'AAA', changed).fingerprint != first.fingerprint
+
+
+def test_referenced_entries_survive_eviction(tmp_path, ohlcv):
+    store = SharedMarketData(root=str(tmp_path / 'shared'), max_bytes=0)
+    held = store.put('held', 'AAA', ohlcv)
+    released = store.put('released', 'BBB', ohlcv)
+    store.release([released])
+
+    assert store.get('released') is None
+    assert store.get('held') is held
+    assert np.array_equal(held.to_frame()['Close'].to_numpy(), ohlcv['Close'].to_numpy())
+    assert store.put('held', 'AAA', ohlcv) is held
+    assert store.stats()['entries'] == 1
+    store.close()
+
+
+def test_stale_entries_are_refetched_but_kept_for_their_holders(store, ohlcv):
+    held = store.put('k', 'AAA', ohlcv, version=(1, 100))
+    assert store.get('k', version=(1, 100)) is held
+    store.release([held])
+
+    # The source moved on: the old entry is no longer handed out, yet stays mapped while held
+    assert store.get('k', version=(2, 100)) is None
+    assert store.stats()['retired'] == 1 and os.path.exists(held.values_path)
+    changed = ohlcv * 1.01
+    fresh = store.put('k', 'AAA', changed, version=(2, 100))
+    assert fresh is not held and store.get('k', version=(2, 100)) is fresh
+
+    store.release([held])
+    assert store.stats()['retired'] == 0 and not os.path.exists(held.values_path)
+    assert store.stats()['bytes'] == fresh.nbytes
+
+
+def test_entries_expire_after_the_ttl(tmp_path, ohlcv):
+    store = SharedMarketData(root=str(tmp_path / 'shared'), ttl_seconds=0.05)
+    handle = store.put('k', 'AAA', ohlcv)
+    store.release([handle])
+    assert store.get('k') is handle
+    store.release([handle])
+
+    __import__('time').sleep(0.1)
+    assert store.get('k') is None
+    assert store.stats()['entries'] == 0 and not os.path.exists(handle.index_path)
+    store.close()
+
+
+def _load(symbol, start, end, data_source):
+    frames, timings = app.load_shared_data([symbol], start, end, data_source)
+    app.shared_store.release(frames.values())
+    return frames[symbol], timings[0].get('source')
+
+
+def test_rewritten_local_file_is_loaded_again(tmp_path):
+    register_data_source(LocalDataSource(str(tmp_path)), 'test-local-rewrite')
+    path = tmp_path / 'AAA.csv'
+    make_ohlcv(bars=100).to_csv(path)
+    first, _ = _load('AAA', '2018-01-01', '2019-01-01', 'test-local-rewrite')
+    again, source = _load('AAA', '2018-01-01', '2019-01-01', 'test-local-rewrite')
+    assert again is first and source == 'shared'
+
+    make_ohlcv(bars=100, seed=9).to_csv(path)
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000))
+    changed, source = _load('AAA', '2018-01-01', '2019-01-01', 'test-local-rewrite')
+    assert source != 'shared' and changed.fingerprint != first.fingerprint
+    assert changed.to_frame()['Close'].iloc[0] == make_ohlcv(bars=100, seed=9)['Close'].iloc[0]
+
+
+def test_ranges_ending_today_or_later_are_always_fetched():
+    frames = {'AAA': make_ohlcv(bars=100, start=str(pd.Timestamp.today().normalize() - pd.Timedelta(days=200)))}
+    register_data_source(FrameSource('test-live', frames), 'test-live')
+    start = str((pd.Timestamp.today() - pd.Timedelta(days=300)).date())
+    end = str((pd.Timestamp.today() + pd.Timedelta(days=1)).date())
+    first, source = _load('AAA', start, end, 'test-live')
+    assert source != 'shared'
+    bars = len(first)
+
+    frames['AAA'] = pd.concat([frames['AAA'], make_ohlcv(bars=1, start=str(frames['AAA'].index[-1] + pd.Timedelta(days=1)))])
+    latest, source = _load('AAA', start, end, 'test-live')
+    assert source != 'shared' and len(latest) == bars + 1
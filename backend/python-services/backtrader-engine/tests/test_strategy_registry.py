@@ -0,0 +1,108 @@
+import textwrap
+
+import numpy as np
+import pytest
+
+from strategy_registry import SAFE_NUMPY, StrategyError, StrategyRegistry
+
+STRATEGY = textwrap.dedent('''
+    import numpy
+    from numpy.linalg import norm
+
+
+    class Momentum(bt.Strategy):
+        params = (('period', 10),)
+
+        def __init__(self):
+            super().__init__()
+            self._closes = []
+
+        def next(self):
+            self._closes.append(self.data.close[0])
+            window = np.asarray(self._closes[-self.p.period:])
+            if len(window) == self.p.period and numpy.mean(np.diff(window)) > 0 and norm(window) > 0:
+                self.buy()
+''')
+
+# One line each, placed in a strategy's next(); every one reaches the file system, native code or the interpreter
+ESCAPES = [
+    'np.ctypeslib.ctypes.CDLL(None)',
+    'np.ctypeslib.as_array(0)',
+    'np.array([1]).ctypes.data',
+    "np.save('/tmp/x.npy', np.zeros(1))",
+    "np.savez('/tmp/x.npz', a=np.zeros(1))",
+    "np.load('/etc/passwd')",
+    "np.fromfile('/etc/passwd')",
+    "np.zeros(1).tofile('/tmp/x')",
+    "np.zeros(1).dump('/tmp/x')",
+    "np.memmap('/tmp/x', mode='w+', shape=(1,))",
+    "np.lib.format.open_memmap('/tmp/x')",
+    "np.DataSource().open('/etc/passwd')",
+    'np.mean.__globals__',
+    'self.__class__.__mro__',
+    "''.__class__.__base__.__subclasses__()",
+    '__name__',
+    'bt.feeds.GenericCSVData',
+    'bt.WriterFile',
+    'bt.multiprocessing.Process',
+    'collections._sys.modules',
+]
+
+IMPORT_ESCAPES = [
+    'import numpy.ctypeslib',
+    'from numpy import ctypeslib',
+    'from numpy import load',
+    'from numpy.lib import format',
+    'from collections import _sys',
+    'from backtrader import feeds',
+    'import os',
+]
+
+
+def _strategy(line: str) -> str:
+    return f"class Escape(bt.Strategy):\n    def next(self):\n        {line}\n"
+
+
+@pytest.mark.parametrize('line', ESCAPES)
+def test_escapes_are_rejected(line):
+    with pytest.raises(StrategyError, match='not allowed'):
+        StrategyRegistry().compile(_strategy(line))
+
+
+@pytest.mark.parametrize('line', IMPORT_ESCAPES)
+def test_escaping_imports_are_rejected(line):
+    with pytest.raises(StrategyError, match='not allowed'):
+        StrategyRegistry().compile(f"{line}\n{_strategy('pass')}")
+
+
+def test_match_patterns_cannot_read_dunders():
+    source = _strategy('match self:\n            case object(__class__=cls): pass')
+    with pytest.raises(StrategyError, match="'__class__' is not allowed"):
+        StrategyRegistry().compile(source)
+
+
+def test_numpy_is_a_vetted_view():
+    assert SAFE_NUMPY is not np
+    for name in ('ctypeslib', 'load', 'save', 'savez', 'fromfile', 'memmap', 'lib', 'DataSource', 'random'):
+        assert not hasattr(SAFE_NUMPY, name)
+    assert SAFE_NUMPY.mean is np.mean
+
+
+def test_numeric_strategy_loads_with_the_vetted_numpy():
+    compiled = StrategyRegistry().compile(STRATEGY)
+    try:
+        strategy = compiled.load()
+        namespace = vars(__import__('sys').modules[compiled.module_name])
+        assert strategy.__name__ == 'Momentum'
+        assert namespace['np'] is SAFE_NUMPY and namespace['numpy'] is SAFE_NUMPY
+        assert namespace['norm'] is np.linalg.norm
+    finally:
+        compiled.unload()
+
+
+def test_registry_caches_compiled_sources():
+    registry = StrategyRegistry(max_entries=1)
+    first = registry.compile(STRATEGY)
+    assert registry.compile(STRATEGY) is first
+    registry.compile(_strategy('pass'))
+    assert registry.stats() == {'entries': 1, 'maxEntries': 1, 'hits': 1, 'misses': 2}
@@ -0,0 +1,92 @@
+import re
+
+from telemetry import Counter, Histogram, Registry, StageTimer, server_timing
+
+REQUEST = {
+    'strategyId': 'timed',
+    'strategyCode': 'MovingAverageCross',
+    'startDate': '2018-01-01',
+    'endDate': '2019-07-01',
+    'initialCapital': 100000,
+    'symbols': ['RW'],
+    'dataSource': 'test',
+}
+
+# Stages run in the worker, which a result-cache hit skips
+WORKER_STAGES = {'feeds', 'run', 'analyzers', 'metrics', 'dispatch'}
+
+
+def _samples(text: str, name: str) -> dict:
+    """{labels: value} of the metric's samples in Prometheus text"""
+    return {labels: float(value) for labels, value in re.findall(rf'^{name}(\{{.*\}}|) (\S+)$', text, re.M)}
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    histogram = Histogram('t_seconds', 'Test', ('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 30.0):
+        histogram.observe(value, 'run')
+    histogram.observe(0.2, 'say "hi"\n')
+    registry = Registry()
+    registry.register(histogram)
+    text = registry.render()
+
+    assert '# TYPE t_seconds histogram' in text
+    assert _samples(text, 't_seconds_bucket') == {
+        '{stage="run",le="0.1"}': 1, '{stage="run",le="1"}': 3, '{stage="run",le="+Inf"}': 4,
+        '{stage="say \\"hi\\"\\n",le="0.1"}': 0, '{stage="say \\"hi\\"\\n",le="1"}': 1,
+        '{stage="say \\"hi\\"\\n",le="+Inf"}': 1,
+    }
+    assert _samples(text, 't_seconds_sum')['{stage="run"}'] == 31.25
+    assert _samples(text, 't_seconds_count') == {'{stage="run"}': 4, '{stage="say \\"hi\\"\\n"}': 1}
+
+
+def test_counter_and_stage_timer():
+    counter = Counter('t_total', 'Test', ('cache',))
+    counter.inc('hit')
+    counter.inc('hit', amount=2)
+    assert counter.collect()[1:] == ['# TYPE t_total counter', 't_total{cache="hit"} 3']
+
+    timer = StageTimer()
+    timer.add('run', 0.25)
+    timer.add('run', 0.5)
+    timer.add('feeds', 0.0012)
+    assert list(timer.seconds) == ['run', 'feeds']
+    assert server_timing(timer.seconds) == 'run;dur=750.0, feeds;dur=1.2'
+
+
+def test_requests_are_labelled_by_route_template(client):
+    client.get('/jobs/0123456789abcdef')
+    client.get('/no/such/path')
+    samples = _samples(client.get('/metrics').text, 'http_request_duration_seconds_count')
+
+    assert samples['{method="GET",route="/jobs/{job_id}",status="404"}'] >= 1
+    assert samples['{method="GET",route="unmatched",status="404"}'] >= 1
+    assert not any('0123456789abcdef' in labels or '/no/such' in labels for labels in samples)
+
+
+def test_timings_break_down_a_miss_and_a_hit(client):
+    request = {**REQUEST, 'parameters': {'fast_period': 6, 'slow_period': 21}, 'includeTimings': True}
+    miss = client.post('/backtest', json=request)
+    hit = client.post('/backtest', json=request)
+
+    assert (miss.headers['X-Backtest-Cache'], hit.headers['X-Backtest-Cache']) == ('MISS', 'HIT')
+    miss_timings = miss.json()['results']['timings']
+    hit_timings = hit.json()['results']['timings']
+    assert {'validation', 'dataFetch', 'cacheLookup'} <= set(hit_timings)
+    assert WORKER_STAGES <= set(miss_timings)
+    assert not WORKER_STAGES & set(hit_timings)
+    # The header also has the serialization of the body that carries the timings
+    stages = [part.split(';')[0] for part in miss.headers['Server-Timing'].split(', ')]
+    assert set(stages) == set(miss_timings) | {'serialization'}
+
+    metrics = client.get('/metrics').text
+    assert _samples(metrics, 'backtest_results_total')['{engine="backtrader",cache="hit"}'] >= 1
+    assert _samples(metrics, 'backtest_stage_seconds_count')['{stage="run",engine="backtrader"}'] >= 1
+
+
+def test_timings_only_when_requested(client):
+    response = client.post('/backtest', json={**REQUEST, 'parameters': {'fast_period': 7, 'slow_period': 21}})
+
+    assert response.status_code == 200
+    assert 'Server-Timing' not in response.headers
+    assert 'timings' not in response.json()['results']
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from app import BacktestRequest, run_cerebro, run_engine
+from conftest import comparable, differences, make_ohlcv
+
+STRATEGIES = [
+    pytest.param('MovingAverageCross', {}, id='ma-default'),
+    pytest.param('MovingAverageCross', {'fast_period': 5, 'slow_period': 20}, id='ma-5-20'),
+    pytest.param('RSI', {}, id='rsi-default'),
+    pytest.param('RSI', {'rsi_period': 7, 'rsi_upper': 65, 'rsi_lower': 35}, id='rsi-7'),
+]
+
+
+def run_both(code, parameters, frames, initial_capital=100000):
+    request = BacktestRequest(strategyId='parity', strategyCode=code, parameters=parameters, startDate='2000-01-01',
+                              endDate='2100-01-01', initialCapital=initial_capital, symbols=list(frames),
+                              includeEvents=True, maxEvents=100000)
+    expected = run_cerebro(request, frames)
+    actual = run_engine(request.model_copy(update={'engine': 'vectorized'}), frames)
+    assert 'checkpoint' in actual, "the vectorized engine fell back to Cerebro"
+    return expected, actual
+
+
+@pytest.mark.parametrize('code, parameters', STRATEGIES)
+def test_default_sizing(code, parameters):
+    expected, actual = run_both(code, parameters, {'RW': make_ohlcv(bars=1500, seed=7)})
+    assert expected['totalTrades'] > 0
+    assert differences(comparable(expected), comparable(actual)) == []
+
+
+@pytest.mark.parametrize('code, parameters', STRATEGIES)
+def test_cash_limited_sizing(code, parameters):
+    frames = {'RW': make_ohlcv(bars=1500, seed=7)}
+    # One share costs more than the cash for half the history, so the broker rejects those entries
+    capital = float(frames['RW']['Close'].median())
+    expected, actual = run_both(code, parameters, frames, capital)
+    unlimited, _ = run_both(code, parameters, frames)
+    assert expected['totalTrades'] < unlimited['totalTrades']
+    assert differences(comparable(expected), comparable(actual)) == []
+
+
+@pytest.mark.parametrize('code, parameters', STRATEGIES)
+def test_multi_symbol(code, parameters):
+    frames = {symbol: make_ohlcv(bars=1000, seed=seed) for seed, symbol in enumerate(('AAA', 'BBB', 'CCC'), 3)}
+    expected, actual = run_both(code, parameters, frames)
+    assert differences(comparable(expected), comparable(actual)) == []
+    assert list(actual['equity']['positions']) == list(frames)
+    for symbol in frames:
+        assert np.array_equal(expected['equity']['positions'][symbol], actual['equity']['positions'][symbol])
@@ -0,0 +1,110 @@
+import _socket
+import asyncio
+import errno
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import app
+from conftest import wait_for_job
+from worker_pool import BacktestWorkerPool
+
+
+def _crash():
+    time.sleep(0.2)
+    os._exit(1)
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def _probe_sandbox():
+    # The C socket type is not affected by the Python-level block
+    connection = _socket.socket(_socket.AF_INET, _socket.SOCK_STREAM)
+    try:
+        connection.connect(('192.0.2.1', 80))
+        network = 'connected'
+    except OSError as e:
+        network = errno.errorcode.get(e.errno, str(e))
+    finally:
+        connection.close()
+    try:
+        with open('written-by-worker', 'w'):
+            written = True
+    except OSError as e:
+        written = errno.errorcode.get(e.errno, str(e))
+    with open('/proc/self/status') as f:
+        status = dict(line.split(':', 1) for line in f)
+    return {
+        'netns': os.readlink('/proc/self/ns/net'),
+        'network': network,
+        'written': written,
+        'capabilities': int(status['CapEff'], 16),
+        'noNewPrivs': status['NoNewPrivs'].strip(),
+    }
+
+
+@pytest.fixture
+def pool():
+    pool = BacktestWorkerPool(max_workers=2, max_queue=2, cpu_limit=0, wall_limit=0, memory_limit_mb=0,
+                              max_tasks_per_child=0)
+    pool.start_method = 'fork'
+    yield pool
+    pool.shutdown()
+
+
+def test_dead_worker_fails_every_inflight_job_with_broken_pool(pool):
+    async def scenario():
+        outcomes = await asyncio.gather(pool.submit(_crash), pool.submit(_sleep, 2), return_exceptions=True)
+        # The pool is replaced, so the next job runs
+        return outcomes, await pool.submit(_sleep, 0)
+
+    outcomes, after = asyncio.run(scenario())
+    assert all(isinstance(outcome, BrokenProcessPool) for outcome in outcomes)
+    assert after == 0
+    assert pool.pending == 0
+
+
+def test_broken_executor_is_not_discarded_once_replaced(pool):
+    pool.start()
+    broken = pool._executor
+    pool._discard(broken)
+    pool.start()
+    replacement = pool._executor
+    assert replacement is not broken
+    # A late job of the broken executor must not shut down its replacement
+    pool._discard(broken)
+    assert pool._executor is replacement
+
+
+def test_workers_are_isolated_by_the_kernel(pool, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    probe = asyncio.run(pool.submit(_probe_sandbox))
+    if probe['netns'] == os.readlink('/proc/self/ns/net'):
+        pytest.skip("the kernel does not allow network namespaces here")
+
+    assert probe['network'] == 'ENETUNREACH'
+    assert probe['written'] == 'EROFS'
+    assert not (tmp_path / 'written-by-worker').exists()
+    assert probe['capabilities'] == 0
+    assert probe['noNewPrivs'] == '1'
+
+
+def test_backtest_without_data_is_rejected_before_reaching_a_worker(client, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(app.worker_pool, 'submit', lambda *args: submitted.append(args))
+    request = {'strategyId': 'empty', 'strategyCode': 'MovingAverageCross', 'parameters': {}, 'startDate': '2030-01-01',
+               'endDate': '2031-01-01', 'initialCapital': 100000, 'symbols': ['RW', 'NOPE'], 'dataSource': 'test'}
+
+    response = client.post('/backtest', json=request)
+    assert response.status_code == 400
+    assert response.json()['detail'] == \
+        "No data for RW, NOPE between 2030-01-01 and 2031-01-01 from data source 'test'"
+
+    job = client.post('/jobs', json=request).json()
+    assert wait_for_job(client, job['jobId'])['error'].startswith('No data for RW, NOPE')
+    assert submitted == []
@@ -0,0 +1,376 @@
+"""Array-based execution engine for the built-in signal strategies
+
+Reproduces what Cerebro does for a long/flat strategy trading a fixed stake on the
+first data feed: signals are evaluated on each bar's close once the indicators are
+warmed up, market orders fill at the next bar's open, the percentage commission is
+charged on both legs, and the broker value is cash plus the position at the close.
+Headline statistics follow Backtrader's TradeAnalyzer, DrawDown and (yearly)
+SharpeRatio analyzers, so both engines return the same ``BacktestResult``.
+"""
+import hashlib
+import logging
+import math
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from event_log import EventBuffer
+from metrics import EquitySeries, calculate_series_metrics
+from telemetry import StageTimer
+
+logger = logging.getLogger(__name__)
+
+# Backtrader date numbers count days from 0001-01-01 as day 1, so 1970-01-01 is day 719163
+EPOCH_DATE_NUMBER = 719163.0
+NANOSECONDS_PER_DAY = 86400 * 10**9
+
+# SharpeRatio analyzer defaults: yearly returns against a 1% annual risk-free rate
+SHARPE_RISK_FREE_RATE = 0.01
+
+# (entry signals, exit signals, index of the first bar the strategy's next() sees)
+Signals = Tuple[np.ndarray, np.ndarray, int]
+
+# Bumped whenever the layout or the meaning of the state saved by run_vectorized changes
+CHECKPOINT_VERSION = 2
+
+
+def simple_moving_average(values: np.ndarray, period: int) -> np.ndarray:
+    """Rolling mean; the first period - 1 entries are NaN"""
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        sums = np.cumsum(np.concatenate(([0.0], values)))
+        out[period - 1:] = (sums[period:] - sums[:-period]) / period
+    return out
+
+
+def smoothed_moving_average(values: np.ndarray, period: int, first: int) -> np.ndarray:
+    """Wilder's smoothing (alpha = 1 / period) seeded with the mean of values[first - period + 1:first + 1]
+
+    The recursion ``y[i] = y[i - 1] * (1 - alpha) + x[i] * alpha`` is solved in closed
+    form one block at a time; blocks are sized so the (1 - alpha) ** -k scaling stays
+    far from overflowing.
+    """
+    out = np.full(len(values), np.nan)
+    if len(values) <= first:
+        return out
+    out[first] = values[first - period + 1:first + 1].mean()
+    alpha = 1.0 / period
+    decay = 1.0 - alpha
+    if decay == 0.0:
+        out[first + 1:] = values[first + 1:]
+        return out
+
+    block = max(1, int(12 * math.log(10) / -math.log(decay)))
+    powers = decay ** np.arange(1, block + 1)
+    prev = out[first]
+    for start in range(first + 1, len(values), block):
+        chunk = values[start:start + block]
+        scale = powers[:len(chunk)]
+        out[start:start + len(chunk)] = scale * (prev + alpha * np.cumsum(chunk / scale))
+        prev = out[start + len(chunk) - 1]
+    return out
+
+
+def relative_strength_index(close: np.ndarray, period: int) -> np.ndarray:
+    """Wilder RSI as computed by bt.indicators.RelativeStrengthIndex; valid from index ``period``"""
+    change = np.diff(close, prepend=np.nan)
+    up = np.maximum(change, 0.0)
+    down = np.maximum(-change, 0.0)
+    ma_up = smoothed_moving_average(up, period, period)
+    ma_down = smoothed_moving_average(down, period, period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = ma_up / ma_down
+        return 100.0 - 100.0 / (1.0 + rs)
+
+
+def ma_cross_signals(close: np.ndarray, fast_period: int, slow_period: int) -> Signals:
+    """MovingAverageCrossStrategy: buy when the fast SMA crosses above the slow one, sell on the cross below"""
+    fast = simple_moving_average(close, fast_period)
+    slow = simple_moving_average(close, slow_period)
+    diff = fast - slow
+
+    # bt.indicators.CrossOver compares against the last non-zero difference
+    seed = max(fast_period, slow_period) - 1
+    warmup = seed + 1
+    if len(close) <= warmup:
+        empty = np.zeros(len(close), dtype=bool)
+        return empty, empty, warmup
+    positions = np.arange(len(diff))
+    carried = np.where((diff != 0) | (positions == seed), positions, 0)
+    last_nonzero = diff[np.maximum.accumulate(carried)]
+
+    entries = np.zeros(len(close), dtype=bool)
+    exits = np.zeros(len(close), dtype=bool)
+    entries[warmup:] = (last_nonzero[warmup - 1:-1] < 0) & (fast[warmup:] > slow[warmup:])
+    exits[warmup:] = (last_nonzero[warmup - 1:-1] > 0) & (fast[warmup:] < slow[warmup:])
+    return entries, exits, warmup
+
+
+def rsi_signals(close: np.ndarray, rsi_period: int, rsi_upper: float, rsi_lower: float) -> Signals:
+    """RSIStrategy: buy when RSI is below the lower band, sell when it is above the upper band"""
+    rsi = relative_strength_index(close, rsi_period)
+    with np.errstate(invalid='ignore'):
+        return rsi < rsi_lower, rsi > rsi_upper, rsi_period
+
+
+def share_calendar(frames: Dict[str, pd.DataFrame]) -> bool:
+    """Whether every feed has exactly the first feed's bars, so it never changes the bar clock"""
+    indexes = [frame.index for frame in frames.values()]
+    return all(index.equals(indexes[0]) for index in indexes[1:])
+
+
+def _round_trips(entries: np.ndarray, exits: np.ndarray, warmup: int, can_enter: Callable[[int], bool],
+                 bar: Optional[int] = None, open_entry: Optional[int] = None) -> Iterator[Tuple[int, Optional[int]]]:
+    """Yield the fill bars of each (entry, exit) round trip; the exit is None for a position still open at the end
+
+    Orders placed on bar i fill at the open of bar i + 1. Only the loop over round
+    trips is in Python; finding the next signal is a binary search. ``bar`` and
+    ``open_entry`` continue a search a checkpoint left off: flat from ``bar``, or
+    holding the position entered at ``open_entry``.
+    """
+    bars = len(entries)
+    entry_bars = np.flatnonzero(entries[warmup:]) + warmup
+    exit_bars = np.flatnonzero(exits[warmup:]) + warmup
+    bar = warmup if bar is None else bar
+    while True:
+        if open_entry is None:
+            k = np.searchsorted(entry_bars, bar)
+            if k == len(entry_bars) or entry_bars[k] + 1 >= bars:
+                return
+            signal = int(entry_bars[k])
+            if not can_enter(signal):
+                # Rejected by the broker; the strategy tries again on the next bar
+                bar = signal + 1
+                continue
+            entry = signal + 1
+        else:
+            entry, open_entry = open_entry, None
+        k = np.searchsorted(exit_bars, entry)
+        if k == len(exit_bars) or exit_bars[k] + 1 >= bars:
+            yield entry, None
+            return
+        exit_ = int(exit_bars[k]) + 1
+        yield entry, exit_
+        bar = exit_
+
+
+def data_fingerprint(dates: pd.DatetimeIndex, opens: np.ndarray, closes: np.ndarray) -> str:
+    """Hash of the bars a run traded on; a checkpoint only resumes over the same history"""
+    digest = hashlib.sha1(dates.as_unit('ns').asi8.tobytes())
+    digest.update(np.ascontiguousarray(opens).tobytes())
+    digest.update(np.ascontiguousarray(closes).tobytes())
+    return digest.hexdigest()
+
+
+def yearly_sharpe(dates: pd.DatetimeIndex, values: np.ndarray, initial_capital: float) -> Optional[float]:
+    """bt.analyzers.SharpeRatio with its defaults: yearly returns, 1% risk-free rate, population stddev"""
+    if not len(values):
+        return None
+    years = dates.year.to_numpy()
+    year_ends = np.append(np.flatnonzero(np.diff(years)), len(values) - 1)
+    closing = values[year_ends]
+    opening = np.concatenate(([initial_capital], closing[:-1]))
+    returns = (closing / opening - 1.0).tolist()
+
+    rate = pow(1.0 + SHARPE_RISK_FREE_RATE, 1.0) - 1.0
+    excess = [r - rate for r in returns]
+    mean = math.fsum(excess) / len(excess)
+    deviation = math.sqrt(math.fsum([(r - mean) ** 2 for r in excess]) / len(excess))
+    return mean / deviation if deviation else None
+
+
+def _can_resume(checkpoint: Dict[str, Any], dates: pd.DatetimeIndex, opens: np.ndarray, closes: np.ndarray) -> bool:
+    bars = checkpoint.get('bars', 0)
+    return (checkpoint.get('version') == CHECKPOINT_VERSION and 0 < bars <= len(dates)
+            and checkpoint['fingerprint'] == data_fingerprint(dates[:bars], opens[:bars], closes[:bars]))
+
+
+def run_vectorized(frames: Dict[str, pd.DataFrame], signals: Callable[..., Signals], parameters: Dict[str, Any],
+                   initial_capital: float, commission: float, stake: int = 1, progress=None,
+                   events: Optional[EventBuffer] = None, checkpoint: Optional[Dict[str, Any]] = None,
+                   timer: Optional[StageTimer] = None, trade_from: Optional[pd.Timestamp] = None) -> Dict[str, Any]:
+    """Backtest a signal strategy on the first feed and return the same dict as ``run_cerebro``
+
+    Every feed must share the first feed's calendar (see ``share_calendar``). The dict
+    also holds a ``checkpoint`` of the broker state at the last bar. Passing it back
+    with a longer history of the same bars resumes there: only the new bars are
+    simulated and the equity, cash and trades before them are reused, while
+    indicators and the whole-series statistics are recomputed over all bars. The
+    result is identical to a full run. A checkpoint whose bars no longer match the
+    history is ignored. Events are only recorded for the bars this call simulates.
+    ``timer`` gets the ``run`` and ``metrics`` stages. Signals on bars before
+    ``trade_from`` are ignored, so the bars before it only warm up the indicators.
+    """
+    started = time.perf_counter()
+    if not frames:
+        raise ValueError("No valid data feeds added")
+    symbols = list(frames)
+    symbol = symbols[0]
+    data = frames[symbol]
+    dates = pd.DatetimeIndex(data.index)
+    opens = data['Open'].to_numpy(dtype=np.float64)
+    closes = data['Close'].to_numpy(dtype=np.float64)
+    bars = len(closes)
+    if progress is not None:
+        progress.report(force=True, barsProcessed=0, totalBars=bars)
+
+    # Indicators are cheap array operations, so they always cover the whole history
+    entries, exits, warmup = signals(closes, **parameters)
+    if trade_from is not None:
+        entries = entries & (np.arange(bars) >= dates.searchsorted(trade_from))
+
+    # While flat, cash is the initial capital plus the net P&L of the round trips so far
+    trips = []
+    cash = initial_capital
+    start = 0
+    search_from = open_entry = None
+    if checkpoint is not None and not _can_resume(checkpoint, dates, opens, closes):
+        logger.info("Checkpoint does not match the data; running the whole history")
+        checkpoint = None
+    if checkpoint is not None:
+        trips = [tuple(trip) for trip in checkpoint['trips']]
+        cash = checkpoint['cash']
+        start = checkpoint['bars']
+        search_from = checkpoint['bar']
+        if trips and trips[-1][1] is None:
+            open_entry = trips.pop()[0]
+    resumed_trips = len(trips)
+    closed_before = len(checkpoint['trades']) if checkpoint is not None else 0
+
+    def can_enter(signal: int) -> bool:
+        # The broker rejects a market order it could not pay for at the signal bar's close when it is
+        # submitted, and again at the next bar's open when it executes
+        price = max(closes[signal], opens[signal + 1])
+        return cash >= stake * price * (1.0 + commission)
+
+    for entry, exit_ in _round_trips(entries, exits, warmup, can_enter, search_from, open_entry):
+        trips.append((entry, exit_))
+        if exit_ is not None:
+            cash += stake * (opens[exit_] - opens[entry]) - stake * commission * (opens[entry] + opens[exit_])
+
+    entry_bars = np.array([entry for entry, _ in trips], dtype=np.int64)
+    exit_bars = np.array([exit_ for _, exit_ in trips if exit_ is not None], dtype=np.int64)
+    entry_prices = opens[entry_bars]
+    exit_prices = opens[exit_bars]
+    entry_commissions = stake * entry_prices * commission
+    exit_commissions = stake * exit_prices * commission
+
+    # Cash and position flows of the bars simulated here, accumulated onto the checkpoint's totals
+    new_entries = entry_bars >= start
+    new_exits = exit_bars >= start
+    flows = np.zeros(bars - start)
+    np.add.at(flows, entry_bars[new_entries] - start, -(stake * entry_prices + entry_commissions)[new_entries])
+    np.add.at(flows, exit_bars[new_exits] - start, (stake * exit_prices - exit_commissions)[new_exits])
+    moves = np.zeros(bars - start)
+    np.add.at(moves, entry_bars[new_entries] - start, stake)
+    np.add.at(moves, exit_bars[new_exits] - start, -stake)
+
+    if checkpoint is not None:
+        flow_total = np.cumsum(np.concatenate(([checkpoint['flowTotal']], flows)))[1:]
+        position = np.concatenate((checkpoint['position'], np.cumsum(np.concatenate(([checkpoint['position'][-1]], moves)))[1:]))
+        cash_curve = np.concatenate((checkpoint['cashCurve'], initial_capital + flow_total))
+        values = np.concatenate((checkpoint['values'], cash_curve[start:] + position[start:] * closes[start:]))
+    else:
+        flow_total = np.cumsum(flows)
+        position = np.cumsum(moves)
+        cash_curve = initial_capital + flow_total
+        values = cash_curve + position * closes
+
+    closed = len(exit_bars)
+    pnls = stake * (exit_prices - entry_prices[:closed])
+    trade_commissions = entry_commissions[:closed] + exit_commissions
+    pnlcomms = pnls - trade_commissions
+    iso_dates = dates.strftime('%Y-%m-%d')
+    trades = checkpoint['trades'] if checkpoint is not None else []
+    trades = trades + [
+        {
+            'symbol': symbol,
+            'entryDate': iso_dates[entry],
+            'exitDate': iso_dates[exit_],
+            'side': 'BUY',
+            # Backtrader reports a closed trade's size (and so its exit price) as 0
+            'quantity': 0,
+            'entryPrice': entry_price,
+            'exitPrice': 0,
+            'pnl': pnl,
+            'commission': trade_commission
+        }
+        for entry, exit_, entry_price, pnl, trade_commission in zip(
+            entry_bars[closed_before:closed].tolist(), exit_bars[closed_before:].tolist(),
+            entry_prices[closed_before:closed].tolist(), pnls[closed_before:].tolist(),
+            trade_commissions[closed_before:].tolist())
+    ]
+
+    if events is not None:
+        for i, entry in enumerate(entry_bars.tolist()):
+            if entry >= start:
+                events.record('order', lambda: {'date': iso_dates[entry], 'symbol': symbol, 'side': 'BUY', 'size': stake,
+                                                'price': float(entry_prices[i]), 'commission': float(entry_commissions[i])})
+            if closed_before <= i < closed:
+                exit_ = int(exit_bars[i])
+                events.record('order', lambda: {'date': iso_dates[exit_], 'symbol': symbol, 'side': 'SELL', 'size': -stake,
+                                                'price': float(exit_prices[i]), 'commission': float(exit_commissions[i])})
+                events.record('trade', lambda: {'date': iso_dates[exit_], 'symbol': symbol, 'pnl': float(pnls[i]),
+                                                'pnlcomm': float(pnlcomms[i])})
+    # The strategy (and so the equity recorder) only runs once the indicators are warmed up
+    recorded = slice(warmup, None)
+    timestamps = dates[recorded].as_unit('ns').asi8 / NANOSECONDS_PER_DAY + EPOCH_DATE_NUMBER
+    equity = {
+        'timestamps': timestamps,
+        'values': values[recorded],
+        'cash': cash_curve[recorded],
+        'positions': {name: position[recorded] if name == symbol else np.zeros(len(timestamps)) for name in symbols}
+    }
+    series = EquitySeries(equity['values'], initial_capital)
+
+    # The DrawDown analyzer also sees the warm-up bars, when the value is still the initial capital
+    peaks = np.maximum.accumulate(values) if bars else values
+    max_drawdown = max(float((100.0 * (peaks - values) / peaks).max()), 0.0) if bars else 0.0
+
+    final_value = float(values[-1]) if bars else initial_capital
+    total_trades = len(trips)
+    won_trades = int(np.count_nonzero(pnlcomms >= 0.0))
+    last_exit = [exit_ for _, exit_ in trips[resumed_trips:] if exit_ is not None]
+    if progress is not None:
+        # The whole run takes milliseconds, so there is only the final frame and no partial series
+        open_positions = {symbol: {'size': float(position[-1]), 'price': float(entry_prices[-1])}} if bars and position[-1] else {}
+        progress.report(force=True, barsProcessed=bars, totalBars=bars,
+                        date=dates[-1].date().isoformat() if bars else None, portfolioValue=final_value,
+                        cash=float(cash_curve[-1]) if bars else initial_capital, positions=open_positions,
+                        tradesClosed=closed)
+
+    timer = timer or StageTimer()
+    timer.add('run', time.perf_counter() - started)
+    with timer.stage('metrics'):
+        metrics = calculate_series_metrics(trades, series, initial_capital)
+    return {
+        'finalCapital': final_value,
+        'totalTrades': total_trades,
+        'winRate': (won_trades / total_trades * 100) if total_trades > 0 else 0,
+        'maxDrawdown': max_drawdown,
+        'sharpeRatio': yearly_sharpe(dates, values, initial_capital) or 0,
+        'totalReturn': (final_value - initial_capital) / initial_capital,
+        'trades': trades,
+        'equity': equity,
+        'series': series,
+        'events': events.get_analysis() if events is not None else None,
+        'metrics': metrics,
+        'resumedFrom': {'date': iso_dates[start - 1], 'bars': start} if checkpoint is not None else None,
+        'checkpoint': {
+            'version': CHECKPOINT_VERSION,
+            'bars': bars,
+            'lastDate': iso_dates[-1] if bars else None,
+            'fingerprint': data_fingerprint(dates, opens, closes),
+            'trips': trips,
+            # Where a flat strategy resumes looking for entries: after the last exit
+            'bar': last_exit[-1] if last_exit else search_from,
+            'cash': cash,
+            'flowTotal': float(flow_total[-1]) if len(flow_total) else (checkpoint['flowTotal'] if checkpoint else 0.0),
+            'values': values.tolist(),
+            'cashCurve': cash_curve.tolist(),
+            'position': position.tolist(),
+            'trades': trades,
+        } if bars else None
+    }
@@ -0,0 +1,94 @@
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from pydantic import BaseModel, Field, model_validator
+
+
+class WalkForwardSpec(BaseModel):
+    """Window layout of a walk-forward run, in calendar days
+
+    Each window optimizes on ``inSampleDays`` and evaluates the winning parameters on
+    the ``outOfSampleDays`` right after it; the next window starts ``stepDays`` later
+    (defaults to ``outOfSampleDays``, so out-of-sample periods tile the range). A
+    shorter step would overlap the out-of-sample periods, which the combined result
+    compounds, so it is rejected. With ``anchored`` every in-sample period starts at
+    ``startDate`` and grows instead.
+    """
+    inSampleDays: int = Field(..., gt=0)
+    outOfSampleDays: int = Field(..., gt=0)
+    stepDays: Optional[int] = Field(None, gt=0)
+    anchored: bool = False
+    maxWindows: int = Field(50, ge=1)
+
+    @model_validator(mode='after')
+    def _default_step(self):
+        if self.stepDays is None:
+            self.stepDays = self.outOfSampleDays
+        if self.stepDays < self.outOfSampleDays:
+            raise ValueError(f"stepDays ({self.stepDays}) must be at least outOfSampleDays ({self.outOfSampleDays}), "
+                             f"or out-of-sample periods overlap")
+        return self
+
+
+class Window(BaseModel):
+    index: int
+    inSampleStart: str
+    inSampleEnd: str
+    outOfSampleStart: str
+    outOfSampleEnd: str
+
+
+def _iso(timestamp: pd.Timestamp) -> str:
+    return timestamp.strftime('%Y-%m-%d')
+
+
+def split_windows(start_date: str, end_date: str, spec: WalkForwardSpec) -> List[Window]:
+    """In-sample/out-of-sample windows covering start_date..end_date; the last partial one is dropped"""
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+    day = pd.Timedelta(days=1)
+    windows = []
+    offset = start
+    while True:
+        in_sample_end = offset + pd.Timedelta(days=spec.inSampleDays) - day
+        out_of_sample_end = in_sample_end + pd.Timedelta(days=spec.outOfSampleDays)
+        if out_of_sample_end > end:
+            break
+        windows.append(Window(
+            index=len(windows),
+            inSampleStart=_iso(start if spec.anchored else offset),
+            inSampleEnd=_iso(in_sample_end),
+            outOfSampleStart=_iso(in_sample_end + day),
+            outOfSampleEnd=_iso(out_of_sample_end),
+        ))
+        offset += pd.Timedelta(days=spec.stepDays)
+    return windows
+
+
+def slice_frames(frames: Dict[str, pd.DataFrame], start_date: str, end_date: str) -> Dict[str, pd.DataFrame]:
+    """Bars of each frame between the dates (inclusive); views, so the shared data is not copied"""
+    sliced = {symbol: frame.loc[start_date:end_date] for symbol, frame in frames.items()}
+    return {symbol: frame for symbol, frame in sliced.items() if len(frame)}
+
+
+def summarize(windows: List[Dict[str, Any]], initial_capital: float) -> Dict[str, Any]:
+    """Out-of-sample performance of all windows chained together
+
+    Each out-of-sample period starts from ``initial_capital``; the combined return
+    compounds their returns as if the capital had been rolled from one to the next.
+    """
+    evaluated = [w['outOfSample'] for w in windows if w.get('outOfSample') and w['outOfSample'].get('error') is None]
+    growth = 1.0
+    for run in evaluated:
+        growth *= 1 + run['totalReturn']
+    trades = sum(run['totalTrades'] for run in evaluated)
+    won = sum(run['totalTrades'] * run['winRate'] / 100 for run in evaluated)
+    return {
+        'windowsEvaluated': len(evaluated),
+        'totalReturn': growth - 1 if evaluated else 0.0,
+        'finalCapital': initial_capital * growth,
+        'totalTrades': trades,
+        'winRate': won / trades * 100 if trades else 0,
+        'maxDrawdown': max((run['maxDrawdown'] for run in evaluated), default=0),
+        'averageSharpeRatio': sum(run['sharpeRatio'] for run in evaluated) / len(evaluated) if evaluated else 0,
+    }
@@ -0,0 +1,323 @@
+import asyncio
+import ctypes
+import logging
+import multiprocessing
+import os
+import resource
+import signal
+import socket
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class PoolSaturatedError(Exception):
+    """Raised when the pool already holds its maximum number of running and queued jobs"""
+
+
+class JobLimitExceeded(BaseException):
+    """Raised inside a worker when a job exceeds its CPU, memory or wall-time budget
+
+    Derives from BaseException so broad ``except Exception`` blocks in strategy or
+    data-loading code cannot swallow it and keep the job running.
+    """
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _on_cpu_limit(signum, frame):
+    raise JobLimitExceeded("CPU time limit exceeded")
+
+
+def _on_wall_limit(signum, frame):
+    raise JobLimitExceeded("Wall-time limit exceeded")
+
+
+# Imported once in the fork server, so every worker forked from it starts warm
+DEFAULT_PRELOAD = ('numpy', 'pandas', 'backtrader')
+
+
+def _deny_network(*args, **kwargs):
+    raise PermissionError("Network access is disabled in backtest workers")
+
+
+class _LocalSocket(socket.socket):
+    """socket.socket that only opens Unix-domain sockets (the manager's progress channel uses one)"""
+
+    def __init__(self, family=-1, type=-1, proto=-1, fileno=None):
+        super().__init__(family, type, proto, fileno)
+        if self.family != socket.AF_UNIX:
+            self.close()
+            _deny_network()
+
+
+def _block_network():
+    # Best effort only: it patches Python's socket module, which native code (or a sandbox escape) bypasses.
+    # The network namespace set up by _isolate is what actually takes the network away.
+    socket.socket = _LocalSocket
+    socket.create_connection = _deny_network
+    socket.getaddrinfo = _deny_network
+
+
+# Linux constants from <sched.h>, <sys/mount.h>, <linux/prctl.h> and <linux/capability.h>
+CLONE_NEWNS = 0x00020000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+MS_RDONLY = 0x1
+MS_REMOUNT = 0x20
+MS_BIND = 0x1000
+MS_REC = 0x4000
+MS_PRIVATE = 0x40000
+PR_CAPBSET_DROP = 24
+PR_SET_NO_NEW_PRIVS = 38
+LINUX_CAPABILITY_VERSION_3 = 0x20080522
+
+
+class _CapHeader(ctypes.Structure):
+    _fields_ = [('version', ctypes.c_uint32), ('pid', ctypes.c_int)]
+
+
+class _CapData(ctypes.Structure):
+    _fields_ = [('effective', ctypes.c_uint32), ('permitted', ctypes.c_uint32), ('inheritable', ctypes.c_uint32)]
+
+
+def _check(result: int, what: str):
+    if result != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"{what}: {os.strerror(errno)}")
+
+
+def _write(path: str, content: str):
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def _unshare(libc):
+    """Move the worker into its own network and mount namespaces
+
+    Root can create them directly; other users need a user namespace, in which the
+    worker keeps its own uid and gid.
+    """
+    if libc.unshare(CLONE_NEWNET | CLONE_NEWNS) == 0:
+        return
+    uid, gid = os.getuid(), os.getgid()
+    _check(libc.unshare(CLONE_NEWUSER | CLONE_NEWNET | CLONE_NEWNS), "unshare")
+    _write('/proc/self/setgroups', 'deny')
+    _write('/proc/self/uid_map', f"{uid} {uid} 1")
+    _write('/proc/self/gid_map', f"{gid} {gid} 1")
+
+
+def _drop_privileges(libc):
+    """Give up every capability for good and forbid gaining new ones through exec"""
+    last_cap = int(open('/proc/sys/kernel/cap_last_cap').read())
+    for cap in range(last_cap + 1):
+        # Dropping from the bounding set needs CAP_SETPCAP, so it comes before clearing the capability sets
+        libc.prctl(PR_CAPBSET_DROP, cap, 0, 0, 0)
+    _check(libc.capset(ctypes.byref(_CapHeader(LINUX_CAPABILITY_VERSION_3, 0)), (_CapData * 2)()), "capset")
+    _check(libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0), "prctl(PR_SET_NO_NEW_PRIVS)")
+
+
+def _isolate():
+    """OS-level sandbox of a worker: no network, a read-only working directory, no privileges
+
+    The worker gets a network namespace with only a loopback interface that is down,
+    so it cannot reach any host. The manager's progress channel is a Unix socket on
+    the file system and keeps working. In a private mount namespace the working
+    directory is remounted read-only. Last, all capabilities are dropped, including
+    from the bounding set, so even a worker running as root cannot mount, trace
+    other processes or get privileges back by exec'ing a setuid binary. Steps the
+    kernel refuses (no user namespaces, seccomp-restricted containers) are logged
+    and skipped, leaving the Python-level network block as the only one.
+    """
+    libc = ctypes.CDLL(None, use_errno=True)
+    try:
+        _unshare(libc)
+        cwd = os.getcwd()
+        # Keep the remount from propagating back to the API process's namespace
+        _check(libc.mount(None, b'/', None, MS_REC | MS_PRIVATE, None), "mount --make-rprivate /")
+        _check(libc.mount(cwd.encode(), cwd.encode(), None, MS_BIND | MS_REC, None), f"bind mount {cwd}")
+        _check(libc.mount(None, cwd.encode(), None, MS_BIND | MS_REMOUNT | MS_RDONLY, None),
+               f"read-only remount {cwd}")
+        os.chdir(cwd)
+    except OSError as e:
+        logger.warning("Backtest worker %d is not in its own network and mount namespaces: %s", os.getpid(), e)
+    try:
+        _drop_privileges(libc)
+    except OSError as e:
+        logger.warning("Backtest worker %d could not drop its privileges: %s", os.getpid(), e)
+
+
+def _init_worker(memory_limit_mb: int = 0, isolate: bool = True):
+    """Sandbox a worker process once: limit handlers, memory cap, namespaces and no network"""
+    signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    signal.signal(signal.SIGALRM, _on_wall_limit)
+    if memory_limit_mb > 0:
+        # RLIMIT_DATA caps the private heap but not the memory-mapped shared market data; soft == hard so it stays put
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+    if isolate:
+        _isolate()
+    _block_network()
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def _run_limited(fn: Callable, cpu_limit: int, wall_limit: int, args: tuple, kwargs: dict) -> Any:
+    """Run fn in the worker with a CPU budget (RLIMIT_CPU) and a wall-clock budget (SIGALRM)"""
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if cpu_limit > 0:
+        # RLIMIT_CPU counts the whole process lifetime, so the budget is relative to what the worker already used
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime) + cpu_limit
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    if wall_limit > 0:
+        signal.setitimer(signal.ITIMER_REAL, wall_limit)
+    try:
+        return fn(*args, **kwargs)
+    except MemoryError:
+        raise JobLimitExceeded("Memory limit exceeded")
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        if cpu_limit > 0:
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+class BacktestWorkerPool:
+    """Process pool that runs CPU-bound backtest work off the event loop
+
+    At most ``max_workers`` jobs run at once and at most ``max_queue`` more may wait;
+    beyond that ``submit`` raises PoolSaturatedError so the API can answer 429.
+
+    Workers are sandboxes for user strategy code. They fork from a fork server that has
+    already imported the ``preload`` modules, all of them are started up front, and each
+    one has a memory cap, no network, a read-only working directory and no privileges
+    (see ``_isolate``; ``isolate=False`` skips the namespaces and capability drop). A
+    worker is replaced after ``max_tasks_per_child`` jobs, so state a strategy leaves
+    behind does not linger.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        cpu_limit: Optional[int] = None,
+        wall_limit: Optional[int] = None,
+        memory_limit_mb: Optional[int] = None,
+        max_tasks_per_child: Optional[int] = None,
+        preload: Sequence[str] = DEFAULT_PRELOAD,
+        isolate: Optional[bool] = None,
+    ):
+        self.max_workers = max_workers or _env_int('BACKTEST_WORKERS', os.cpu_count() or 1)
+        self.max_queue = max_queue if max_queue is not None else _env_int('BACKTEST_MAX_QUEUE', self.max_workers * 4)
+        self.cpu_limit = cpu_limit if cpu_limit is not None else _env_int('BACKTEST_CPU_LIMIT_SECONDS', 240)
+        self.wall_limit = wall_limit if wall_limit is not None else _env_int('BACKTEST_WALL_LIMIT_SECONDS', 300)
+        self.memory_limit_mb = memory_limit_mb if memory_limit_mb is not None else _env_int('BACKTEST_MEMORY_LIMIT_MB', 2048)
+        self.max_tasks_per_child = (max_tasks_per_child if max_tasks_per_child is not None
+                                    else _env_int('BACKTEST_WORKER_MAX_TASKS', 50))
+        self.start_method = os.getenv('BACKTEST_START_METHOD', 'forkserver')
+        self.isolate = isolate if isolate is not None else _env_int('BACKTEST_WORKER_ISOLATION', 1) != 0
+        self.preload = list(preload)
+        self._context = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self.progress_channel = None
+        self._pending = 0
+        # Guards replacing the executor, which a broken pool makes every in-flight job attempt
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self._start()
+
+    def _start(self):
+        if self._context is None:
+            self._context = multiprocessing.get_context(self.start_method)
+            if self.start_method == 'forkserver':
+                self._context.set_forkserver_preload(self.preload)
+        if self._manager is None:
+            # Workers cannot share a plain multiprocessing.Queue through the executor, but a manager proxy pickles
+            self._manager = self._context.Manager()
+            self.progress_channel = self._manager.Queue()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=self._context,
+                initializer=_init_worker,
+                initargs=(self.memory_limit_mb, self.isolate),
+                # Recycling needs a fork server or spawn; the executor refuses it for plain fork
+                max_tasks_per_child=(self.max_tasks_per_child or None) if self.start_method != 'fork' else None,
+            )
+            # Start every worker now rather than on the first jobs
+            for _ in range(self.max_workers):
+                self._executor.submit(_warm_up)
+            logger.info("Backtest worker pool started with %d %s workers (queue depth %d)",
+                        self.max_workers, self.start_method, self.max_queue)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+            self.progress_channel = None
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs currently running or waiting for a worker"""
+        return self._pending
+
+    @property
+    def saturated(self) -> bool:
+        return self._pending >= self.max_workers + self.max_queue
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.max_workers,
+            'maxQueue': self.max_queue,
+            'pending': self._pending,
+            'running': min(self._pending, self.max_workers),
+            'queued': max(self._pending - self.max_workers, 0),
+            'startMethod': self.start_method,
+            'memoryLimitMb': self.memory_limit_mb,
+            'maxTasksPerChild': self.max_tasks_per_child,
+            'isolation': self.isolate,
+        }
+
+    async def submit(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) in a worker process and await its result"""
+        if self.saturated:
+            raise PoolSaturatedError(f"Backtest queue is full ({self._pending} jobs pending)")
+        self.start()
+        executor = self._executor
+
+        self._pending += 1
+        try:
+            future = executor.submit(_run_limited, fn, self.cpu_limit, self.wall_limit, args, kwargs)
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            # A worker died (hard rlimit, OOM kill); replace the executor so later jobs still run
+            self._discard(executor)
+            raise
+        finally:
+            self._pending -= 1
+
+    def _discard(self, executor: ProcessPoolExecutor):
+        """Drop a broken executor, unless another job already replaced it"""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        logger.error("Backtest worker pool broken, restarting")
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -9,7 +9,20 @@ export interface BacktestRequest {
   endDate: string;
   initialCapital: number;
   symbols: string[];
-  dataSource: 'dhan' | 'yahoo';
+  // 'yahoo', 'local' (engine's LOCAL_DATA_DIR) or a data-source plugin; GET /data-sources lists them
+  dataSource: string;
+  engine?: 'backtrader' | 'vectorized';
+  includeEvents?: boolean;
+  logLevel?: 'DEBUG' | 'INFO' | 'WARNING' | 'ERROR';
+  eventSampleRate?: number;
+  maxEvents?: number;
+  useCache?: boolean;
+  resume?: boolean;
+  // 'auto' switches Cerebro to low-memory mode for long histories (daily equity points for intraday bars)
+  memoryMode?: 'auto' | 'standard' | 'low';
+  progressInterval?: number;
+  // Adds results.timings (and a Server-Timing header on POST /backtest)
+  includeTimings?: boolean;
 }
 
 export interface BacktestResult {
@@ -23,13 +36,42 @@ export interface BacktestResult {
   maxDrawdown: number;
   sharpeRatio: number;
   totalReturn: number;
+  cached?: boolean;
   results: {
     trades: BacktestTrade[];
     dailyReturns: DailyReturn[];
     metrics: PerformanceMetrics;
+    dataLoad?: DataLoadTiming[];
+    // Set when the run extended the checkpoint of an earlier run up to this date
+    resumedFrom?: { date: string; bars: number };
+    // Set when Cerebro ran in low-memory mode
+    memoryMode?: 'low';
+    // Wall seconds per stage when the request set includeTimings
+    timings?: BacktestTimings;
   };
 }
 
+// Stages that did not run (e.g. everything after cacheLookup on a cache hit) are absent
+export interface BacktestTimings {
+  validation?: number;
+  dataFetch?: number;
+  cacheLookup?: number;
+  feeds?: number;
+  run?: number;
+  analyzers?: number;
+  metrics?: number;
+  result?: number;
+  dispatch?: number;
+}
+
+export interface DataLoadTiming {
+  symbol: string;
+  seconds: number;
+  status: 'ok' | 'failed';
+  bars?: number;
+  error?: string;
+}
+
 export interface BacktestTrade {
   symbol: string;
   entryDate: string;
@@ -66,6 +108,125 @@ export interface PerformanceMetrics {
   largestLoss: number;
 }
 
+export interface BacktestJobStatus {
+  jobId: string;
+  strategyId: string;
+  kind: 'backtest' | 'optimize' | 'walk_forward';
+  status: 'queued' | 'running' | 'completed' | 'failed' | 'cancelled';
+  progress: {
+    barsProcessed?: number;
+    totalBars?: number;
+    combinationsCompleted?: number;
+    totalCombinations?: number;
+    windowsCompleted?: number;
+    totalWindows?: number;
+    date?: string | null;
+    portfolioValue?: number;
+    cash?: number;
+    positions?: Record<string, { size: number; price: number }>;
+    tradesClosed?: number;
+    percent: number;
+  };
+  createdAt: string;
+  startedAt: string | null;
+  finishedAt: string | null;
+  error: string | null;
+}
+
+// Frame of GET /jobs/:id/stream (SSE) or /jobs/:id/ws; `partial` holds what changed since the previous frame
+export interface BacktestJobFrame {
+  event: 'status' | 'progress' | 'done';
+  data: BacktestJobStatus & {
+    partial?: {
+      equity?: { date: string; portfolioValue: number }[];
+      trades?: BacktestTrade[];
+    };
+  };
+}
+
+export interface BatchBacktestRequest {
+  strategyId: string;
+  runs: { id?: string; strategyCode: string; parameters?: Record<string, any>; symbols: string[] }[];
+  startDate: string;
+  endDate: string;
+  initialCapital: number;
+  dataSource?: string;
+  engine?: 'backtrader' | 'vectorized';
+  useCache?: boolean;
+  rankBy?: string;
+  ascending?: boolean;
+  includeResults?: boolean;
+}
+
+export interface BatchBacktestRow {
+  id: string;
+  symbols: string[];
+  parameters: Record<string, any>;
+  rank: number | null;
+  error: string | null;
+  finalCapital?: number;
+  totalReturn?: number;
+  totalTrades?: number;
+  winRate?: number;
+  maxDrawdown?: number;
+  sharpeRatio?: number;
+  metrics?: PerformanceMetrics;
+  cached?: boolean;
+}
+
+export interface BatchBacktestResult {
+  strategyId: string;
+  startDate: string;
+  endDate: string;
+  rankBy: string;
+  summary: {
+    runs: number;
+    succeeded: number;
+    failed: number;
+    profitable: number;
+    meanReturn: number | null;
+    medianReturn: number | null;
+    meanSharpeRatio: number | null;
+    worstMaxDrawdown: number | null;
+    totalTrades: number;
+    best: string | null;
+    worst: string | null;
+  };
+  runs: BatchBacktestRow[];
+  dataLoad: DataLoadTiming[];
+  seconds: number;
+  results?: Record<string, BacktestResult>;
+}
+
+export interface MonteCarloRequest {
+  // A backtest result's results.trades can be passed as is
+  trades: Pick<BacktestTrade, 'pnl' | 'commission' | 'entryDate' | 'exitDate'>[];
+  initialCapital: number;
+  paths?: number;
+  method?: 'bootstrap' | 'permutation';
+  seed?: number;
+  percentiles?: number[];
+}
+
+// Keyed by statistic: finalEquity, maxDrawdown, sharpeRatio
+export interface MonteCarloResult {
+  method: 'bootstrap' | 'permutation';
+  paths: number;
+  trades: number;
+  seed: number;
+  initialCapital: number;
+  tradesPerYear: number | null;
+  observed: Record<string, number | null>;
+  // mean, std, min, max and p<percentile> of each statistic over all paths
+  distributions: Record<string, Record<string, number | null>>;
+  probabilityOfLoss: number;
+  probabilityOfRuin: number;
+  seconds: number;
+}
+
+const JOB_POLL_INTERVAL_MS = 1000;
+const JOB_MAX_WAIT_MS = 300000;
+
 export class BacktraderService {
   private baseUrl: string;
 
@@ -81,31 +242,101 @@ export class BacktraderService {
   }
 
   /**
-   * Run a backtest using the Python Backtrader service
+   * Run a backtest using the Python Backtrader service.
+   * Submits an async job and polls it, so no HTTP connection is held open for the whole run.
    */
   async runBacktest(request: BacktestRequest): Promise<BacktestResult> {
     try {
       logger.info(`Starting backtest for strategy ${request.strategyId}`);
-      
-      const response = await axios.post(`${this.baseUrl}/backtest`, request, {
-        timeout: 300000, // 5 minutes timeout for backtests
-        headers: {
-          'Content-Type': 'application/json'
+
+      const job = await this.submitBacktestJob(request);
+      const deadline = Date.now() + JOB_MAX_WAIT_MS;
+
+      let status = job;
+      while (status.status === 'queued' || status.status === 'running') {
+        if (Date.now() > deadline) {
+          throw new Error(`Backtest job ${job.jobId} did not finish in time`);
         }
-      });
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+        status = await this.getBacktestJob(job.jobId);
+      }
+
+      if (status.status === 'failed' || status.status === 'cancelled') {
+        throw new Error(status.error || `Backtest job ${status.status}`);
+      }
+
+      const response = await axios.get(`${this.baseUrl}/jobs/${job.jobId}/result`);
 
       logger.info(`Backtest completed for strategy ${request.strategyId}`);
       return response.data;
     } catch (error: any) {
       logger.error('Backtest failed:', error);
-      throw new Error(`Backtest failed: ${error.response?.data?.message || error.message}`);
+      throw new Error(`Backtest failed: ${error.response?.data?.detail || error.response?.data?.message || error.message}`);
+    }
+  }
+
+  /**
+   * Submit a backtest job; returns immediately with the job id
+   */
+  async submitBacktestJob(request: BacktestRequest): Promise<BacktestJobStatus> {
+    const response = await axios.post(`${this.baseUrl}/jobs`, request, {
+      headers: {
+        'Content-Type': 'application/json'
+      }
+    });
+    return response.data;
+  }
+
+  /**
+   * Get status and progress of a backtest job
+   */
+  async getBacktestJob(jobId: string): Promise<BacktestJobStatus> {
+    const response = await axios.get(`${this.baseUrl}/jobs/${jobId}`, {
+      timeout: 10000
+    });
+    return response.data;
+  }
+
+  /**
+   * Run many independent backtests (e.g. one strategy across a symbol universe) in one call
+   */
+  async runBacktestBatch(request: BatchBacktestRequest): Promise<BatchBacktestResult> {
+    try {
+      const response = await axios.post(`${this.baseUrl}/backtest/batch`, request, {
+        headers: {
+          'Content-Type': 'application/json'
+        },
+        timeout: JOB_MAX_WAIT_MS
+      });
+      return response.data;
+    } catch (error: any) {
+      logger.error('Batch backtest failed:', error);
+      throw new Error(`Batch backtest failed: ${error.response?.data?.detail || error.response?.data?.message || error.message}`);
+    }
+  }
+
+  /**
+   * Resample a backtest's trades into Monte Carlo equity paths
+   */
+  async runMonteCarlo(request: MonteCarloRequest): Promise<MonteCarloResult> {
+    try {
+      const response = await axios.post(`${this.baseUrl}/analysis/montecarlo`, request, {
+        headers: {
+          'Content-Type': 'application/json'
+        },
+        timeout: JOB_MAX_WAIT_MS
+      });
+      return response.data;
+    } catch (error: any) {
+      logger.error('Monte Carlo analysis failed:', error);
+      throw new Error(`Monte Carlo analysis failed: ${error.response?.data?.detail || error.response?.data?.message || error.message}`);
     }
   }
 
   /**
    * Validate strategy code syntax
    */
-  async validateStrategy(strategyCode: string): Promise<{ valid: boolean; errors?: string[] }> {
+  async validateStrategy(strategyCode: string): Promise<{ valid: boolean; strategy?: string; builtin?: boolean; errors?: string[] }> {
     try {
       const response = await axios.post(`${this.baseUrl}/validate`, {
         strategyCode
@@ -134,6 +365,19 @@ export class BacktraderService {
     }
   }
 
+  /**
+   * Get the data sources backtests can use as dataSource
+   */
+  async getDataSources(): Promise<string[]> {
+    try {
+      const response = await axios.get(`${this.baseUrl}/data-sources`);
+      return response.data.dataSources || [];
+    } catch (error: any) {
+      logger.error('Failed to get data sources:', error);
+      return [];
+    }
+  }
+
   /**
    * Generate strategy template
    */